@@ -0,0 +1,64 @@
+"""
+Laczenie powiadomien w zbiorcze (digest).
+
+Gdy w jednej partii relaya (apps.reservations.outbox) ten sam odbiorca dostaje wiecej niz
+NOTIFICATION_DIGEST_THRESHOLD powiadomien tego samego typu (np. prowadzacy po publikacji
+terminow, na ktore zapisuje sie cala grupa), zamiast nich powstaje jedno powiadomienie
+z liczba zdarzen i podgladem kilku pierwszych.
+"""
+from django.conf import settings
+
+from .models import Notification
+
+#ile pojedynczych tresci pokazac w powiadomieniu zbiorczym
+DIGEST_PREVIEW = 5
+
+DIGEST_HEADERS = {
+    'NEW_RESERVATION': "Masz {count} nowych rezerwacji:",
+    'RESERVATION_CONFIRMATION': "Potwierdzono {count} Twoich rezerwacji:",
+    'RESERVATION_CANCELLATION': "Anulowano {count} rezerwacji:",
+    'STATUS_CHANGE': "Zmieniono status {count} Twoich rezerwacji:",
+    'SLOT_UPDATE': "Zmieniono {count} Twoich terminów:",
+}
+
+
+def get_digest_threshold():
+    return getattr(settings, 'NOTIFICATION_DIGEST_THRESHOLD', 3)
+
+
+def build_digest(recipient_id, notification_type, items):
+    lines = [f"- {item.message}" for item in items[:DIGEST_PREVIEW]]
+    if len(items) > DIGEST_PREVIEW:
+        lines.append(f"... i {len(items) - DIGEST_PREVIEW} więcej.")
+    header = DIGEST_HEADERS.get(notification_type, "Masz {count} nowych powiadomień:")
+    return Notification(
+        recipient_id=recipient_id,
+        message="\n".join([header.format(count=len(items)), *lines]),
+        notification_type=notification_type,
+    )
+
+
+def coalesce(notifications, threshold=None):
+    """
+    Zwraca (powiadomienia, liczba_digestow). Kolejnosc zachowana - digest zajmuje miejsce
+    pierwszego z laczonych powiadomien. threshold=0 wylacza laczenie.
+    """
+    threshold = get_digest_threshold() if threshold is None else threshold
+    if not threshold:
+        return list(notifications), 0
+
+    groups = {}
+    for notification in notifications:
+        groups.setdefault((notification.recipient_id, notification.notification_type), []).append(notification)
+
+    result = []
+    digests = 0
+    for notification in notifications:
+        key = (notification.recipient_id, notification.notification_type)
+        items = groups[key]
+        if len(items) <= threshold:
+            result.append(notification)
+        elif items[0] is notification:
+            result.append(build_digest(*key, items))
+            digests += 1
+    return result, digests
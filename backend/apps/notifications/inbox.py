@@ -0,0 +1,79 @@
+"""
+Skrzynka powiadomien: licznik nieprzeczytanych w cache.
+
+Naglowek frontendu odpytuje licznik na kazdej stronie, wiec jest on trzymany w cache
+(klucz per odbiorca) i korygowany przy dodaniu powiadomien (po commicie) i ich odczycie.
+Brak klucza oznacza "nieznany" - kolejny odczyt liczy go jednym COUNT po indeksie
+notification_inbox_idx. Przyrosty dla brakujacego klucza sa pomijane (COUNT je uwzgledni);
+krotki TTL ogranicza czas ewentualnej rozbieznosci przy wyscigu odczytu z zapisem.
+Nowe powiadomienia sa tez publikowane do kanalu push odbiorcy (apps.notifications.push).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+from .push import publish_notifications
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TTL', 300)
+
+
+def get_unread_count(user_id):
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_seen=False).count()
+        cache.add(_key(user_id), count, timeout=_ttl())
+    return max(count, 0)
+
+
+def _adjust(user_id, delta):
+    try:
+        if delta > 0:
+            cache.incr(_key(user_id), delta)
+        elif cache.decr(_key(user_id), -delta) < 0:
+            cache.delete(_key(user_id))
+    except ValueError:
+        #brak klucza - policzy go nastepny odczyt
+        pass
+
+
+def deliver(notifications):
+    """Zapisuje powiadomienia jednym bulk_create; liczniki odbiorcow rosna po commicie."""
+    created = Notification.objects.bulk_create(notifications)
+    counts = Counter(notification.recipient_id for notification in created if not notification.is_seen)
+
+    def after_commit():
+        for user_id, count in counts.items():
+            _adjust(user_id, count)
+        publish_notifications(created)
+
+    transaction.on_commit(after_commit)
+    return created
+
+
+def mark_read(user_id, notification_id):
+    """Oznacza jedno powiadomienie; False, jesli nie istnieje albo bylo juz przeczytane."""
+    updated = Notification.objects.filter(pk=notification_id, recipient_id=user_id, is_seen=False).update(is_seen=True)
+    if updated:
+        transaction.on_commit(lambda: _adjust(user_id, -1))
+    return bool(updated)
+
+
+def mark_all_read(user_id, up_to_id=None):
+    """Jeden UPDATE dla wszystkich nieprzeczytanych (opcjonalnie tylko do id wlacznie)."""
+    queryset = Notification.objects.filter(recipient_id=user_id, is_seen=False)
+    if up_to_id is not None:
+        queryset = queryset.filter(pk__lte=up_to_id)
+    updated = queryset.update(is_seen=True)
+    if updated:
+        #z up_to_id moga zostac nowsze nieprzeczytane - licznik przeliczy kolejny odczyt
+        transaction.on_commit(lambda: cache.delete(_key(user_id)))
+    return updated
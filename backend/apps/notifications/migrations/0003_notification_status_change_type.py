@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_reservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('RESERVATION_CONFIRMATION', 'Potwierdzenie rezerwacji'), ('RESERVATION_CANCELLATION', 'Anulowanie rezerwacji'), ('SLOT_UPDATE', 'Aktualizacja terminu'), ('NEW_RESERVATION', 'Nowa rezerwacja'), ('STATUS_CHANGE', 'Zmiana statusu rezerwacji')], default='NEW_RESERVATION', max_length=255, verbose_name='Typ powiadomienia'),
+        ),
+    ]
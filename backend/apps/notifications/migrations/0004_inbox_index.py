@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_status_change_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id', 'is_seen'], name='notification_inbox_idx'),
+        ),
+    ]
@@ -28,6 +28,7 @@ class Notification(models.Model):
         ('RESERVATION_CANCELLATION', 'Anulowanie rezerwacji'),
         ('SLOT_UPDATE', 'Aktualizacja terminu'),
         ('NEW_RESERVATION', 'Nowa rezerwacja'),
+        ('STATUS_CHANGE', 'Zmiana statusu rezerwacji'),
     ]
     notification_type=models.CharField(
         max_length=255,
@@ -45,6 +46,11 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Powiadomienie'
         verbose_name_plural = 'Powiadomienia'
+        indexes = [
+            #skrzynka: strony po (created_at, id) malejaco dla odbiorcy; is_seen w indeksie
+            #pozwala filtrowac nieprzeczytane i liczyc je bez czytania wierszy tabeli
+            models.Index(fields=['recipient', '-created_at', '-id', 'is_seen'], name='notification_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"Dla {self.recipient.username}: {self.message[:30]}..."
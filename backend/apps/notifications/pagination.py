@@ -0,0 +1,8 @@
+from apps.schedules.pagination import KeysetPagination
+
+
+class NotificationCursorPagination(KeysetPagination):
+    # najnowsze najpierw; kolejnosc zgodna z indeksem notification_inbox_idx
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
@@ -0,0 +1,185 @@
+"""
+Pub/sub dla kanalu push (SSE, apps.notifications.stream).
+
+Kanaly: 'user:<id>' - nowe powiadomienia odbiorcy (publikuje inbox.deliver po commicie),
+'slots' - zmiana dostepnosci terminow prowadzacego (publikuje bump_lecturer_generation).
+
+Backend wybiera settings.PUSH_BACKEND:
+  - LocalPubSub (domyslny) - w pamieci procesu, bez Redisa. Dociera tylko do klientow
+    podlaczonych do tego samego procesu, w ktorym nastapila publikacja (dev, testy,
+    pojedynczy proces ASGI obslugujacy tez relay outbox).
+  - RedisPubSub - publikacja przez Redis (PUSH_REDIS_URL), kazdy proces ASGI ma jednego
+    subskrybenta Redis i rozsyla wiadomosci lokalnie; wymagany, gdy powiadomienia tworzy
+    worker Celery.
+
+Subskrypcja to ograniczona kolejka asyncio w petli zdarzen polaczenia; publikacja jest
+bezpieczna z dowolnego watku (jedno call_soon_threadsafe na petle, nie na subskrybenta).
+Pelna kolejka (wolny klient) gubi wiadomosci zamiast blokowac publikujacego.
+Publikacja jest best-effort: wywolywana po commicie, wiec blad (np. Redis) jest tylko
+logowany - zapisana rezerwacja nie konczy sie 500, a klient nadrobi stan po Last-Event-ID.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SLOTS_CHANNEL = 'slots'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    def __init__(self, pubsub, channels, maxsize):
+        self.pubsub = pubsub
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, channel, message):
+        #wywolywane w petli zdarzen subskrypcji
+        try:
+            self.queue.put_nowait((channel, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout=None):
+        """(kanal, wiadomosc) albo asyncio.TimeoutError po `timeout` sekundach."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class LocalPubSub:
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or getattr(settings, 'PUSH_QUEUE_SIZE', 100)
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return len({subscription for subscribers in self._channels.values() for subscription in subscribers})
+
+    def publish(self, channel, message):
+        return self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        """Rozsyla wiadomosc do subskrybentow w tym procesie. Zwraca ich liczbe."""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_put_all, group, channel, message)
+            except RuntimeError:
+                #petla zamknieta - subskrypcje znikna przy zamknieciu polaczenia
+                pass
+        return len(subscribers)
+
+
+def _put_all(subscriptions, channel, message):
+    for subscription in subscriptions:
+        subscription.put(channel, message)
+
+
+class RedisPubSub(LocalPubSub):
+    prefix = 'push:'
+
+    def __init__(self, queue_size=None, url=None):
+        super().__init__(queue_size)
+        self.url = url or getattr(settings, 'PUSH_REDIS_URL', '')
+        self._client = None
+        self._listeners = {}
+
+    def publish(self, channel, message):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client.publish(self.prefix + channel, json.dumps(message))
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        #jeden nasluch Redis na petle zdarzen procesu
+        loop = subscription.loop
+        if loop not in self._listeners or self._listeners[loop].done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(self.prefix + '*')
+        try:
+            async for item in pubsub.listen():
+                if item['type'] != 'pmessage':
+                    continue
+                channel = item['channel'].decode()[len(self.prefix):]
+                self.deliver(channel, json.loads(item['data']))
+        finally:
+            await pubsub.close()
+            await client.close()
+
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+def get_pubsub():
+    global _pubsub
+    if _pubsub is None:
+        with _pubsub_lock:
+            if _pubsub is None:
+                _pubsub = import_string(getattr(settings, 'PUSH_BACKEND', 'apps.notifications.push.LocalPubSub'))()
+    return _pubsub
+
+
+def publish_notifications(notifications):
+    #po commicie zapisu powiadomien (inbox.deliver)
+    from .serializers import NotificationSerializer
+
+    try:
+        pubsub = get_pubsub()
+        for notification in notifications:
+            pubsub.publish(user_channel(notification.recipient_id), NotificationSerializer(notification).data)
+    except Exception:
+        logger.exception("Nie udalo sie opublikowac powiadomien w kanale push")
+
+
+def publish_slot_change(lecturer_id):
+    #klient odswieza terminy prowadzacego (dane z cache generacji, bez kosztu po stronie push)
+    try:
+        get_pubsub().publish(SLOTS_CHANNEL, {'lecturer_id': lecturer_id})
+    except Exception:
+        logger.exception("Nie udalo sie opublikowac zmiany terminow prowadzacego %s", lecturer_id)
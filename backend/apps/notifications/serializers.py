@@ -16,6 +16,8 @@ class NotificationSerializer(serializers.ModelSerializer):
             'message',
             'notification_type',
             'is_seen',
+            'reservation',
+            'created_at',
             'created_at_formatted'
         )
         read_only_fields = fields
@@ -0,0 +1,117 @@
+"""
+Kanal push Server-Sent Events: GET /api/notifications/stream/?token=<access JWT>[&slots=1]
+
+Widok asynchroniczny - wymaga serwera ASGI (config.asgi, np. uvicorn/daphne). Polaczenie
+nie trzyma watku ani polaczenia z baza: token jest tylko weryfikowany (bez odczytu
+uzytkownika), a petla czeka na kolejce subskrypcji (apps.notifications.push), wysylajac
+komentarz co PUSH_HEARTBEAT_SECONDS. Po PUSH_STREAM_MAX_SECONDS strumien jest zamykany -
+EventSource laczy sie ponownie z naglowkiem Last-Event-ID i dostaje pominiete powiadomienia.
+Pod WSGI strumien zajalby worker na caly ten czas - widok odpowiada wtedy 501, a klient
+zostaje przy odpytywaniu skrzynki (inbox/unread-count).
+
+Zdarzenia: 'notification' (dane NotificationSerializer, id = id powiadomienia) oraz przy
+slots=1 'slots' ({"lecturer_id": ...} - terminy prowadzacego sie zmienily).
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Notification
+from .push import SLOTS_CHANNEL, get_pubsub, user_channel
+from .serializers import NotificationSerializer
+
+#ile pominietych powiadomien odsylamy po ponownym polaczeniu
+REPLAY_LIMIT = 100
+
+
+def _user_id(request):
+    #EventSource nie ustawia naglowkow - token moze przyjsc w parametrze
+    raw = request.GET.get('token')
+    header = request.headers.get('Authorization', '')
+    if not raw and header.startswith('Bearer '):
+        raw = header[len('Bearer '):]
+    if not raw:
+        return None
+    try:
+        return AccessToken(raw)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+def _event(name, data, event_id=None):
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@sync_to_async
+def _missed_notifications(user_id, last_id):
+    notifications = Notification.objects.filter(recipient_id=user_id, pk__gt=last_id).order_by('id')[:REPLAY_LIMIT]
+    return [NotificationSerializer(notification).data for notification in notifications]
+
+
+async def _stream(user_id, with_slots, last_event_id):
+    heartbeat = getattr(settings, 'PUSH_HEARTBEAT_SECONDS', 20)
+    deadline = time.monotonic() + getattr(settings, 'PUSH_STREAM_MAX_SECONDS', 1800)
+    channels = [user_channel(user_id)] + ([SLOTS_CHANNEL] if with_slots else [])
+    subscription = get_pubsub().subscribe(channels)
+    try:
+        #ponowienie po zerwaniu polaczenia co 5 s
+        yield "retry: 5000\n\n"
+        if last_event_id is not None:
+            for data in await _missed_notifications(user_id, last_event_id):
+                yield _event('notification', data, data['id'])
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                channel, message = await subscription.get(timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if channel == SLOTS_CHANNEL:
+                yield _event('slots', message)
+            else:
+                yield _event('notification', message, message.get('id'))
+    finally:
+        subscription.close()
+
+
+async def notification_stream(request):
+    if request.method != 'GET':
+        return JsonResponse({"detail": "Metoda niedozwolona."}, status=405)
+    if not isinstance(request, ASGIRequest):
+        #serwer WSGI (np. gunicorn config.wsgi) - kazde polaczenie blokowaloby worker
+        return JsonResponse(
+            {"detail": "Kanał push wymaga serwera ASGI - użyj odpytywania /api/notifications/inbox/unread-count/."},
+            status=501,
+        )
+    user_id = _user_id(request)
+    if user_id is None:
+        return JsonResponse({"detail": "Brak lub nieprawidłowy token."}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    with_slots = request.GET.get('slots') in ('1', 'true')
+
+    response = StreamingHttpResponse(
+        _stream(user_id, with_slots, last_event_id), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    #nginx nie buforuje strumienia
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,182 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.users.models import User
+from apps.notifications.models import Notification
+from apps.notifications.inbox import deliver, get_unread_count
+from apps.notifications.push import LocalPubSub, SLOTS_CHANNEL, publish_slot_change, user_channel
+from apps.notifications.stream import _stream
+
+
+class NotificationInboxTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create(username="student_inbox", email="si@agh.pl", role='student')
+        self.other = User.objects.create(username="student_inbox_2", email="si2@agh.pl", role='student')
+        Notification.objects.bulk_create([
+            Notification(recipient=self.student, message=f"Powiadomienie {i}", notification_type='STATUS_CHANGE')
+            for i in range(25)
+        ] + [Notification(recipient=self.other, message="Cudze", notification_type='STATUS_CHANGE')])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('notification-inbox-list')
+        self.count_url = reverse('notification-inbox-unread-count')
+
+    def test_inbox_keyset_pages_newest_first(self):
+        print("\nTest: skrzynka powiadomien stronicowana kursorem")
+        first = self.client.get(self.url, {'page_size': 10})
+        self.assertEqual(first.status_code, 200)
+        ids = [item['id'] for item in first.data['results']]
+        self.assertEqual(len(ids), 10)
+
+        seen = list(ids)
+        next_url = first.data['next']
+        while next_url:
+            page = self.client.get(next_url)
+            seen += [item['id'] for item in page.data['results']]
+            next_url = page.data['next']
+        #bez cudzych powiadomien, bez powtorzen, najnowsze (wieksze id przy tej samej dacie) najpierw
+        own = list(Notification.objects.filter(recipient=self.student).order_by('-created_at', '-id')
+                   .values_list('id', flat=True))
+        self.assertEqual(seen, own)
+
+    def test_unread_count_cached_and_maintained(self):
+        print("\nTest: licznik nieprzeczytanych z cache")
+        response = self.client.get(self.count_url)
+        self.assertEqual(response.data['unread_count'], 25)
+        #kolejne odpytanie bez zapytan do bazy (force_authenticate - bez odczytu uzytkownika)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.count_url).data['unread_count'], 25)
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        #nowe powiadomienia (po commicie) zwiekszaja licznik
+        with self.captureOnCommitCallbacks(execute=True):
+            deliver([Notification(recipient=self.student, message="Nowe", notification_type='NEW_RESERVATION')])
+        self.assertEqual(self.client.get(self.count_url).data['unread_count'], 26)
+
+        notification = Notification.objects.filter(recipient=self.student).first()
+        read_url = reverse('notification-inbox-read', args=[notification.pk])
+        #w tescie (transakcja) licznik zmienia sie po wyjsciu z bloku - jak po commicie zadania
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(read_url).status_code, 200)
+        self.assertEqual(self.client.get(self.count_url).data['unread_count'], 25)
+        #ponowny odczyt nie zmienia licznika
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(read_url)
+        self.assertEqual(self.client.get(self.count_url).data['unread_count'], 25)
+        self.assertEqual(len(self.client.get(self.url, {'unread': '1', 'page_size': 100}).data['results']), 25)
+
+        #cudze powiadomienie
+        foreign = Notification.objects.get(recipient=self.other)
+        self.assertEqual(self.client.post(reverse('notification-inbox-read', args=[foreign.pk])).status_code, 404)
+        self.assertEqual(get_unread_count(self.other.pk), 1)
+
+    def test_mark_all_read_single_update(self):
+        print("\nTest: oznaczenie wszystkich powiadomien jako przeczytane")
+        self.assertEqual(get_unread_count(self.student.pk), 25)
+        newest = Notification.objects.filter(recipient=self.student).order_by('-id').first()
+        older = Notification.objects.filter(recipient=self.student).order_by('-id')[5]
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notification-inbox-read-all'), {'up_to_id': older.pk}, format='json')
+        self.assertEqual(response.data['updated'], 20)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        #nowsze niz up_to_id zostaja nieprzeczytane
+        self.assertEqual(self.client.get(self.count_url).data['unread_count'], 5)
+        self.assertFalse(Notification.objects.get(pk=newest.pk).is_seen)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notification-inbox-read-all'), format='json')
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(self.client.get(self.count_url).data['unread_count'], 0)
+        self.assertEqual(get_unread_count(self.other.pk), 1)
+
+
+class NotificationStreamTest(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create(username="student_sse", email="sse@agh.pl", role='student')
+        self.token = str(AccessToken.for_user(self.student))
+        self.url = reverse('notification-stream')
+        #osobny pub/sub na test - bez subskrypcji z innych testow
+        self.pubsub = LocalPubSub()
+        patcher = mock.patch('apps.notifications.push._pubsub', self.pubsub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def deliver(self, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return deliver([Notification(recipient=self.student, message=message, notification_type='STATUS_CHANGE')])
+
+    async def next_event(self, stream):
+        return (await asyncio.wait_for(anext(stream), timeout=2)).decode()
+
+    async def test_stream_pushes_notifications_and_slot_changes(self):
+        print("\nTest: kanal SSE z powiadomieniami i zmianami terminow")
+        response = await self.async_client.get(self.url, {'token': self.token, 'slots': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await self.next_event(stream), "retry: 5000\n\n")
+
+        created = await sync_to_async(self.deliver)("Zmieniono status")
+        event = await self.next_event(stream)
+        self.assertIn("event: notification", event)
+        self.assertIn(f"id: {created[0].pk}", event)
+        self.assertIn("Zmieniono status", event)
+
+        publish_slot_change(42)
+        event = await self.next_event(stream)
+        self.assertIn("event: slots", event)
+        self.assertIn('"lecturer_id": 42', event)
+
+    async def test_stream_requires_token_and_replays_missed(self):
+        print("\nTest: kanal SSE - token i powiadomienia pominiete przy rozlaczeniu")
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'token': 'zly-token'})
+        self.assertEqual(response.status_code, 401)
+
+        first = (await sync_to_async(self.deliver)("Pierwsze"))[0]
+        await sync_to_async(self.deliver)("Drugie")
+        response = await self.async_client.get(self.url, {'token': self.token}, headers={'Last-Event-ID': str(first.pk)})
+        stream = response.streaming_content
+        await self.next_event(stream)
+        event = await self.next_event(stream)
+        self.assertIn("Drugie", event)
+        self.assertNotIn("Pierwsze", event)
+
+    def test_stream_unavailable_under_wsgi(self):
+        print("\nTest: kanal SSE pod WSGI odpowiada 501 zamiast blokowac worker")
+        response = self.client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(self.pubsub.subscriber_count(), 0)
+
+    async def test_subscription_released_on_disconnect(self):
+        print("\nTest: zamkniecie strumienia SSE zwalnia subskrypcje")
+        with self.settings(PUSH_HEARTBEAT_SECONDS=0.01):
+            stream = _stream(self.student.pk, True, None)
+            await anext(stream)
+            self.assertEqual(self.pubsub.subscriber_count(user_channel(self.student.pk)), 1)
+            self.assertEqual(self.pubsub.subscriber_count(SLOTS_CHANNEL), 1)
+            #bez wiadomosci - komentarz heartbeat
+            self.assertEqual(await anext(stream), ": ping\n\n")
+            await stream.aclose()
+        self.assertEqual(self.pubsub.subscriber_count(), 0)
+
+    def test_push_failure_does_not_fail_committed_changes(self):
+        print("\nTest: blad kanalu push (np. Redis) nie psuje zapisanej zmiany")
+        with mock.patch.object(self.pubsub, 'publish', side_effect=ConnectionError("Redis niedostepny")), \
+                self.assertLogs('apps.notifications.push', level='ERROR') as logs:
+            created = self.deliver("Mimo awarii push")
+            publish_slot_change(42)
+        self.assertTrue(Notification.objects.filter(pk=created[0].pk).exists())
+        self.assertEqual(len(logs.records), 2)
@@ -1,10 +1,18 @@
-from django.urls import path
-from .views import NotificationViewSet
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import NotificationViewSet, NotificationInboxViewSet
+from .stream import notification_stream
+
+router = DefaultRouter()
+router.register(r'inbox', NotificationInboxViewSet, basename='notification-inbox')
 
 send_sms = NotificationViewSet.as_view({'post': 'send_sms'})
 send_email = NotificationViewSet.as_view({'post': 'send_email'})
 
 urlpatterns = [
     path('send_sms/', send_sms, name='send-sms'),
-    path('send_email/',send_email, name='send-email')
+    path('send_email/',send_email, name='send-email'),
+    #Server-Sent Events (tylko pod ASGI)
+    path('stream/', notification_stream, name='notification-stream'),
+    path('', include(router.urls)),
 ]
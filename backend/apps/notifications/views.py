@@ -1,10 +1,15 @@
 import os
 
-from rest_framework import viewsets
+from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
 
+from .inbox import get_unread_count, mark_read, mark_all_read
+from .models import Notification
+from .pagination import NotificationCursorPagination
+from .serializers import NotificationSerializer
+
 # Twilio
 from twilio.rest import Client
 
@@ -138,3 +143,43 @@ class NotificationViewSet(viewsets.ViewSet):
             "preview_html": preview_path,
             "message": "Mail wygenerowany w sandbox mode i zapisany do mail_preview.html"
         })
+
+
+class NotificationInboxViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    #skrzynka zalogowanego uzytkownika: lista (kursor, najnowsze najpierw), odczyt, licznik
+    #GET /api/notifications/inbox/?unread=1, GET /api/notifications/inbox/unread-count/
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_seen=False)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        try:
+            notification_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({"detail": "Nie znaleziono powiadomienia."}, status=status.HTTP_404_NOT_FOUND)
+        if not mark_read(request.user.pk, notification_id) and \
+                not Notification.objects.filter(pk=notification_id, recipient=request.user).exists():
+            return Response({"detail": "Nie znaleziono powiadomienia."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"unread_count": get_unread_count(request.user.pk)})
+
+    #POST /api/notifications/inbox/read-all/ {"up_to_id": 123} - up_to_id opcjonalne (powiadomienia
+    #widoczne na liscie), nowsze zostaja nieprzeczytane
+    @action(detail=False, methods=['post'], url_path='read-all')
+    def read_all(self, request):
+        up_to_id = request.data.get('up_to_id') if isinstance(request.data, dict) else None
+        if up_to_id is not None and (not isinstance(up_to_id, int) or isinstance(up_to_id, bool)):
+            return Response({"detail": "Nieprawidłowy parametr up_to_id."}, status=status.HTTP_400_BAD_REQUEST)
+        updated = mark_all_read(request.user.pk, up_to_id=up_to_id)
+        return Response({"updated": updated, "unread_count": get_unread_count(request.user.pk)})
+
+    #licznik z cache - odpytywany przez naglowek na kazdej stronie
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({"unread_count": get_unread_count(request.user.pk)})
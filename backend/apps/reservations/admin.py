@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Reservation
+from .models import Reservation, WaitlistEntry, SeatHold, LecturerWeeklyStats, OutboxEvent
 
 class ReservationAdmin(admin.ModelAdmin):
     list_display = ('student', 'slot_detail', 'status', 'booked_at')
@@ -21,4 +21,41 @@ class ReservationAdmin(admin.ModelAdmin):
         return self.slot_detail(obj)
     slot_detail_readonly.short_description='Szczegoly terminu'
 
-admin.site.register(Reservation, ReservationAdmin)
\ No newline at end of file
+admin.site.register(Reservation, ReservationAdmin)
+
+
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'slot', 'created_at')
+    search_fields = ('student__username', 'slot__lecturer__username')
+    ordering = ('slot', 'created_at', 'id')
+
+admin.site.register(WaitlistEntry, WaitlistEntryAdmin)
+
+
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ('student', 'slot', 'expires_at')
+    search_fields = ('student__username',)
+
+admin.site.register(SeatHold, SeatHoldAdmin)
+
+
+class LecturerWeeklyStatsAdmin(admin.ModelAdmin):
+    list_display = ('lecturer', 'subject', 'week_start', 'slots', 'seats', 'completed', 'cancelled', 'no_show_student')
+    list_filter = ('week_start',)
+    search_fields = ('lecturer__username', 'subject')
+    #wiersze utrzymywane automatycznie (apps.reservations.stats)
+    readonly_fields = (
+        'lecturer', 'subject', 'week_start', 'slots', 'seats', 'pending', 'confirmed', 'cancelled',
+        'completed', 'no_show_student', 'no_show_lecturer',
+    )
+
+admin.site.register(LecturerWeeklyStats, LecturerWeeklyStatsAdmin)
+
+
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'reservation_id', 'created_at', 'processed_at', 'attempts')
+    list_filter = ('event_type', 'processed_at')
+    search_fields = ('reservation_id',)
+    readonly_fields = ('event_type', 'reservation_id', 'payload', 'created_at', 'processed_at', 'attempts', 'last_error')
+
+admin.site.register(OutboxEvent, OutboxEventAdmin)
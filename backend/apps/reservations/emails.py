@@ -0,0 +1,114 @@
+"""
+Wysylka e-maili potwierdzajacych rezerwacje partiami po jednym polaczeniu SMTP.
+
+Relay outbox przekazuje jednemu zadaniu cala paczke rezerwacji. Wiadomosci (student
+i prowadzacy) sa budowane z jednego zapytania i wysylane przez wspolne polaczenie
+get_connection() - send_messages po jednej wiadomosci, zeby blad jednego adresu nie
+przerywal partii. Kazda wiadomosc ma wlasny klucz (zdarzenie + odbiorca): wyslane sa
+zapamietywane w cache i pomijane przy ponowieniu, ponawiane sa tylko te, ktore zawiodly.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+
+from .models import Reservation
+
+ROLES = ('student', 'lecturer')
+#jak dlugo pamietamy wyslane wiadomosci zdarzen outbox (odrzucanie duplikatow)
+SENT_TTL = 7 * 24 * 3600
+
+
+def _sent_key(event_id, role):
+    return f'outbox:email-sent:{event_id}:{role}' if event_id else None
+
+
+def _confirmation_message(reservation, role):
+    slot = reservation.slot
+    student = reservation.student
+    lecturer = slot.lecturer
+    context = {
+        'student_name': student.get_full_name() or student.username,
+        'lecturer_name': lecturer.get_full_name() or lecturer.username,
+        'start_time': slot.start_time.strftime('%Y-%m-%d %H:%M'),
+        'end_time': slot.end_time.strftime('%H:%M'),
+        'topic': reservation.topic if reservation.topic else "Brak tematu",
+        'status': reservation.get_status_display(),
+    }
+    if role == 'student':
+        subject = f"Potwierdzenie rezerwacji: {context['start_time']}"
+        body = render_to_string('email_templates/student_confirmation.txt', context)
+        to = student.email
+    else:
+        subject = f"NOWA Rezerwacja: {context['student_name']} w terminie {context['start_time']}"
+        body = render_to_string('email_templates/lecturer_confirmation.txt', context)
+        to = lecturer.email
+    return EmailMultiAlternatives(subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL, to=[to])
+
+
+def build_confirmation_messages(items):
+    """
+    items: iterowalne [id_rezerwacji, id_zdarzenia, rola] (rola None - obie wiadomosci).
+    Zwraca liste ((id_rezerwacji, id_zdarzenia, rola), wiadomosc) bez juz wyslanych.
+    """
+    items = [tuple(item) + (None,) * (3 - len(item)) for item in items]
+    reservations = Reservation.objects.select_related('slot', 'student', 'slot__lecturer').in_bulk(
+        {item[0] for item in items}
+    )
+    wanted = []
+    for reservation_id, event_id, role in items:
+        if reservation_id not in reservations:
+            #rezerwacja usunieta przed wysylka
+            continue
+        for message_role in ((role,) if role else ROLES):
+            wanted.append((reservation_id, event_id, message_role))
+
+    keys = {item: _sent_key(item[1], item[2]) for item in wanted}
+    already_sent = cache.get_many([key for key in keys.values() if key])
+    return [
+        (item, _confirmation_message(reservations[item[0]], item[2]))
+        for item in wanted if keys[item] not in already_sent
+    ]
+
+
+def send_batch(messages, connection=None):
+    """
+    messages: lista (klucz, wiadomosc). Jedno polaczenie SMTP dla calej partii.
+    Zwraca (wyslane_klucze, [(klucz, wyjatek), ...]).
+    """
+    if not messages:
+        return [], []
+    connection = connection or get_connection(fail_silently=False)
+    sent, failed = [], []
+    #otwarte polaczenie jest uzywane przez wszystkie send_messages ponizej
+    try:
+        connection.open()
+    except Exception as exc:
+        #serwer SMTP niedostepny - cala partia wraca do ponowienia
+        return [], [(key, exc) for key, _ in messages]
+    try:
+        for key, message in messages:
+            message.connection = connection
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                failed.append((key, exc))
+            else:
+                sent.append(key)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            #wiadomosci juz wyslane - blad QUIT nie moze ich oznaczyc jako niewyslane
+            pass
+
+    cache.set_many(
+        {_sent_key(item[1], item[2]): 1 for item in sent if item[1]},
+        timeout=SENT_TTL,
+    )
+    return sent, failed
+
+
+def send_confirmation_emails(items, connection=None):
+    """Buduje i wysyla potwierdzenia dla paczki rezerwacji. Zwraca (wyslane, nieudane)."""
+    return send_batch(build_confirmation_messages(items), connection=connection)
@@ -0,0 +1,128 @@
+"""
+Tymczasowe trzymanie miejsca w slocie (np. na czas wpisywania tematu w formularzu).
+
+Trzymanie zajmuje miejsce przez SEAT_HOLD_TTL_SECONDS i wygasa samo - bez zadania
+czyszczacego. Dwa magazyny o tym samym interfejsie:
+
+- CacheHoldStore (wspolny cache, np. Redis): licznik trzyman slotu podzielony na
+  koszyki czasowe (cache.incr), kazdy koszyk i wpis studenta maja TTL. Trzymanie
+  przyznawane jest optymistycznie: incr, sprawdzenie sumy, ewentualnie decr.
+- DatabaseHoldStore (gdy SEAT_HOLD_CACHE_ALIAS jest puste): tabela SeatHold, wygasle
+  wiersze pomijane w liczeniu i usuwane przy kolejnym trzymaniu w tym samym slocie.
+
+Cache w pamieci procesu (LocMemCache) nie jest wspoldzielony miedzy workerami,
+dlatego domyslnie uzywana jest baza.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, IntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import SeatHold
+
+#szerokosc koszyka licznika w cache; trzymanie moze byc liczone najwyzej tyle dluzej niz TTL
+HOLD_BUCKET_SECONDS = 30
+
+
+def get_hold_ttl():
+    return getattr(settings, 'SEAT_HOLD_TTL_SECONDS', 300)
+
+
+class DatabaseHoldStore:
+    def acquire(self, slot_id, student_id, free_seats, now):
+        """Zwraca czas wygasniecia albo None, gdy brak miejsca. Wywolywane pod blokada wiersza slotu."""
+        SeatHold.objects.filter(slot_id=slot_id, expires_at__lte=now).delete()
+        held = SeatHold.objects.filter(slot_id=slot_id).exclude(student_id=student_id).count()
+        if held >= free_seats:
+            return None
+        expires_at = now + timedelta(seconds=get_hold_ttl())
+        SeatHold.objects.update_or_create(slot_id=slot_id, student_id=student_id, defaults={'expires_at': expires_at})
+        return expires_at
+
+    def release(self, slot_id, student_id):
+        SeatHold.objects.filter(slot_id=slot_id, student_id=student_id).delete()
+
+    def held_seats(self, slot_id, student_id, now):
+        #podzapytanie - liczba trzyman innych studentow trafia do warunkowego UPDATE rezerwacji
+        held = SeatHold.objects.filter(slot_id=slot_id, expires_at__gt=now).exclude(student_id=student_id)
+        return Coalesce(
+            Subquery(held.order_by().values('slot_id').annotate(count=Count('id')).values('count')),
+            Value(0),
+            output_field=IntegerField(),
+        )
+
+
+class CacheHoldStore:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def _student_key(self, slot_id, student_id):
+        return f'holds:{slot_id}:student:{student_id}'
+
+    def _bucket_key(self, slot_id, bucket):
+        return f'holds:{slot_id}:bucket:{bucket}'
+
+    def _live_buckets(self, now):
+        #koszyki, w ktorych moga byc jeszcze niewygasle trzymania
+        current = int(now.timestamp()) // HOLD_BUCKET_SECONDS
+        span = -(-get_hold_ttl() // HOLD_BUCKET_SECONDS)
+        return range(current - span, current + 1)
+
+    def _held(self, slot_id, student_id, now):
+        #jeden odczyt get_many: liczniki koszykow i wpis studenta
+        bucket_keys = [self._bucket_key(slot_id, bucket) for bucket in self._live_buckets(now)]
+        student_key = self._student_key(slot_id, student_id)
+        values = self.cache.get_many(bucket_keys + [student_key])
+        total = sum(values.get(key, 0) for key in bucket_keys)
+        own = values.get(student_key)
+        if own is not None and self._bucket_key(slot_id, own) in bucket_keys:
+            total -= 1
+        return total, own
+
+    def acquire(self, slot_id, student_id, free_seats, now):
+        ttl = get_hold_ttl()
+        held, own = self._held(slot_id, student_id, now)
+        if own is not None:
+            #ponowne trzymanie tego samego studenta nie zajmuje drugiego miejsca
+            self.release(slot_id, student_id)
+            held, _ = self._held(slot_id, student_id, now)
+        if held >= free_seats:
+            return None
+
+        bucket = int(now.timestamp()) // HOLD_BUCKET_SECONDS
+        bucket_key = self._bucket_key(slot_id, bucket)
+        self.cache.add(bucket_key, 0, timeout=ttl + 2 * HOLD_BUCKET_SECONDS)
+        self.cache.set(self._student_key(slot_id, student_id), bucket, timeout=ttl)
+        self.cache.incr(bucket_key)
+        #rownolegle trzymania mogly zajac miejsca miedzy odczytem a incr - wtedy wycofujemy swoje
+        held, _ = self._held(slot_id, student_id, now)
+        if held >= free_seats:
+            self.release(slot_id, student_id)
+            return None
+        return now + timedelta(seconds=ttl)
+
+    def release(self, slot_id, student_id):
+        student_key = self._student_key(slot_id, student_id)
+        bucket = self.cache.get(student_key)
+        if bucket is None:
+            return
+        self.cache.delete(student_key)
+        try:
+            self.cache.decr(self._bucket_key(slot_id, bucket))
+        except ValueError:
+            #koszyk juz wygasl
+            pass
+
+    def held_seats(self, slot_id, student_id, now):
+        held, _ = self._held(slot_id, student_id, now)
+        return Value(held, output_field=IntegerField())
+
+
+def get_hold_store():
+    alias = getattr(settings, 'SEAT_HOLD_CACHE_ALIAS', '')
+    if alias:
+        return CacheHoldStore(caches[alias])
+    return DatabaseHoldStore()
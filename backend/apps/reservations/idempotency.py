@@ -0,0 +1,137 @@
+"""
+Obsluga naglowka Idempotency-Key dla zadan POST.
+
+Klient (np. aplikacja mobilna na slabym lączu) wysyla losowy klucz z kazdym POST.
+Pierwsze zadanie rezerwuje klucz i zapisuje odpowiedz; ponowienie z tym samym kluczem
+dostaje zapisana odpowiedz - bez walidacji, INSERT-ow, sygnalow i zadan Celery.
+Rezerwacja klucza to dzierzawa na IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS: jesli proces
+zginie przed zapisem odpowiedzi, ponowienie po tym czasie przejmuje klucz (zamiast 409
+do wygasniecia klucza). Limit powinien byc dluzszy niz timeout zadania HTTP.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_idempotency_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def get_processing_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS', 60))
+
+
+def _request_hash(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _release(record):
+    #tylko wlasna dzierzawa - klucz mogl juz przejac inny proces
+    IdempotencyKey.objects.filter(pk=record.pk, locked_until=record.locked_until, response_status__isnull=True).delete()
+
+
+def idempotent(view_method):
+    """
+    Dekorator metody widoku DRF. Dziala tylko dla POST z naglowkiem Idempotency-Key
+    i zalogowanego uzytkownika; pozostale zadania przechodza bez zmian.
+    Zapisywane sa odpowiedzi 2xx i 4xx - bledy 5xx zwalniaja klucz, zeby mozna bylo ponowic.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != 'POST' or not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"Nagłówek {IDEMPOTENCY_HEADER} może mieć najwyżej {MAX_KEY_LENGTH} znaków."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        now = timezone.now()
+        request_hash = _request_hash(request)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is not None and record.expires_at <= now:
+            record.delete()
+            record = None
+
+        if record is not None:
+            if record.request_hash != request_hash:
+                return Response(
+                    {"detail": "Ten klucz idempotencji został użyty z innym żądaniem."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.response_status is not None:
+                return _replay(record)
+            #przejecie porzuconej dzierzawy warunkowym UPDATE - wygrywa jedno ponowienie
+            locked_until = now + get_processing_timeout()
+            taken_over = IdempotencyKey.objects.filter(
+                Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+                pk=record.pk, response_status__isnull=True,
+            ).update(locked_until=locked_until)
+            if not taken_over:
+                return Response(
+                    {"detail": "Żądanie z tym kluczem jest wciąż przetwarzane."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            record.locked_until = locked_until
+        else:
+            #rezerwacja klucza w osobnej transakcji - rownolegle ponowienie zobaczy ja od razu
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user, key=key, request_hash=request_hash,
+                        expires_at=now + get_idempotency_ttl(), locked_until=now + get_processing_timeout(),
+                    )
+            except IntegrityError:
+                return Response(
+                    {"detail": "Żądanie z tym kluczem jest wciąż przetwarzane."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception as exc:
+            #bledy walidacji DRF zamieniamy na odpowiedz tutaj, zeby tez zostaly zapamietane
+            try:
+                response = self.handle_exception(exc)
+            except Exception:
+                _release(record)
+                raise
+
+        if response.status_code >= 500:
+            _release(record)
+        else:
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.locked_until = None
+            record.save(update_fields=['response_status', 'response_body', 'locked_until'])
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
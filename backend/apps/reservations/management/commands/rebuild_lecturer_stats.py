@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.reservations.models import LecturerWeeklyStats, Reservation
+from apps.reservations.stats import COUNTER_FIELDS, STATUS_FIELDS, stats_key
+from apps.schedules.models import AvailableSlot
+
+
+class Command(BaseCommand):
+    help = (
+        "Przelicza od nowa tabele statystyk LecturerWeeklyStats ze slotow i rezerwacji. "
+        "Sloty czytane sa partiami po id, wynik zapisywany w jednej transakcji."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help="Liczba slotow czytanych w jednej partii.",
+        )
+        parser.add_argument(
+            '--lecturer',
+            type=int,
+            help="Przelicz tylko statystyki podanego prowadzacego (id).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        slots = AvailableSlot.objects.order_by('pk')
+        if options['lecturer']:
+            slots = slots.filter(lecturer_id=options['lecturer'])
+
+        totals = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        last_pk = 0
+        processed = 0
+        while True:
+            # partia po kluczu (id > ostatnie), bez OFFSET
+            batch = list(
+                slots.filter(pk__gt=last_pk)
+                .values_list('pk', 'lecturer_id', 'subject', 'start_time', 'max_attendees')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            keys = {}
+            for slot_id, lecturer_id, subject, start_time, max_attendees in batch:
+                key = keys[slot_id] = stats_key(lecturer_id, subject, start_time)
+                totals[key]['slots'] += 1
+                totals[key]['seats'] += max_attendees
+
+            counts = (
+                Reservation.objects.filter(slot_id__in=list(keys))
+                .order_by().values('slot_id', 'status').annotate(count=Count('id'))
+            )
+            for row in counts:
+                totals[keys[row['slot_id']]][STATUS_FIELDS[row['status']]] += row['count']
+            processed += len(batch)
+            self.stdout.write(f"Przetworzono {processed} slotow")
+
+        rows = [
+            LecturerWeeklyStats(lecturer_id=lecturer_id, subject=subject, week_start=week, **counters)
+            for (lecturer_id, subject, week), counters in totals.items()
+        ]
+        with transaction.atomic():
+            existing = LecturerWeeklyStats.objects.all()
+            if options['lecturer']:
+                existing = existing.filter(lecturer_id=options['lecturer'])
+            existing.delete()
+            LecturerWeeklyStats.objects.bulk_create(rows, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Przeliczono statystyki: {len(rows)} wierszy z {processed} slotow."
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from apps.reservations.models import INACTIVE_STATUSES
+from apps.schedules.models import AvailableSlot
+
+
+class Command(BaseCommand):
+    help = (
+        "Porownuje licznik AvailableSlot.active_reservations_count z faktyczna liczba "
+        "aktywnych rezerwacji i naprawia rozbieznosci."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Tylko sprawdz liczniki (bez zapisu); konczy sie bledem, gdy sa rozbieznosci.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Liczba slotow aktualizowanych w jednej partii.",
+        )
+
+    def handle(self, *args, **options):
+        # jedno zapytanie z GROUP BY/HAVING zwraca tylko sloty z blednym licznikiem
+        mismatched = (
+            AvailableSlot.objects
+            .annotate(real_count=Count('reservations', filter=~Q(reservations__status__in=INACTIVE_STATUSES)))
+            .exclude(active_reservations_count=F('real_count'))
+            .order_by()
+            .values_list('pk', 'active_reservations_count', 'real_count')
+        )
+
+        # rozbieznosci jest zwykle niewiele, a zapisy w trakcie iteracji kursora sa w SQLite niebezpieczne
+        mismatched = list(mismatched)
+        total = len(mismatched)
+        batch = []
+        for slot_id, stored, real in mismatched:
+            self.stdout.write(f"Slot {slot_id}: licznik={stored}, faktycznie={real}")
+            if not options['check']:
+                batch.append(AvailableSlot(pk=slot_id, active_reservations_count=real))
+                if len(batch) >= options['batch_size']:
+                    self._flush(batch)
+                    batch = []
+        if batch:
+            self._flush(batch)
+
+        if options['check']:
+            if total:
+                raise CommandError(f"Znaleziono {total} slotow z niepoprawnym licznikiem rezerwacji.")
+            self.stdout.write(self.style.SUCCESS("Wszystkie liczniki rezerwacji sa poprawne."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Przeliczono liczniki rezerwacji, poprawiono {total} slotow."))
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            AvailableSlot.objects.bulk_update(batch, ['active_reservations_count'])
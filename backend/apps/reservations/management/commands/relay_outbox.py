@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.reservations.outbox import relay_outbox, get_relay_metrics, requeue_failed_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Przetwarza zalegle zdarzenia rezerwacji z tabeli outbox (powiadomienia, e-maile). "
+        "Z --interval dziala w petli - zamiennik zadania okresowego, gdy nie ma celery beat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help="Liczba zdarzen w jednej partii (domyslnie OUTBOX_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help="Powtarzaj co podana liczbe sekund.",
+        )
+        parser.add_argument(
+            '--metrics',
+            action='store_true',
+            help="Tylko wypisz metryki relaya (partie, opoznienie, zaleglosc) bez przetwarzania.",
+        )
+        parser.add_argument(
+            '--requeue',
+            action='store_true',
+            help="Przywroc do kolejki zdarzenia, ktore wyczerpaly OUTBOX_MAX_ATTEMPTS, przed przetwarzaniem.",
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            for name, value in sorted(get_relay_metrics().items()):
+                self.stdout.write(f"{name}: {value}")
+            return
+        if options['requeue']:
+            self.stdout.write(f"Przywrocono do kolejki {requeue_failed_events()} zdarzen")
+        while True:
+            processed, failed = relay_outbox(batch_size=options['batch_size'])
+            if processed or failed or options['interval'] is None:
+                self.stdout.write(f"Przetworzono {processed} zdarzen, bledy: {failed}")
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
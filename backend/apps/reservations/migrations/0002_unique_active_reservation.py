@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('Cancelled', 'No-Show Student', 'No-Show Lecturer')), _negated=True), fields=('slot', 'student'), name='unique_active_reservation'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0008_calendarfeedtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservations', '0002_unique_active_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.TextField(blank=True, null=True, verbose_name='Temat spotkania')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data zapisu na listę')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='schedules.availableslot', verbose_name='Slot')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='Oczekujący student')),
+            ],
+            options={
+                'verbose_name': 'Wpis na liście oczekujących',
+                'verbose_name_plural': 'Lista oczekujących',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['slot', 'created_at', 'id'], name='waitlist_slot_order_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(fields=('slot', 'student'), name='unique_waitlist_entry'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0008_calendarfeedtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservations', '0004_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires_at', models.DateTimeField(verbose_name='Wygasa')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='schedules.availableslot', verbose_name='Slot')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to=settings.AUTH_USER_MODEL, verbose_name='Student')),
+            ],
+            options={
+                'verbose_name': 'Trzymane miejsce',
+                'verbose_name_plural': 'Trzymane miejsca',
+                'indexes': [models.Index(fields=['slot', 'expires_at'], name='seat_hold_slot_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='seathold',
+            constraint=models.UniqueConstraint(fields=('slot', 'student'), name='unique_seat_hold'),
+        ),
+    ]
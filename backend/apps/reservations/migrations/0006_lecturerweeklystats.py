@@ -0,0 +1,42 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservations', '0005_seathold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturerWeeklyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(blank=True, default='', max_length=255, verbose_name='Przedmiot')),
+                ('week_start', models.DateField(verbose_name='Początek tygodnia')),
+                ('slots', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('no_show_student', models.IntegerField(default=0)),
+                ('no_show_lecturer', models.IntegerField(default=0)),
+                ('lecturer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_stats', to=settings.AUTH_USER_MODEL, verbose_name='Prowadzący')),
+            ],
+            options={
+                'verbose_name': 'Statystyka tygodniowa',
+                'verbose_name_plural': 'Statystyki tygodniowe',
+                'indexes': [models.Index(fields=['week_start'], name='weekly_stats_week_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lecturerweeklystats',
+            constraint=models.UniqueConstraint(fields=('lecturer', 'subject', 'week_start'), name='unique_weekly_stats'),
+        ),
+    ]
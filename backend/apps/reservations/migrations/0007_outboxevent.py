@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:59
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0006_lecturerweeklystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('reservation.created', 'Utworzenie rezerwacji'), ('reservation.status_changed', 'Zmiana statusu rezerwacji'), ('reservation.deleted', 'Usunięcie rezerwacji')], max_length=64, verbose_name='Typ zdarzenia')),
+                ('reservation_id', models.BigIntegerField(verbose_name='Rezerwacja')),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie outbox',
+                'verbose_name_plural': 'Zdarzenia outbox',
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-18 22:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_dispatched(apps, schema_editor):
+    #zdarzenia przetworzone przed migracja mialy e-maile kolejkowane razem z powiadomieniami
+    OutboxEvent = apps.get_model('reservations', 'OutboxEvent')
+    OutboxEvent.objects.filter(processed_at__isnull=False).update(emails_dispatched_at=F('processed_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0008_idempotencykey_locked_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='emails_dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(
+                condition=models.Q(('emails_dispatched_at__isnull', True), ('event_type', 'reservation.created')),
+                fields=['id'], name='outbox_emails_pending_idx',
+            ),
+        ),
+        migrations.RunPython(mark_existing_dispatched, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,50 @@
 from django.db import models
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from django.db import transaction
 
 # Importy z Twoich aplikacji
 from apps.schedules.models import AvailableSlot
 
+# Statusy, ktore nie zajmuja miejsca w slocie
+INACTIVE_STATUSES = ('Cancelled', 'No-Show Student', 'No-Show Lecturer')
+# Statusy liczone do limitu rezerwacji studenta (User.open_reservations_count)
+OPEN_STATUSES = ('Pending', 'Confirmed')
+
+
+def adjust_active_reservations_count(slot_id, delta):
+    """Zmienia licznik aktywnych rezerwacji slotu o delta (pojedynczy UPDATE, bez odczytu)."""
+    if not slot_id or not delta:
+        return
+    queryset = AvailableSlot.objects.filter(pk=slot_id)
+    if delta < 0:
+        # licznik nie moze zejsc ponizej zera
+        queryset = queryset.filter(active_reservations_count__gte=-delta)
+    queryset.update(active_reservations_count=F('active_reservations_count') + delta)
+
+
+def adjust_open_reservations_count(student_id, delta):
+    """Zmienia licznik otwartych rezerwacji studenta o delta (pojedynczy UPDATE)."""
+    from django.contrib.auth import get_user_model
+
+    if not student_id or not delta:
+        return
+    queryset = get_user_model().objects.filter(pk=student_id)
+    if delta < 0:
+        queryset = queryset.filter(open_reservations_count__gte=-delta)
+    queryset.update(open_reservations_count=F('open_reservations_count') + delta)
+
+
+class ReservationQuerySet(models.QuerySet):
+    def with_slot_details(self):
+        #slot i prowadzacy w tym samym zapytaniu - SlotDetailsSerializer nie dociaga ich per wiersz
+        #(liczba rezerwacji slotu to kolumna active_reservations_count, bez COUNT)
+        return self.select_related('slot', 'slot__lecturer')
+
 
 class Reservation(models.Model):
     # Statusy rezerwacji
@@ -52,12 +90,91 @@ class Reservation(models.Model):
         verbose_name='Data utworzenia rezerwacji'
     )
 
+    objects = ReservationQuerySet.as_manager()
+
     class Meta:
         # Unikalność rezerwacji na slot dla studenta (opcjonalnie, ale dobra praktyka)
         # Możesz chcieć dodać tu: unique_together = (('slot', 'student'),)
         ordering = ['slot__start_time']
         verbose_name = 'Rezerwacja'
         verbose_name_plural = 'Rezerwacje'
+        constraints = [
+            #student moze miec w slocie tylko jedna aktywna rezerwacje (anulowane nie blokuja ponownej)
+            models.UniqueConstraint(
+                fields=['slot', 'student'],
+                condition=~Q(status__in=INACTIVE_STATUSES),
+                name='unique_active_reservation',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # zapamietujemy stan z bazy, zeby przy zapisie policzyc zmiane licznika slotu
+        loaded = dict(zip(field_names, values))
+        if 'slot_id' in loaded and 'status' in loaded:
+            instance._counted_slot_id = cls._counted_slot(loaded['slot_id'], loaded['status'])
+            # stan do korekty statystyk (apps.reservations.stats)
+            instance._loaded_state = (loaded['slot_id'], loaded['status'])
+        return instance
+
+    @staticmethod
+    def _counted_slot(slot_id, status):
+        # id slotu, w ktorego liczniku rezerwacja jest uwzgledniona (albo None)
+        return slot_id if status not in INACTIVE_STATUSES else None
+
+    @property
+    def is_active(self):
+        return self.status not in INACTIVE_STATUSES
+
+    def save(self, *args, update_counter=True, **kwargs):
+        # zapis rezerwacji i korekta licznika slotu w jednej transakcji
+        # update_counter=False - liczniki (slotu i studenta) zostaly juz zmienione przez wywolujacego
+        # (apps.reservations.services)
+        from .outbox import emit_event
+        from .stats import record_status_changes
+
+        with transaction.atomic():
+            if self._state.adding:
+                previous_slot_id = None
+                previous_state = None
+            elif hasattr(self, '_loaded_state'):
+                previous_slot_id = self._counted_slot_id
+                previous_state = self._loaded_state
+            else:
+                # stan z bazy nie jest znany (np. obiekt utworzony recznie z pk)
+                previous = Reservation.objects.filter(pk=self.pk).values('slot_id', 'status').first()
+                previous_slot_id = self._counted_slot(**previous) if previous else None
+                previous_state = (previous['slot_id'], previous['status']) if previous else None
+
+            super().save(*args, **kwargs)
+
+            current_slot_id = self._counted_slot(self.slot_id, self.status)
+            if update_counter and previous_slot_id != current_slot_id:
+                adjust_active_reservations_count(previous_slot_id, -1)
+                adjust_active_reservations_count(current_slot_id, 1)
+            self._counted_slot_id = current_slot_id
+
+            was_open = previous_state is not None and previous_state[1] in OPEN_STATUSES
+            if update_counter and was_open != (self.status in OPEN_STATUSES):
+                adjust_open_reservations_count(self.student_id, -1 if was_open else 1)
+
+            current_state = (self.slot_id, self.status)
+            if previous_state != current_state:
+                slots = {self.slot_id: self.slot} if Reservation.slot.is_cached(self) else None
+                if previous_state and previous_state[0] != self.slot_id:
+                    #przeniesienie do innego slotu - odejmujemy w starym, dodajemy w nowym
+                    changes = [(previous_state[0], previous_state[1], None), (self.slot_id, None, self.status)]
+                else:
+                    changes = [(self.slot_id, previous_state and previous_state[1], self.status)]
+                record_status_changes(changes, slots=slots)
+                if previous_state is None:
+                    emit_event(OutboxEvent.CREATED, self.pk, {'slot_id': self.slot_id, 'status': self.status})
+                elif previous_state[1] != self.status:
+                    emit_event(OutboxEvent.STATUS_CHANGED, self.pk, {
+                        'slot_id': self.slot_id, 'old_status': previous_state[1], 'new_status': self.status,
+                    })
+            self._loaded_state = current_state
 
     def __str__(self):
         return (
@@ -67,31 +184,208 @@ class Reservation(models.Model):
         )
 
 
-# --- LOGIKA SYGNAŁÓW CELERY (PO MODELU) ---
+class WaitlistEntryQuerySet(models.QuerySet):
+    def with_position(self):
+        #pozycja w kolejce (od 1) jako podzapytanie COUNT po indeksie slotu - bez COUNT na wiersz
+        #(funkcja okna liczylaby tylko wiersze po filtrze, np. wpisy jednego studenta)
+        ahead = WaitlistEntry.objects.filter(slot_id=OuterRef('slot_id')).filter(
+            Q(created_at__lt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__lt=OuterRef('id'))
+        ).order_by().values('slot_id').annotate(count=Count('id')).values('count')
+        return self.annotate(position=Coalesce(Subquery(ahead), Value(0)) + 1)
 
-@receiver(post_save, sender=Reservation)
-def handle_reservation_creation(sender, instance, created, **kwargs):
-    """
-    Podłączenie sygnału post_save do modelu Reservation.
-    Wywołuje asynchroniczne zadania Celery, jeśli rezerwacja została utworzona.
-    """
 
-    # Sprawdzamy, czy obiekt został faktycznie utworzony (a nie zaktualizowany)
-    if created:
-        from .tasks import create_reservation_notifications_task, send_reservation_confirmation_email
-        print("!!! SYGNAŁ POST_SAVE WYWOŁANY. Zadania Celery w kolejce (on_commit) !!!")
+class WaitlistEntry(models.Model):
+    #kolejka FIFO do pelnego slotu - zamiast ponawiania POST student czeka na zwolnione miejsce
+    slot = models.ForeignKey(
+        AvailableSlot,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='Slot'
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='Oczekujący student'
+    )
+    topic = models.TextField(blank=True, null=True, verbose_name="Temat spotkania")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Data zapisu na listę')
 
-        reservation_pk = instance.pk
+    objects = WaitlistEntryQuerySet.as_manager()
 
-        # Używamy transaction.on_commit, aby zadania Celery wystartowały
-        # TYLKO po tym, jak rezerwacja jest trwale zapisana (commit) w bazie danych.
+    class Meta:
+        #kolejnosc awansu
+        ordering = ['created_at', 'id']
+        verbose_name = 'Wpis na liście oczekujących'
+        verbose_name_plural = 'Lista oczekujących'
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'student'], name='unique_waitlist_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['slot', 'created_at', 'id'], name='waitlist_slot_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} czeka na slot {self.slot_id}"
+
+
+class SeatHold(models.Model):
+    #tymczasowe trzymanie miejsca na czas wypelniania formularza (magazyn zapasowy, gdy brak wspolnego cache)
+    #wygasle wpisy nie zajmuja miejsca i sa usuwane leniwie przy kolejnym trzymaniu w tym slocie
+    slot = models.ForeignKey(
+        AvailableSlot,
+        on_delete=models.CASCADE,
+        related_name='seat_holds',
+        verbose_name='Slot'
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='seat_holds',
+        verbose_name='Student'
+    )
+    expires_at = models.DateTimeField(verbose_name='Wygasa')
+
+    class Meta:
+        verbose_name = 'Trzymane miejsce'
+        verbose_name_plural = 'Trzymane miejsca'
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'student'], name='unique_seat_hold'),
+        ]
+        indexes = [
+            models.Index(fields=['slot', 'expires_at'], name='seat_hold_slot_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} trzyma miejsce w slocie {self.slot_id} do {self.expires_at}"
+
+
+class LecturerWeeklyStats(models.Model):
+    #tabela zbiorcza statystyk (apps.reservations.stats) - liczniki per prowadzacy, przedmiot i tydzien
+    lecturer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='weekly_stats',
+        verbose_name='Prowadzący'
+    )
+    #pusty napis - sloty bez przedmiotu
+    subject = models.CharField(max_length=255, blank=True, default='', verbose_name='Przedmiot')
+    week_start = models.DateField(verbose_name='Początek tygodnia')
+    slots = models.IntegerField(default=0)
+    seats = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    no_show_student = models.IntegerField(default=0)
+    no_show_lecturer = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Statystyka tygodniowa'
+        verbose_name_plural = 'Statystyki tygodniowe'
+        constraints = [
+            models.UniqueConstraint(fields=['lecturer', 'subject', 'week_start'], name='unique_weekly_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['week_start'], name='weekly_stats_week_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lecturer_id} {self.subject or '-'} {self.week_start}"
+
+
+class OutboxEvent(models.Model):
+    #zdarzenie zapisywane w tej samej transakcji co zmiana rezerwacji (transactional outbox)
+    #powiadomienia i e-maile wysyla z nich relay (apps.reservations.outbox), nie zadanie HTTP
+    CREATED = 'reservation.created'
+    STATUS_CHANGED = 'reservation.status_changed'
+    DELETED = 'reservation.deleted'
+    EVENT_CHOICES = [
+        (CREATED, 'Utworzenie rezerwacji'),
+        (STATUS_CHANGED, 'Zmiana statusu rezerwacji'),
+        (DELETED, 'Usunięcie rezerwacji'),
+    ]
+
+    event_type = models.CharField(max_length=64, choices=EVENT_CHOICES, verbose_name='Typ zdarzenia')
+    #bez klucza obcego - zdarzenie przezywa usuniecie rezerwacji
+    reservation_id = models.BigIntegerField(verbose_name='Rezerwacja')
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    #None - zdarzenie czeka na relay
+    processed_at = models.DateTimeField(null=True, blank=True)
+    #None przy przetworzonym utworzeniu - e-maile czekaja na zakolejkowanie (osobny etap relaya)
+    emails_dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name = 'Zdarzenie outbox'
+        verbose_name_plural = 'Zdarzenia outbox'
+        indexes = [
+            #relay czyta zalegle zdarzenia po id, czyszczenie - przetworzone po dacie
+            models.Index(fields=['processed_at', 'id'], name='outbox_pending_idx'),
+            #utworzenia z e-mailami czekajacymi na zakolejkowanie
+            models.Index(
+                fields=['id'], name='outbox_emails_pending_idx',
+                condition=Q(event_type='reservation.created', emails_dispatched_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.reservation_id} ({self.processed_at or 'oczekuje'})"
+
+
+class IdempotencyKey(models.Model):
+    #zapamietana odpowiedz na POST z naglowkiem Idempotency-Key (ponowienie zwraca ja bez ponownego zapisu)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    #skrot metody, sciezki i tresci zadania - ten sam klucz z innym zadaniem jest bledem klienta
+    request_hash = models.CharField(max_length=64)
+    #None - zadanie wciaz przetwarzane
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    #dzierzawa przetwarzania - po jej uplywie nieukonczony klucz moze przejac ponowienie
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Klucz idempotencji'
+        verbose_name_plural = 'Klucze idempotencji'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.response_status})"
+
+
+# --- SYGNAŁY ---
+
+def deleted_with_slot(origin):
+    # usuniecie zaczete od slotu (lub QuerySet slotow) - rezerwacje znikaja kaskadowo
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model is AvailableSlot
 
-        # a) Zadanie dla tworzenia obiektów Notification
-        transaction.on_commit(
-            lambda: create_reservation_notifications_task.delay(reservation_pk)
-        )
 
-        # b) Zadanie dla wysyłki e-maili
-        transaction.on_commit(
-            lambda: send_reservation_confirmation_email.delay(reservation_pk)
-        )
\ No newline at end of file
+@receiver(post_delete, sender=Reservation)
+def handle_reservation_deletion(sender, instance, origin=None, **kwargs):
+    # post_delete dziala rowniez przy kaskadowym usuwaniu i jest w transakcji usuwania
+    from .outbox import emit_event
+    from .stats import record_status_changes
+    slot_id, status = getattr(instance, '_loaded_state', (instance.slot_id, instance.status))
+    if not deleted_with_slot(origin):
+        # przy kaskadzie ze slotu licznik znika razem ze slotem, a statystyki odejmuje
+        # jednym UPDATE remove_slot_stats (apps.reservations.signals)
+        adjust_active_reservations_count(instance._counted_slot(instance.slot_id, instance.status), -1)
+        record_status_changes([(slot_id, status, None)])
+    if status in OPEN_STATUSES:
+        adjust_open_reservations_count(instance.student_id, -1)
+    #dane potrzebne do powiadomienia - wiersza rezerwacji juz nie bedzie
+    emit_event(OutboxEvent.DELETED, instance.pk, {
+        'slot_id': slot_id, 'student_id': instance.student_id, 'status': status,
+    })
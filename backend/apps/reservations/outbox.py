@@ -0,0 +1,292 @@
+"""
+Transactional outbox dla zdarzen rezerwacji.
+
+Reservation.save, sygnal usuniecia i bulk_change_statuses zapisuja OutboxEvent w tej samej
+transakcji co zmiane (jeden INSERT), zamiast kolejkowac zadania Celery po commicie - zadanie
+HTTP nie czeka na broker, a wycofana transakcja nie zostawia zdarzenia.
+
+Relay (relay_outbox: zadanie okresowe reservations.relay_outbox albo komenda relay_outbox)
+czyta zalegle zdarzenia partiami po id i tworzy powiadomienia jednym bulk_create na partie.
+Zdarzenia sa oznaczane jako przetworzone w tej samej transakcji co powiadomienia, wiec
+powiadomienie powstaje dokladnie raz. Partia z bledem jest powtarzana po jednym zdarzeniu;
+zdarzenie, ktore zawiodlo OUTBOX_MAX_ATTEMPTS razy, zostaje w tabeli z opisem bledu
+(requeue_failed_events / relay_outbox --requeue przywraca je do kolejki).
+
+E-maile sa osobnym etapem: przetworzone utworzenia z pustym emails_dispatched_at sa kolejkowane
+paczkami (apps.reservations.emails) i oznaczane po zakolejkowaniu. Niedostepny broker nie
+wycofuje powiadomien i nie zuzywa prob - paczka czeka do nastepnego uruchomienia. E-maile sa
+dostarczane co najmniej raz, duplikaty odrzuca wysylka (klucz zdarzenia i odbiorcy w cache).
+
+Serie powiadomien dla jednego odbiorcy w partii sa laczone w zbiorcze (apps.notifications.digest).
+Wielkosc partii i opoznienie (wiek najstarszego zdarzenia) trafiaja do cache - get_relay_metrics.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent, Reservation
+
+DEFAULT_BATCH_SIZE = 500
+METRICS_KEY = 'outbox:relay-metrics'
+
+
+def emit_event(event_type, reservation_id, payload=None):
+    #wywolywane wewnatrz transakcji zmiany rezerwacji
+    OutboxEvent.objects.create(event_type=event_type, reservation_id=reservation_id, payload=payload or {})
+
+
+def emit_events(events):
+    """events: iterowalne (typ, id_rezerwacji, payload) - jeden INSERT dla calej paczki."""
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type=event_type, reservation_id=reservation_id, payload=payload)
+        for event_type, reservation_id, payload in events
+    ])
+
+
+def _format_start(slot):
+    return timezone.localtime(slot.start_time).strftime('%Y-%m-%d %H:%M')
+
+
+def build_notifications(events):
+    """Powiadomienia dla partii zdarzen (stala liczba zapytan niezaleznie od wielkosci partii)."""
+    from apps.notifications.models import Notification
+    from apps.schedules.models import AvailableSlot
+
+    labels = dict(Reservation.STATUS_CHOICES)
+    reservation_ids = {event.reservation_id for event in events if event.event_type != OutboxEvent.DELETED}
+    reservations = Reservation.objects.select_related('slot', 'slot__lecturer', 'student').in_bulk(reservation_ids)
+
+    deleted = [event for event in events if event.event_type == OutboxEvent.DELETED]
+    slots = AvailableSlot.objects.select_related('lecturer').in_bulk(
+        {event.payload.get('slot_id') for event in deleted}
+    )
+    students = get_user_model().objects.in_bulk({event.payload.get('student_id') for event in deleted})
+
+    notifications = []
+    for event in events:
+        if event.event_type == OutboxEvent.DELETED:
+            if event.payload.get('status') not in ('Pending', 'Confirmed'):
+                continue
+            slot = slots.get(event.payload.get('slot_id'))
+            student = students.get(event.payload.get('student_id'))
+            if student is None:
+                continue
+            if slot is None:
+                #rezerwacja usunieta razem ze slotem - informujemy studenta
+                notifications.append(Notification(
+                    recipient=student,
+                    message="Termin Twojej konsultacji został usunięty przez prowadzącego.",
+                    notification_type='SLOT_UPDATE',
+                ))
+            else:
+                notifications.append(Notification(
+                    recipient=slot.lecturer,
+                    message=f"{student.get_full_name() or student.username} zrezygnował(a) z terminu {_format_start(slot)}.",
+                    notification_type='RESERVATION_CANCELLATION',
+                ))
+            continue
+
+        reservation = reservations.get(event.reservation_id)
+        if reservation is None:
+            #rezerwacja usunieta przed relayem - informuje o tym zdarzenie DELETED
+            continue
+        slot = reservation.slot
+        lecturer = slot.lecturer
+        if event.event_type == OutboxEvent.CREATED:
+            notifications.append(Notification(
+                recipient=lecturer,
+                message=f"Masz nowa rezerwacje od {reservation.student.get_full_name()} w terminie {slot.start_time.strftime('%H:%M')}.",
+                notification_type='NEW_RESERVATION',
+                reservation=reservation,
+            ))
+            notifications.append(Notification(
+                recipient=reservation.student,
+                message=f"Twoja rezerwacja u {lecturer.get_full_name()} na dzień {slot.start_time.strftime('%Y-%m-%d')} została potwierdzona.",
+                notification_type='RESERVATION_CONFIRMATION',
+                reservation=reservation,
+            ))
+        elif event.event_type == OutboxEvent.STATUS_CHANGED:
+            new_status = event.payload.get('new_status')
+            notifications.append(Notification(
+                recipient=reservation.student,
+                message=(
+                    f"Status Twojej rezerwacji u {lecturer.get_full_name()} "
+                    f"z dnia {_format_start(slot)} "
+                    f"zmieniono na: {labels.get(new_status, new_status)}."
+                ),
+                notification_type='STATUS_CHANGE',
+                reservation=reservation,
+            ))
+            if new_status == 'Cancelled':
+                notifications.append(Notification(
+                    recipient=lecturer,
+                    message=f"Rezerwacja {reservation.student.get_full_name() or reservation.student.username} na termin {_format_start(slot)} została anulowana.",
+                    notification_type='RESERVATION_CANCELLATION',
+                    reservation=reservation,
+                ))
+    return notifications
+
+
+def _dispatch(events):
+    from apps.notifications.digest import coalesce
+    from apps.notifications.inbox import deliver
+
+    notifications, digests = coalesce(build_notifications(events))
+    deliver(notifications)
+    OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+        processed_at=timezone.now(), attempts=F('attempts') + 1, last_error='',
+    )
+    return len(notifications), digests
+
+
+def _pending_emails():
+    return OutboxEvent.objects.filter(
+        event_type=OutboxEvent.CREATED, processed_at__isnull=False, emails_dispatched_at__isnull=True,
+    )
+
+
+def _relay_emails(batch_size):
+    """Kolejkuje potwierdzenia dla przetworzonych utworzen. Zwraca (zakolejkowane, bledne)."""
+    from .emails import send_confirmation_emails
+    from .tasks import send_confirmation_emails_task
+
+    direct = getattr(settings, 'OUTBOX_DISPATCH', 'celery') == 'direct'
+    email_batch_size = getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+    with transaction.atomic():
+        events = list(_pending_emails().select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        dispatched = 0
+        #jedno zadanie na EMAIL_BATCH_SIZE rezerwacji zamiast zadania na rezerwacje
+        for start in range(0, len(events), email_batch_size):
+            chunk = events[start:start + email_batch_size]
+            items = [[event.reservation_id, event.pk, None] for event in chunk]
+            try:
+                if direct:
+                    #bez brokera - wysylka w procesie relaya (wyslane nie sa powtarzane)
+                    _, failed = send_confirmation_emails(items)
+                    if failed:
+                        raise failed[0][1]
+                else:
+                    send_confirmation_emails_task.delay(items)
+            except Exception as exc:
+                #blad przejsciowy (broker, SMTP) - bez zwiekszania attempts, reszta przy nastepnym uruchomieniu
+                OutboxEvent.objects.filter(pk__in=[event.pk for event in events[start:]]).update(
+                    last_error=f"{type(exc).__name__}: {exc}"[:2000],
+                )
+                return dispatched, len(events) - dispatched
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in chunk]).update(
+                emails_dispatched_at=timezone.now(), last_error='',
+            )
+            dispatched += len(chunk)
+        return dispatched, 0
+
+
+def _record_metrics(events, failed, notifications, digests):
+    #odczyt-zapis bez blokady - przy rownoleglych relayach licznik moze zgubic partie
+    now = timezone.now()
+    lag = (now - min(event.created_at for event in events)).total_seconds()
+    metrics = cache.get(METRICS_KEY) or {
+        'batches': 0, 'events': 0, 'failed': 0, 'notifications': 0, 'digests': 0, 'max_lag_seconds': 0,
+    }
+    metrics.update({
+        'batches': metrics['batches'] + 1,
+        'events': metrics['events'] + len(events),
+        'failed': metrics['failed'] + failed,
+        'notifications': metrics['notifications'] + notifications,
+        'digests': metrics['digests'] + digests,
+        'max_lag_seconds': max(metrics['max_lag_seconds'], round(lag, 3)),
+        'last_batch_size': len(events),
+        'last_lag_seconds': round(lag, 3),
+        'last_run': now.isoformat(),
+    })
+    cache.set(METRICS_KEY, metrics, timeout=None)
+
+
+def get_relay_metrics():
+    """Liczniki relaya z cache oraz biezaca zaleglosc (liczba i wiek najstarszego zdarzenia)."""
+    pending = OutboxEvent.objects.filter(processed_at__isnull=True)
+    oldest = pending.order_by('id').values_list('created_at', flat=True).first()
+    return {
+        **(cache.get(METRICS_KEY) or {}),
+        'pending': pending.count(),
+        'emails_pending': _pending_emails().count(),
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 3) if oldest else None,
+    }
+
+
+def _relay_batch(batch_size):
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    with transaction.atomic():
+        #skip_locked - rownolegle relaye nie biora tych samych zdarzen (SQLite ignoruje blokade)
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=max_attempts)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0, 0
+        try:
+            with transaction.atomic():
+                notifications, digests = _dispatch(events)
+            _record_metrics(events, 0, notifications, digests)
+            return len(events), 0
+        except Exception:
+            pass
+
+        #partia z bledem - po jednym zdarzeniu, zeby jedno zle zdarzenie nie blokowalo reszty
+        failed = notifications = digests = 0
+        for event in events:
+            try:
+                with transaction.atomic():
+                    created, merged = _dispatch([event])
+                notifications += created
+                digests += merged
+            except Exception as exc:
+                failed += 1
+                OutboxEvent.objects.filter(pk=event.pk).update(
+                    attempts=F('attempts') + 1, last_error=f"{type(exc).__name__}: {exc}"[:2000],
+                )
+        _record_metrics(events, failed, notifications, digests)
+        return len(events), failed
+
+
+def relay_outbox(batch_size=None, max_batches=None):
+    """Przetwarza zalegle zdarzenia partiami. Zwraca (przetworzone, bledne)."""
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    processed = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        count, errors = _relay_batch(batch_size)
+        processed += count - errors
+        failed += errors
+        batches += 1
+        #niepelna partia albo bledy - reszta przy nastepnym uruchomieniu
+        if count < batch_size or errors:
+            break
+    #e-maile po powiadomieniach - blad brokera nie wplywa na wynik ani liczbe prob zdarzen
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count, errors = _relay_emails(batch_size)
+        batches += 1
+        if count < batch_size or errors:
+            break
+    return processed, failed
+
+
+def requeue_failed_events():
+    """Przywraca do kolejki zdarzenia, ktore wyczerpaly OUTBOX_MAX_ATTEMPTS. Zwraca ich liczbe."""
+    return OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__gte=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5),
+    ).update(attempts=0)
+
+
+def purge_processed_events(days=None):
+    days = days if days is not None else getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    #utworzenia z niezakolejkowanymi e-mailami zostaja do skutku
+    deleted, _ = OutboxEvent.objects.filter(
+        processed_at__lt=timezone.now() - timedelta(days=days),
+    ).exclude(event_type=OutboxEvent.CREATED, emails_dispatched_at__isnull=True).delete()
+    return deleted
@@ -0,0 +1,6 @@
+from apps.schedules.pagination import KeysetPagination
+
+
+class ReservationCursorPagination(KeysetPagination):
+    # kolejnosc jak w Meta.ordering rezerwacji (termin slotu), id rozstrzyga remisy
+    ordering = ('slot__start_time', 'id')
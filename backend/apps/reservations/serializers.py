@@ -1,13 +1,14 @@
 
 from rest_framework import serializers
-from .models import Reservation
-from apps.schedules.models import AvailableSlot
-from django.utils import timezone
+from .models import Reservation, WaitlistEntry
+from apps.schedules.models import AvailableSlot, AvailabilityRule
+from apps.schedules.recurrence import materialize_occurrence, OccurrenceError
+from .services import book_slot, BookingError, waitlist_position
 
 
 class SlotDetailsSerializer(serializers.ModelSerializer):
     lecturer_details = serializers.CharField(source='lecturer.get_full_name', read_only=True)
-    reservations_count = serializers.SerializerMethodField()
+    reservations_count = serializers.IntegerField(source='active_reservations_count', read_only=True)
 
     class Meta:
         model = AvailableSlot
@@ -24,60 +25,93 @@ class SlotDetailsSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('lecturer_details',)
 
-    def get_reservations_count(self, obj):
-        return obj.reservations.exclude(
-            status__in=['Cancelled', 'No-Show Student', 'No-Show Lecturer']
-        ).count()
-
 
 class ReservationSerializer(serializers.ModelSerializer):
     slot = SlotDetailsSerializer(read_only=True)
     slot_id = serializers.IntegerField(write_only=True, required=False)
+    #rezerwacja wystapienia reguly cyklicznej, ktore nie ma jeszcze wiersza AvailableSlot
+    rule_id = serializers.IntegerField(write_only=True, required=False)
+    occurrence_start = serializers.DateTimeField(write_only=True, required=False)
 
     class Meta:
         model = Reservation
-        fields = ('id', 'slot', 'slot_id', 'student', 'topic', 'status', 'booked_at')
+        fields = ('id', 'slot', 'slot_id', 'rule_id', 'occurrence_start', 'student', 'topic', 'status', 'booked_at')
         read_only_fields = ('student', 'status', 'booked_at')
 
     def create(self, validated_data):
-        validated_data['status'] = 'Pending'
-        slot_id = validated_data.pop('slot_id', None)
-        if slot_id:
-            validated_data['slot_id'] = slot_id
-        reservation = Reservation.objects.create(**validated_data)
+        #przyjecie rezerwacji (sprawdzenie miejsc) odbywa sie atomowo w book_slot
+        slot_id = validated_data.get('slot_id')
+        if slot_id is None:
+            #wystapienie reguly zapisujemy w bazie dopiero przy rezerwacji - w transakcji
+            #perform_create, wiec odrzucona rezerwacja nie zostawia zmaterializowanego slotu
+            slot_id = self._materialize_occurrence(validated_data['rule_id'], validated_data['occurrence_start']).pk
+        try:
+            reservation = book_slot(
+                slot_id,
+                validated_data['student'],
+                topic=validated_data.get('topic'),
+            )
+        except BookingError as e:
+            if e.code == 'full':
+                #zamiast ponawiac zadanie student moze czekac w kolejce
+                raise serializers.ValidationError(
+                    f"{e} Możesz zapisać się na listę oczekujących (/api/reservations/waitlist/)."
+                )
+            raise serializers.ValidationError(str(e))
+        #slot z prowadzacym do odpowiedzi jednym zapytaniem (zamiast dwoch leniwych)
+        reservation.slot = AvailableSlot.objects.select_related('lecturer').get(pk=reservation.slot_id)
         return reservation
 
-    def validate_slot_id(self, value):
+    def _materialize_occurrence(self, rule_id, occurrence_start):
         try:
-            AvailableSlot.objects.get(id=value)
-        except AvailableSlot.DoesNotExist:
-            raise serializers.ValidationError("Ten slot nie istnieje.")
-        return value
+            rule = AvailabilityRule.objects.get(pk=rule_id)
+            slot, _ = materialize_occurrence(rule, occurrence_start)
+        except AvailabilityRule.DoesNotExist:
+            raise serializers.ValidationError("Ta reguła nie istnieje.")
+        except OccurrenceError as e:
+            raise serializers.ValidationError(str(e))
+        return slot
 
     def validate(self, data):
         # Tylko waliduj gdy tworzymy rezerwację (POST)
         if self.instance is None:
-            slot_id = self.initial_data.get('slot_id')
+            #starsi klienci wysylaja id slotu jako 'slot'
+            slot_id = data.get('slot_id') or self.initial_data.get('slot')
+            if not slot_id and data.get('rule_id') and data.get('occurrence_start'):
+                #wystapienie reguly materializuje create (w transakcji rezerwacji)
+                data.pop('slot_id', None)
+                return data
             if not slot_id:
                 raise serializers.ValidationError("Slot jest wymagany.")
-
             try:
-                slot = AvailableSlot.objects.get(id=slot_id)
-            except AvailableSlot.DoesNotExist:
+                data['slot_id'] = int(slot_id)
+            except (TypeError, ValueError):
                 raise serializers.ValidationError("Ten slot nie istnieje.")
+            #istnienie slotu, termin, aktywnosc i wolne miejsca sprawdza book_slot
+            #w jednym warunkowym UPDATE - tutaj nie liczymy rezerwacji
+        else:
+            #zmiana terminu ominelaby przyjecie w book_slot - tylko nowa rezerwacja
+            moved = [field for field in ('slot_id', 'rule_id', 'occurrence_start', 'slot') if field in self.initial_data]
+            if moved:
+                raise serializers.ValidationError(
+                    {field: "Nie można zmienić terminu istniejącej rezerwacji." for field in moved}
+                )
 
-            if slot.start_time <= timezone.now():
-                raise serializers.ValidationError("Nie można rezerwować terminów z przeszłości")
+        return data
 
-            if not slot.is_active:
-                raise serializers.ValidationError("Ten slot został tymczasowo wyłączony przez prowadzącego.")
 
-            confirmed_reservations = Reservation.objects.filter(
-                slot=slot,
-                status='Confirmed'
-            ).count()
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    slot = SlotDetailsSerializer(read_only=True)
+    slot_id = serializers.IntegerField(write_only=True)
+    position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ('id', 'slot', 'slot_id', 'topic', 'position', 'created_at')
+        read_only_fields = ('created_at',)
 
-            if confirmed_reservations >= slot.max_attendees:
-                raise serializers.ValidationError("Wybrany termin osiągnął maksymalną liczbę rezerwacji.")
+    def get_position(self, obj):
+        #lista ma adnotacje z WaitlistEntryQuerySet.with_position; pojedynczy wpis - jedno COUNT
+        position = getattr(obj, 'position', None)
+        return position if position is not None else waitlist_position(obj)
 
-        return data
\ No newline at end of file
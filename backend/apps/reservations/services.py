@@ -0,0 +1,408 @@
+"""
+Rezerwacja miejsca w slocie odporna na wyscigi.
+
+O przyjeciu rezerwacji decyduje jeden warunkowy UPDATE licznika miejsc:
+
+    UPDATE slot SET active_reservations_count = active_reservations_count + 1
+    WHERE id = ? AND is_active AND start_time > now AND active_reservations_count < max_attendees
+      AND NOT EXISTS (aktywna rezerwacja studenta nachodzaca na ten slot)
+
+Baza wykonuje go atomowo, wiec przy dowolnej liczbie rownoleglych zadan miejsce
+dostaje dokladnie max_attendees studentow - bez blokowania wiersza na czas walidacji.
+Ten sam UPDATE odrzuca slot, jesli student ma juz aktywna rezerwacje w tym czasie
+(w tym w tym samym slocie). Unikalny indeks czesciowy (unique_active_reservation)
+pozostaje zabezpieczeniem przed wyscigiem; blad INSERT wycofuje tez podbicie licznika.
+
+Limit otwartych rezerwacji studenta (MAX_OPEN_RESERVATIONS_PER_STUDENT) pilnuje podobny
+warunkowy UPDATE licznika User.open_reservations_count.
+
+Miejsca tymczasowo trzymane przez innych studentow (apps.reservations.holds) sa
+odejmowane od pojemnosci w tym samym UPDATE; trzymanie rezerwujacego jest zwalniane.
+
+Zwolnienie miejsca (anulowanie, nieobecnosc, usuniecie) w tej samej transakcji
+awansuje kolejnych studentow z listy oczekujacych (WaitlistEntry, FIFO). Przywrocenie
+nieaktywnej rezerwacji (readmit_reservation) przechodzi przez ten sam warunkowy UPDATE.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.schedules.cache import bump_lecturer_generation, bump_student_generation
+from apps.schedules.models import AvailableSlot
+from .holds import get_hold_store
+from .models import Reservation, WaitlistEntry, OutboxEvent, INACTIVE_STATUSES, OPEN_STATUSES
+from .outbox import emit_events
+from .stats import record_status_changes
+
+
+class BookingError(Exception):
+    """Rezerwacja odrzucona; `code` pozwala rozroznic przyczyne (np. w benchmarku)."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def _student_busy(student, exclude=None):
+    #aktywne rezerwacje studenta nachodzace na slot z zapytania zewnetrznego (OuterRef)
+    busy = Reservation.objects.filter(
+        student=student,
+        slot__start_time__lt=OuterRef('end_time'),
+        slot__end_time__gt=OuterRef('start_time'),
+    ).exclude(status__in=INACTIVE_STATUSES)
+    if exclude is not None:
+        busy = busy.exclude(pk=exclude)
+    return busy
+
+
+def _admit(slot_id, student, now, holds, exclude=None, bookable=True):
+    """
+    Warunkowy UPDATE licznika slotu: wolne miejsce (z trzymaniami innych) i brak kolizji
+    z aktywna rezerwacja studenta. bookable=False pomija termin i aktywnosc slotu
+    (przywracanie istniejacej rezerwacji przez prowadzacego, rowniez po terminie).
+    """
+    slots = AvailableSlot.objects.filter(
+        pk=slot_id,
+        #miejsca trzymane przez innych studentow (formularz rezerwacji) sa zajete
+        active_reservations_count__lt=F('max_attendees') - holds.held_seats(slot_id, student.pk, now),
+    )
+    if bookable:
+        slots = slots.filter(is_active=True, start_time__gt=now)
+    #obejmuje tez rezerwacje tego samego slotu (slot nachodzi sam na siebie)
+    return slots.filter(~Exists(_student_busy(student, exclude))).update(
+        active_reservations_count=F('active_reservations_count') + 1,
+    )
+
+
+def _rejection_reason(slot_id, student, now, exclude=None, bookable=True):
+    #jedno zapytanie tylko na sciezce odmowy - wyjasnia, dlaczego UPDATE nic nie zmienil
+    busy = _student_busy(student, exclude)
+    slot = AvailableSlot.objects.filter(pk=slot_id).annotate(
+        already_booked=Exists(busy.filter(slot_id=OuterRef('pk'))),
+        overlapping=Exists(busy),
+    ).values(
+        'is_active', 'start_time', 'active_reservations_count', 'max_attendees', 'already_booked', 'overlapping',
+    ).first()
+    if slot is None:
+        return BookingError("Ten slot nie istnieje.", 'not_found')
+    if bookable and slot['start_time'] <= now:
+        return BookingError("Nie można rezerwować terminów z przeszłości", 'past')
+    if bookable and not slot['is_active']:
+        return BookingError("Ten slot został tymczasowo wyłączony przez prowadzącego.", 'inactive')
+    if slot['already_booked']:
+        return BookingError("Juz masz rezerwacje na ten slot", 'duplicate')
+    if slot['overlapping']:
+        return BookingError("Masz już inną rezerwację w tym czasie.", 'overlap')
+    return BookingError("Wybrany termin osiągnął maksymalną liczbę rezerwacji.", 'full')
+
+
+def book_slot(slot_id, student, topic=None, status='Pending'):
+    """
+    Tworzy rezerwacje, jesli w slocie jest wolne miejsce, a student nie ma w tym czasie
+    innej aktywnej rezerwacji. Cala decyzja (stan slotu, pojemnosc, duplikat, kolizja)
+    zapada w jednym warunkowym UPDATE, ktory blokuje wiersz slotu do konca transakcji;
+    na sciezce sukcesu dochodzi tylko INSERT rezerwacji.
+    Rzuca BookingError, gdy rezerwacja nie jest mozliwa.
+    """
+    now = timezone.now()
+    holds = get_hold_store()
+    try:
+        with transaction.atomic():
+            if status in OPEN_STATUSES:
+                _take_open_reservation_quota(student, now)
+            if not _admit(slot_id, student, now, holds):
+                raise _rejection_reason(slot_id, student, now)
+
+            reservation = Reservation(slot_id=slot_id, student=student, topic=topic, status=status)
+            #liczniki slotu i studenta zostaly juz podbite warunkowymi UPDATE
+            reservation.save(update_counter=False)
+            #trzymane miejsce zamienilo sie w rezerwacje
+            holds.release(slot_id, student.pk)
+    except IntegrityError:
+        raise BookingError("Juz masz rezerwacje na ten slot", 'duplicate')
+    return reservation
+
+
+def get_open_reservation_limit():
+    return getattr(settings, 'MAX_OPEN_RESERVATIONS_PER_STUDENT', 0)
+
+
+def _take_open_reservation_quota(student, now):
+    """
+    Podbija licznik otwartych rezerwacji studenta warunkowym UPDATE (limit bez COUNT).
+    Dopiero gdy licznik osiagnal limit, przeliczamy faktyczne przyszle rezerwacje -
+    licznik nie maleje sam, gdy termin rezerwacji minie.
+    """
+    limit = get_open_reservation_limit()
+    users = get_user_model().objects.filter(pk=student.pk)
+    increment = {'open_reservations_count': F('open_reservations_count') + 1}
+    if not limit:
+        users.update(**increment)
+        return
+    if users.filter(open_reservations_count__lt=limit).update(**increment):
+        return
+    real = Reservation.objects.filter(
+        student=student, status__in=OPEN_STATUSES, slot__start_time__gt=now,
+    ).count()
+    users.update(open_reservations_count=real)
+    if real >= limit or not users.filter(open_reservations_count__lt=limit).update(**increment):
+        raise BookingError(f"Możesz mieć najwyżej {limit} nadchodzących rezerwacji.", 'quota')
+
+
+def hold_seat(slot_id, student):
+    """
+    Trzyma miejsce w slocie dla studenta przez SEAT_HOLD_TTL_SECONDS.
+    Zwraca czas wygasniecia; rzuca BookingError, gdy slot jest pelny (z trzymaniami) lub niedostepny.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        #blokada wiersza slotu szereguje trzymania i rezerwacje tego slotu
+        slot = AvailableSlot.objects.select_for_update().filter(pk=slot_id).annotate(
+            already_booked=Exists(_student_busy(student).filter(slot_id=OuterRef('pk'))),
+        ).values('is_active', 'start_time', 'active_reservations_count', 'max_attendees', 'already_booked').first()
+        if slot is None:
+            raise BookingError("Ten slot nie istnieje.", 'not_found')
+        if slot['start_time'] <= now:
+            raise BookingError("Nie można rezerwować terminów z przeszłości", 'past')
+        if not slot['is_active']:
+            raise BookingError("Ten slot został tymczasowo wyłączony przez prowadzącego.", 'inactive')
+        if slot['already_booked']:
+            raise BookingError("Juz masz rezerwacje na ten slot", 'duplicate')
+        free_seats = slot['max_attendees'] - slot['active_reservations_count']
+        expires_at = get_hold_store().acquire(slot_id, student.pk, free_seats, now)
+    if expires_at is None:
+        raise BookingError("Wszystkie wolne miejsca są zarezerwowane lub trzymane przez innych.", 'full')
+    return expires_at
+
+
+def release_hold(slot_id, student):
+    get_hold_store().release(slot_id, student.pk)
+
+
+def promote_from_waitlist(slot_id):
+    """
+    Zamienia kolejne wpisy z listy oczekujacych na rezerwacje, dopoki sa wolne miejsca.
+    Wywolywane w transakcji, ktora zwolnila miejsce; powiadomienia powstaja ze zdarzen
+    outbox zapisanych przez Reservation.save (apps.reservations.outbox).
+    """
+    promoted = []
+    while True:
+        entry = WaitlistEntry.objects.filter(slot_id=slot_id).select_related('student').first()
+        if entry is None:
+            break
+        try:
+            promoted.append(book_slot(slot_id, entry.student, topic=entry.topic))
+        except BookingError as e:
+            #student ma juz rezerwacje w tym slocie/czasie albo wyczerpal limit - wpis jest zbedny
+            if e.code not in ('duplicate', 'overlap', 'quota'):
+                break
+        entry.delete()
+    return promoted
+
+
+#komunikaty odmowy z perspektywy prowadzacego przywracajacego rezerwacje
+REACTIVATION_MESSAGES = {
+    'duplicate': "Student ma już aktywną rezerwację na ten slot.",
+    'overlap': "Student ma już inną rezerwację w tym czasie.",
+}
+
+
+def readmit_reservation(reservation_id, slot_id, student, new_status, now=None):
+    """
+    Przyjecie nieaktywnej rezerwacji z powrotem do slotu (np. Cancelled -> Confirmed):
+    ten sam warunkowy UPDATE co book_slot (pojemnosc, kolizje) i limit otwartych rezerwacji,
+    bez sprawdzania terminu. Podbija liczniki - zapis statusu musi je pominac.
+    """
+    now = now or timezone.now()
+    holds = get_hold_store()
+    try:
+        with transaction.atomic():
+            if new_status in OPEN_STATUSES:
+                _take_open_reservation_quota(student, now)
+            if not _admit(slot_id, student, now, holds, exclude=reservation_id, bookable=False):
+                raise _rejection_reason(slot_id, student, now, exclude=reservation_id, bookable=False)
+    except BookingError as e:
+        raise BookingError(REACTIVATION_MESSAGES.get(e.code, str(e)), e.code)
+
+
+def change_reservation_status(reservation, new_status):
+    """
+    Zmienia status; jesli rezerwacja zwalnia miejsce, awansuje oczekujacych.
+    Przywrocenie nieaktywnej rezerwacji przechodzi przez readmit_reservation;
+    rzuca BookingError, gdy slot jest pelny, student ma kolizje albo wyczerpal limit.
+    """
+    previous_status = reservation.status
+    try:
+        with transaction.atomic():
+            frees_seat = reservation.is_active and new_status in INACTIVE_STATUSES
+            takes_seat = not reservation.is_active and new_status not in INACTIVE_STATUSES
+            if takes_seat:
+                readmit_reservation(reservation.pk, reservation.slot_id, reservation.student, new_status)
+            reservation.status = new_status
+            #przy przywroceniu liczniki slotu i studenta podbil juz readmit_reservation
+            reservation.save(update_counter=not takes_seat)
+            if frees_seat:
+                promote_from_waitlist(reservation.slot_id)
+    except IntegrityError:
+        reservation.status = previous_status
+        raise BookingError(REACTIVATION_MESSAGES['duplicate'], 'duplicate')
+    except BookingError:
+        reservation.status = previous_status
+        raise
+    return reservation
+
+
+def delete_reservation(reservation):
+    with transaction.atomic():
+        frees_seat = reservation.is_active
+        slot_id = reservation.slot_id
+        reservation.delete()
+        if frees_seat:
+            promote_from_waitlist(slot_id)
+
+
+def join_waitlist(slot_id, student, topic=None):
+    """
+    Rezerwuje miejsce, jesli jest wolne, w przeciwnym razie dopisuje studenta do kolejki.
+    Zwraca (reservation, None) albo (None, entry).
+    """
+    try:
+        return book_slot(slot_id, student, topic=topic), None
+    except BookingError as e:
+        if e.code != 'full':
+            raise
+
+    try:
+        with transaction.atomic():
+            entry = WaitlistEntry.objects.create(slot_id=slot_id, student=student, topic=topic)
+            #miejsce moglo zwolnic sie miedzy odmowa a zapisem na liste
+            promoted = promote_from_waitlist(slot_id)
+    except IntegrityError:
+        raise BookingError("Jesteś już na liście oczekujących na ten slot.", 'already_waiting')
+
+    for reservation in promoted:
+        if reservation.student_id == student.pk:
+            return reservation, None
+    return None, entry
+
+
+def waitlist_position(entry):
+    #pozycja w kolejce liczona od 1 (jedno zapytanie COUNT po indeksie slotu)
+    ahead = WaitlistEntry.objects.filter(slot_id=entry.slot_id).filter(
+        Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id)
+    ).count()
+    return ahead + 1
+
+
+def _apply_counter_deltas(deltas, model=AvailableSlot, field='active_reservations_count'):
+    #jeden UPDATE na kazda roznice licznika (zwykle tylko -1), zamiast UPDATE na wiersz
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        queryset = model.objects.filter(pk__in=ids)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        queryset.update(**{field: F(field) + delta})
+
+
+def bulk_change_statuses(lecturer, new_statuses, allow_partial=False):
+    """
+    Zmienia statusy wielu rezerwacji prowadzacego: {id_rezerwacji: nowy_status}.
+    Wlasnosc sprawdzana jednym zapytaniem, zmiany zapisywane jednym UPDATE na status.
+    update() nie wysyla sygnalow, wiec liczniki, statystyki, cache i zdarzenia outbox (jeden
+    INSERT dla wszystkich zmian) obslugujemy tutaj. Przywracane rezerwacje (nieaktywna ->
+    aktywna) przechodza po jednej przez readmit_reservation.
+    Zwraca (zmienione_id, brakujace_id, {odrzucone_id: powod}).
+    """
+    with transaction.atomic():
+        rows = list(
+            Reservation.objects.select_for_update()
+            .filter(pk__in=new_statuses, slot__lecturer=lecturer)
+            .values('id', 'slot_id', 'student_id', 'status')
+        )
+        missing = sorted(set(new_statuses) - {row['id'] for row in rows})
+        if missing and not allow_partial:
+            return [], missing, {}
+
+        ids_by_status = defaultdict(list)
+        deltas = defaultdict(int)
+        open_deltas = defaultdict(int)
+        changed = []
+        readmitted = []
+        for row in rows:
+            new_status = new_statuses[row['id']]
+            if row['status'] == new_status:
+                continue
+            was_active = row['status'] not in INACTIVE_STATUSES
+            is_active = new_status not in INACTIVE_STATUSES
+            if is_active and not was_active:
+                #liczniki podbija warunkowy UPDATE przyjecia
+                readmitted.append(row)
+                continue
+            changed.append(row)
+            ids_by_status[new_status].append(row['id'])
+            if was_active != is_active:
+                deltas[row['slot_id']] -= 1
+            was_open = row['status'] in OPEN_STATUSES
+            if was_open != (new_status in OPEN_STATUSES):
+                open_deltas[row['student_id']] += -1 if was_open else 1
+        if not changed and not readmitted:
+            return [], missing, {}
+
+        for new_status, ids in ids_by_status.items():
+            Reservation.objects.filter(pk__in=ids).update(status=new_status)
+        _apply_counter_deltas(deltas)
+        _apply_counter_deltas(open_deltas, model=get_user_model(), field='open_reservations_count')
+
+        #po zwolnieniu miejsc - przywracana rezerwacja moze zajac miejsce zwolnione w tym samym zadaniu
+        rejected = {}
+        if readmitted:
+            students = get_user_model().objects.in_bulk({row['student_id'] for row in readmitted})
+            now = timezone.now()
+            for row in readmitted:
+                try:
+                    with transaction.atomic():
+                        readmit_reservation(row['id'], row['slot_id'], students[row['student_id']],
+                                            new_statuses[row['id']], now)
+                        #od razu, zeby kolejne przyjecie widzialo te rezerwacje jako aktywna
+                        Reservation.objects.filter(pk=row['id']).update(status=new_statuses[row['id']])
+                except BookingError as e:
+                    rejected[row['id']] = str(e)
+                except IntegrityError:
+                    rejected[row['id']] = REACTIVATION_MESSAGES['duplicate']
+                else:
+                    changed.append(row)
+            if rejected and not allow_partial:
+                transaction.set_rollback(True)
+                return [], missing, rejected
+        if not changed:
+            return [], missing, rejected
+
+        record_status_changes((row['slot_id'], row['status'], new_statuses[row['id']]) for row in changed)
+
+        #zwolnione miejsca dla listy oczekujacych (tylko sloty, ktore maja kolejke)
+        freed = [slot_id for slot_id, delta in deltas.items() if delta < 0]
+        if freed:
+            for slot_id in WaitlistEntry.objects.filter(slot_id__in=freed).values_list('slot_id', flat=True).distinct():
+                promote_from_waitlist(slot_id)
+
+        emit_events(
+            (OutboxEvent.STATUS_CHANGED, row['id'], {
+                'slot_id': row['slot_id'], 'old_status': row['status'], 'new_status': new_statuses[row['id']],
+            })
+            for row in changed
+        )
+        student_ids = [row['student_id'] for row in changed]
+
+        def after_commit():
+            bump_lecturer_generation(lecturer.pk)
+            bump_student_generation(*student_ids)
+
+        transaction.on_commit(after_commit)
+    return [row['id'] for row in changed], missing, rejected
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from apps.schedules.cache import bump_lecturer_generation, bump_student_generation
+from apps.schedules.models import AvailableSlot
+from .models import Reservation, deleted_with_slot
+from .stats import STATUS_FIELDS, apply_stats_deltas, record_slots, slot_key
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_slot_schedule(sender, instance, **kwargs):
+    # rezerwacja zmienia licznik miejsc slotu -> nowa generacja danych prowadzacego
+    slot_id = instance.slot_id
+    student_id = instance.student_id
+    #slot czytamy dopiero po commicie - zapis rezerwacji nie czeka na dodatkowy SELECT
+    lecturer_id = instance.slot.lecturer_id if Reservation.slot.is_cached(instance) else None
+
+    def bump():
+        slot_lecturer_id = lecturer_id or AvailableSlot.objects.filter(pk=slot_id).values_list(
+            'lecturer_id', flat=True
+        ).first()
+        bump_lecturer_generation(slot_lecturer_id)
+        bump_student_generation(student_id)
+
+    transaction.on_commit(bump)
+
+
+#pola slotu, od ktorych zalezy wiersz statystyk i liczba miejsc
+STATS_SLOT_FIELDS = ('lecturer', 'lecturer_id', 'subject', 'start_time', 'max_attendees')
+
+
+@receiver(pre_save, sender=AvailableSlot)
+def remember_slot_stats_state(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not set(update_fields) & set(STATS_SLOT_FIELDS):
+        return
+    instance._stats_previous = AvailableSlot.objects.filter(pk=instance.pk).only(
+        'lecturer_id', 'subject', 'start_time', 'max_attendees',
+    ).first()
+
+
+@receiver(post_save, sender=AvailableSlot)
+def update_slot_stats(sender, instance, created, **kwargs):
+    #sloty i miejsca w tabeli statystyk (bulk_create wywoluje record_slots samodzielnie)
+    if created:
+        record_slots([instance])
+        return
+    previous = instance.__dict__.pop('_stats_previous', None)
+    if previous is None:
+        return
+    old_key, new_key = slot_key(previous), slot_key(instance)
+    if old_key == new_key and previous.max_attendees == instance.max_attendees:
+        return
+    record_slots([previous], sign=-1)
+    record_slots([instance])
+    if old_key != new_key:
+        #rezerwacje slotu przechodza do nowego tygodnia/przedmiotu
+        counts = instance.reservations.order_by().values('status').annotate(count=Count('id'))
+        deltas = {old_key: {}, new_key: {}}
+        for row in counts:
+            field = STATUS_FIELDS[row['status']]
+            deltas[old_key][field] = -row['count']
+            deltas[new_key][field] = row['count']
+        apply_stats_deltas(deltas)
+
+
+@receiver(pre_delete, sender=AvailableSlot)
+def remember_slot_reservations(sender, instance, origin=None, **kwargs):
+    #przed kaskada - liczby rezerwacji slotu per status jednym zapytaniem
+    if deleted_with_slot(origin):
+        instance._stats_reservations = dict(
+            instance.reservations.order_by().values_list('status').annotate(count=Count('id'))
+        )
+
+
+@receiver(post_delete, sender=AvailableSlot)
+def remove_slot_stats(sender, instance, **kwargs):
+    #slot, jego miejsca i rezerwacje usuniete kaskadowo - jeden UPDATE wiersza statystyk
+    #(rezerwacje z innej kaskady, np. usuniecia uzytkownika, odejmuja sie same w post_delete)
+    changes = {'slots': -1, 'seats': -instance.max_attendees}
+    for status, count in instance.__dict__.pop('_stats_reservations', {}).items():
+        changes[STATUS_FIELDS[status]] = -count
+    apply_stats_deltas({slot_key(instance): changes})
+
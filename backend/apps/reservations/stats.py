@@ -0,0 +1,133 @@
+"""
+Statystyki prowadzacych (wykorzystanie miejsc, nieobecnosci, anulowania) z tabeli zbiorczej.
+
+LecturerWeeklyStats trzyma liczniki per (prowadzacy, przedmiot, tydzien terminu slotu).
+Liczniki sa korygowane przyrostowo w tej samej transakcji co zmiana: zapis rezerwacji
+(Reservation.save, sygnal usuniecia), zbiorcza zmiana statusow (bulk_change_statuses)
+oraz utworzenie/zmiana/usuniecie slotu (apps.reservations.signals, sciezki bulk_create).
+API statystyk czyta tylko te tabele; pelne przeliczenie robi komenda rebuild_lecturer_stats.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import LecturerWeeklyStats
+
+#status rezerwacji -> kolumna licznika
+STATUS_FIELDS = {
+    'Pending': 'pending',
+    'Confirmed': 'confirmed',
+    'Cancelled': 'cancelled',
+    'Completed': 'completed',
+    'No-Show Student': 'no_show_student',
+    'No-Show Lecturer': 'no_show_lecturer',
+}
+COUNTER_FIELDS = ('slots', 'seats', *STATUS_FIELDS.values())
+
+
+def week_start(value):
+    #poniedzialek tygodnia terminu (czas lokalny)
+    day = timezone.localtime(value).date()
+    return day - timedelta(days=day.weekday())
+
+
+def stats_key(lecturer_id, subject, start_time):
+    return lecturer_id, subject or '', week_start(start_time)
+
+
+def slot_key(slot):
+    return stats_key(slot.lecturer_id, slot.subject, slot.start_time)
+
+
+def _slot_keys(slot_ids):
+    from apps.schedules.models import AvailableSlot
+
+    rows = AvailableSlot.objects.filter(pk__in=set(slot_ids)).values_list('pk', 'lecturer_id', 'subject', 'start_time')
+    return {pk: stats_key(lecturer_id, subject, start) for pk, lecturer_id, subject, start in rows}
+
+
+def apply_stats_deltas(deltas):
+    """deltas: {klucz: {kolumna: zmiana}}. Jeden UPDATE na klucz; brakujace wiersze sa tworzone."""
+    pending = {}
+    for key, changes in deltas.items():
+        changes = {field: delta for field, delta in changes.items() if delta}
+        if changes:
+            pending[key] = changes
+    if len(pending) > 1:
+        #wiele kluczy (np. bulk_create slotow): brakujace wiersze zakladamy jednym INSERT
+        lookup = Q()
+        for lecturer_id, subject, week in pending:
+            lookup |= Q(lecturer_id=lecturer_id, subject=subject, week_start=week)
+        existing = set(
+            LecturerWeeklyStats.objects.filter(lookup).values_list('lecturer_id', 'subject', 'week_start')
+        )
+        LecturerWeeklyStats.objects.bulk_create([
+            LecturerWeeklyStats(lecturer_id=lecturer_id, subject=subject, week_start=week)
+            for lecturer_id, subject, week in pending if (lecturer_id, subject, week) not in existing
+        ], ignore_conflicts=True)
+
+    for (lecturer_id, subject, week), changes in pending.items():
+        rows = LecturerWeeklyStats.objects.filter(lecturer_id=lecturer_id, subject=subject, week_start=week)
+        increments = {field: F(field) + delta for field, delta in changes.items()}
+        if rows.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                LecturerWeeklyStats.objects.create(
+                    lecturer_id=lecturer_id, subject=subject, week_start=week, **changes
+                )
+        except IntegrityError:
+            #wiersz utworzyl rownolegly zapis
+            rows.update(**increments)
+
+
+def record_status_changes(changes, slots=None):
+    """
+    changes: iterowalne (slot_id, stary_status, nowy_status); None oznacza brak rezerwacji
+    (utworzenie albo usuniecie). slots: opcjonalnie {slot_id: slot} juz wczytanych slotow.
+    """
+    changes = [change for change in changes if change[1] != change[2]]
+    if not changes:
+        return
+    slots = slots or {}
+    keys = {slot_id: slot_key(slot) for slot_id, slot in slots.items()}
+    missing = {slot_id for slot_id, _, _ in changes if slot_id not in keys}
+    if missing:
+        keys.update(_slot_keys(missing))
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for slot_id, old_status, new_status in changes:
+        key = keys.get(slot_id)
+        if key is None:
+            continue
+        if old_status:
+            deltas[key][STATUS_FIELDS[old_status]] -= 1
+        if new_status:
+            deltas[key][STATUS_FIELDS[new_status]] += 1
+    apply_stats_deltas(deltas)
+
+
+def record_slots(slots, sign=1):
+    """Dolicza (sign=1) albo odejmuje (sign=-1) sloty i ich miejsca, np. po bulk_create."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for slot in slots:
+        key = slot_key(slot)
+        deltas[key]['slots'] += sign
+        deltas[key]['seats'] += sign * slot.max_attendees
+    apply_stats_deltas(deltas)
+
+
+def rates(row):
+    """Wskazniki liczone z sum licznikow (jeden wiersz tabeli albo agregat)."""
+    active = row['pending'] + row['confirmed'] + row['completed']
+    total = active + row['cancelled'] + row['no_show_student'] + row['no_show_lecturer']
+    attended_or_missed = row['completed'] + row['no_show_student']
+    return {
+        'reservations': total,
+        'utilization': round(active / row['seats'], 4) if row['seats'] else None,
+        'no_show_rate': round(row['no_show_student'] / attended_or_missed, 4) if attended_or_missed else None,
+        'cancellation_rate': round(row['cancelled'] / total, 4) if total else None,
+    }
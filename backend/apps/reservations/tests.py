@@ -3,12 +3,24 @@ from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
 
 #models
 from apps.users.models import User
 from apps.schedules.models import AvailableSlot
-from apps.reservations.models import Reservation
+from apps.reservations.models import Reservation, WaitlistEntry, IdempotencyKey, SeatHold, LecturerWeeklyStats, \
+    OutboxEvent
+from apps.reservations.outbox import relay_outbox, get_relay_metrics
+from apps.reservations.idempotency import purge_expired_idempotency_keys
 from apps.notifications.models import Notification
+from apps.reservations.services import book_slot, BookingError, change_reservation_status, delete_reservation, \
+    bulk_change_statuses, join_waitlist
 
 class ReservationCreationtest(APITestCase):
     def setUp(self):
@@ -56,6 +68,9 @@ class ReservationCreationtest(APITestCase):
         }
 
         response = self.client.post(self.reservation_list_url, reservation_data,format='json')
+        #powiadomienia tworzy relay outbox (w produkcji zadanie okresowe Celery)
+        with self.settings(OUTBOX_DISPATCH='direct'):
+            relay_outbox()
 
         #czy rezerwacja sie powiodla
         if response.status_code != 201:
@@ -86,3 +101,1114 @@ class ReservationCreationtest(APITestCase):
         self.assertIn(self.lecturer.get_full_name(), student_notification.message)
 
 
+
+class ReservationCounterTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_licznik", email="lc@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.student = User.objects.create_user(
+            username="student_licznik", email="sc@agh.pl", password="kochamAgh123$", role='student'
+        )
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=2),
+            end_time=timezone.now() + timedelta(days=2, hours=1),
+            max_attendees=3,
+        )
+
+    def counter(self):
+        self.slot.refresh_from_db()
+        return self.slot.active_reservations_count
+
+    def test_counter_follows_create_cancel_and_status_change(self):
+        print("\nTest: licznik aktywnych rezerwacji slotu")
+        reservation = Reservation.objects.create(slot=self.slot, student=self.student, status='Pending')
+        self.assertEqual(self.counter(), 1)
+
+        #zmiana statusu w obrebie aktywnych nie zmienia licznika
+        reservation.status = 'Confirmed'
+        reservation.save()
+        self.assertEqual(self.counter(), 1)
+
+        #anulowanie zwalnia miejsce (rowniez na obiekcie pobranym z bazy)
+        reservation = Reservation.objects.get(pk=reservation.pk)
+        reservation.status = 'Cancelled'
+        reservation.save()
+        self.assertEqual(self.counter(), 0)
+
+        #przywrocenie rezerwacji
+        reservation.status = 'Confirmed'
+        reservation.save()
+        self.assertEqual(self.counter(), 1)
+
+        reservation.delete()
+        self.assertEqual(self.counter(), 0)
+
+    def test_rebuild_command_fixes_and_checks_counters(self):
+        print("\nTest: komenda rebuild_reservation_counters")
+        Reservation.objects.create(slot=self.slot, student=self.student, status='Confirmed')
+        AvailableSlot.objects.filter(pk=self.slot.pk).update(active_reservations_count=5)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_reservation_counters', '--check', stdout=StringIO())
+
+        call_command('rebuild_reservation_counters', stdout=StringIO())
+        self.assertEqual(self.counter(), 1)
+        call_command('rebuild_reservation_counters', '--check', stdout=StringIO())
+
+    def test_public_listing_does_not_count_per_slot(self):
+        print("\nTest: lista publicznych slotow bez zapytan COUNT na slot")
+        for day in range(3, 8):
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=timezone.now() + timedelta(days=day),
+                end_time=timezone.now() + timedelta(days=day, hours=1),
+            )
+        Reservation.objects.create(slot=self.slot, student=self.student)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('public-slots-list'))
+        self.assertEqual(response.status_code, 200)
+        counts = {item['id']: item['reservations_count'] for item in response.data['results']}
+        self.assertEqual(counts[self.slot.pk], 1)
+
+
+class BookingEngineTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_booking", email="lb@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f"student_booking_{i}", email=f"sb{i}@agh.pl", password="kochamAgh123$", role='student'
+            )
+            for i in range(3)
+        ]
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=2),
+            end_time=timezone.now() + timedelta(days=2, hours=1),
+            max_attendees=2,
+        )
+
+    def test_admits_exactly_capacity(self):
+        print("\nTest: rezerwacja przyjmuje dokladnie max_attendees studentow")
+        #sciezka sukcesu: limit studenta (UPDATE) + warunkowy UPDATE licznika + INSERT rezerwacji
+        #+ statystyki (klucz slotu, UPDATE) + zdarzenie outbox + zwolnienie trzymanego miejsca
+        with CaptureQueriesContext(connection) as queries:
+            book_slot(self.slot.pk, self.students[0])
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['UPDATE', 'UPDATE', 'INSERT', 'SELECT', 'UPDATE', 'INSERT', 'DELETE'])
+        book_slot(self.slot.pk, self.students[1])
+
+        with self.assertRaises(BookingError) as error:
+            book_slot(self.slot.pk, self.students[2])
+        self.assertEqual(error.exception.code, 'full')
+
+        #anulowanie zwalnia miejsce
+        reservation = Reservation.objects.get(student=self.students[1])
+        reservation.status = 'Cancelled'
+        reservation.save()
+        book_slot(self.slot.pk, self.students[2])
+
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 2)
+
+    def test_duplicate_and_inactive_slot_are_rejected(self):
+        print("\nTest: podwojna rezerwacja i nieaktywny slot")
+        book_slot(self.slot.pk, self.students[0])
+        with self.assertRaises(BookingError) as error:
+            book_slot(self.slot.pk, self.students[0])
+        self.assertEqual(error.exception.code, 'duplicate')
+        #odrzucony INSERT wycofal podbicie licznika
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 1)
+
+        AvailableSlot.objects.filter(pk=self.slot.pk).update(is_active=False)
+        with self.assertRaises(BookingError) as error:
+            book_slot(self.slot.pk, self.students[1])
+        self.assertEqual(error.exception.code, 'inactive')
+
+    def test_api_booking_uses_engine(self):
+        print("\nTest: rezerwacja przez API")
+        self.slot.max_attendees = 1
+        self.slot.save()
+        client = APIClient()
+        url = reverse('student-reservations-list')
+
+        client.force_authenticate(user=self.students[0])
+        response = client.post(url, {'slot_id': self.slot.pk, 'topic': 'Całki'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'Pending')
+
+        client.force_authenticate(user=self.students[1])
+        response = client.post(url, {'slot': self.slot.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Reservation.objects.filter(slot=self.slot).count(), 1)
+
+    def test_update_cannot_move_reservation(self):
+        print("\nTest: PATCH nie przenosi rezerwacji do innego slotu")
+        full = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=3),
+            end_time=timezone.now() + timedelta(days=3, hours=1),
+            max_attendees=1,
+        )
+        book_slot(full.pk, self.students[1])
+        reservation = book_slot(self.slot.pk, self.students[0])
+        client = APIClient()
+        client.force_authenticate(user=self.students[0])
+        url = reverse('student-reservations-detail', args=[reservation.pk])
+
+        for data in ({'slot_id': full.pk}, {'slot': full.pk}):
+            response = client.patch(url, data, format='json')
+            self.assertEqual(response.status_code, 400)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.slot_id, self.slot.pk)
+        full.refresh_from_db()
+        self.assertEqual(full.active_reservations_count, 1)
+
+        #temat nadal mozna zmienic
+        response = client.patch(url, {'topic': 'Szeregi'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class WaitlistTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_kolejka", email="lw@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f"student_kolejka_{i}", email=f"sw{i}@agh.pl", password="kochamAgh123$", role='student'
+            )
+            for i in range(3)
+        ]
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=2),
+            end_time=timezone.now() + timedelta(days=2, hours=1),
+            max_attendees=1,
+        )
+        self.client = APIClient()
+        self.url = reverse('waitlist-list')
+
+    def join(self, student):
+        self.client.force_authenticate(user=student)
+        return self.client.post(self.url, {'slot_id': self.slot.pk, 'topic': 'Całki'}, format='json')
+
+    def test_fifo_promotion_on_cancel(self):
+        print("\nTest: awans z listy oczekujacych po anulowaniu rezerwacji")
+        #wolne miejsce - wpis na liste od razu rezerwuje
+        response = self.join(self.students[0])
+        self.assertEqual(response.data['status'], 'reserved')
+
+        response = self.join(self.students[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'waiting')
+        self.assertEqual(response.data['entry']['position'], 1)
+        self.assertEqual(self.join(self.students[2]).data['entry']['position'], 2)
+        #drugi wpis tego samego studenta jest odrzucany
+        self.assertEqual(self.join(self.students[2]).status_code, 400)
+
+        reservation = Reservation.objects.get(student=self.students[0])
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.post(reverse('student-reservations-cancel', args=[reservation.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        promoted = Reservation.objects.get(student=self.students[1], slot=self.slot)
+        self.assertEqual(promoted.topic, 'Całki')
+        self.assertTrue(promoted.is_active)
+        #powiadomienia o awansie ze zdarzenia outbox zapisanego w tej samej transakcji
+        self.assertTrue(OutboxEvent.objects.filter(event_type=OutboxEvent.CREATED, reservation_id=promoted.pk).exists())
+        self.assertFalse(WaitlistEntry.objects.filter(student=self.students[1]).exists())
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 1)
+
+        #student 2 jest teraz pierwszy w kolejce
+        self.client.force_authenticate(user=self.students[2])
+        self.assertEqual(self.client.get(self.url).data[0]['position'], 1)
+
+    def test_waitlist_positions_listed_in_one_query(self):
+        print("\nTest: pozycje na liscie oczekujacych bez zapytania na wpis")
+        slots = [self.slot] + [
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=timezone.now() + timedelta(days=3 + i),
+                end_time=timezone.now() + timedelta(days=3 + i, hours=1),
+                max_attendees=1,
+            )
+            for i in range(3)
+        ]
+        for index, slot in enumerate(slots):
+            book_slot(slot.pk, self.students[0])
+            #przed studentem 2 czeka index innych studentow
+            if index % 2:
+                join_waitlist(slot.pk, self.students[1])
+            join_waitlist(slot.pk, self.students[2])
+
+        self.client.force_authenticate(user=self.students[2])
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        positions = {entry['slot']['id']: entry['position'] for entry in response.data}
+        self.assertEqual(positions, {slot.pk: 1 + index % 2 for index, slot in enumerate(slots)})
+
+    def test_lecturer_no_show_status_promotes(self):
+        print("\nTest: zmiana statusu przez prowadzacego zwalnia miejsce")
+        book_slot(self.slot.pk, self.students[0])
+        self.join(self.students[1])
+        reservation = Reservation.objects.get(student=self.students[0])
+
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.post(
+            reverse('lecturer-reservations-update-status', args=[reservation.pk]),
+            {'status': 'No-Show Student'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Reservation.objects.filter(student=self.students[1], slot=self.slot).exists())
+
+    def test_lecturer_delete_promotes(self):
+        print("\nTest: usuniecie rezerwacji przez prowadzacego zwalnia miejsce")
+        reservation = book_slot(self.slot.pk, self.students[0])
+        self.join(self.students[1])
+
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.delete(reverse('lecturer-reservations-detail', args=[reservation.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Reservation.objects.filter(pk=reservation.pk).exists())
+        self.assertTrue(Reservation.objects.filter(student=self.students[1], slot=self.slot).exists())
+        self.assertFalse(WaitlistEntry.objects.filter(student=self.students[1]).exists())
+
+    def test_reactivating_cancelled_reservation_after_rebooking_is_rejected(self):
+        print("\nTest: przywrocenie anulowanej rezerwacji po ponownej rezerwacji studenta")
+        self.slot.max_attendees = 2
+        self.slot.save()
+        cancelled = book_slot(self.slot.pk, self.students[0])
+        change_reservation_status(cancelled, 'Cancelled')
+        book_slot(self.slot.pk, self.students[0])
+
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.post(
+            reverse('lecturer-reservations-update-status', args=[cancelled.pk]),
+            {'status': 'Confirmed'}, format='json',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['code'], 'duplicate')
+        self.assertEqual(Reservation.objects.get(pk=cancelled.pk).status, 'Cancelled')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 1)
+
+    def test_reactivation_does_not_overbook_after_promotion(self):
+        print("\nTest: przywrocenie rezerwacji nie przekracza pojemnosci po awansie z kolejki")
+        cancelled = book_slot(self.slot.pk, self.students[0])
+        self.join(self.students[1])
+        change_reservation_status(cancelled, 'Cancelled')
+        self.assertTrue(Reservation.objects.filter(student=self.students[1], slot=self.slot).exists())
+
+        with self.assertRaises(BookingError) as error:
+            change_reservation_status(cancelled, 'Confirmed')
+        self.assertEqual(error.exception.code, 'full')
+        self.assertEqual(cancelled.status, 'Cancelled')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 1)
+
+        #zwolnione miejsce mozna przywrocic; licznik otwartych rezerwacji studenta rosnie raz
+        Reservation.objects.get(student=self.students[1]).delete()
+        change_reservation_status(Reservation.objects.get(pk=cancelled.pk), 'Confirmed')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 1)
+        self.students[0].refresh_from_db()
+        self.assertEqual(self.students[0].open_reservations_count, 1)
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_idem", email="li@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.student = User.objects.create_user(
+            username="student_idem", email="si@agh.pl", password="kochamAgh123$", role='student'
+        )
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=2),
+            end_time=timezone.now() + timedelta(days=2, hours=1),
+            max_attendees=2,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('student-reservations-list')
+
+    def test_replayed_reservation_post_returns_original_response(self):
+        print("\nTest: ponowiony POST z Idempotency-Key")
+        data = {'slot_id': self.slot.pk, 'topic': 'Całki'}
+        first = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(first.status_code, 201)
+
+        #ponowienie - bez INSERT rezerwacji i bez nowych zdarzen outbox (powiadomien)
+        replay = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(OutboxEvent.objects.filter(event_type=OutboxEvent.CREATED).count(), 1)
+        self.assertEqual(Reservation.objects.filter(student=self.student).count(), 1)
+
+        #ten sam klucz z inna trescia
+        response = self.client.post(self.url, {'slot_id': self.slot.pk}, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, 422)
+
+    def test_validation_errors_are_replayed_and_keys_expire(self):
+        print("\nTest: zapamietany blad walidacji i czyszczenie kluczy")
+        response = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='empty')
+        self.assertEqual(response.status_code, 400)
+        replay = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='empty')
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(purge_expired_idempotency_keys(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_abandoned_key_is_taken_over_after_lease(self):
+        print("\nTest: przejecie klucza porzuconego przez proces, ktory nie zapisal odpowiedzi")
+        data = {'slot_id': self.slot.pk, 'topic': 'Całki'}
+        first = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='lost')
+        #symulacja awarii: klucz zostal, odpowiedz nie zostala zapisana, rezerwacji nie ma
+        Reservation.objects.all().delete()
+        IdempotencyKey.objects.update(response_status=None, response_body=None,
+                                      locked_until=timezone.now() + timedelta(minutes=1))
+        response = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='lost')
+        self.assertEqual(response.status_code, 409)
+
+        IdempotencyKey.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        response = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='lost')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.data['id'], first.data['id'])
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.response_status, 201)
+        self.assertIsNone(record.locked_until)
+
+    def test_time_windows_post_is_idempotent(self):
+        print("\nTest: idempotentne tworzenie okna dostepnosci")
+        self.client.force_authenticate(user=self.lecturer)
+        start = timezone.now() + timedelta(days=5)
+        data = {'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat()}
+        url = reverse('calendar-time-windows')
+        for _ in range(2):
+            response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='slot-1')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(AvailableSlot.objects.filter(lecturer=self.lecturer).count(), 2)
+
+
+class BulkStatusUpdateTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_bulk", email="lbs@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.other_lecturer = User.objects.create_user(
+            username="prowadzacy_inny", email="lbo@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=timezone.now() + timedelta(days=2),
+            end_time=timezone.now() + timedelta(days=2, hours=1),
+            max_attendees=30,
+        )
+        self.reservations = []
+        for i in range(20):
+            #bez hasla - hashowanie 20 hasel niepotrzebnie wydluza test
+            student = User.objects.create(username=f"student_bulk_{i}", email=f"sbs{i}@agh.pl", role='student')
+            self.reservations.append(Reservation.objects.create(slot=self.slot, student=student, status='Confirmed'))
+        other_slot = AvailableSlot.objects.create(
+            lecturer=self.other_lecturer,
+            start_time=timezone.now() + timedelta(days=3),
+            end_time=timezone.now() + timedelta(days=3, hours=1),
+        )
+        self.foreign = Reservation.objects.create(slot=other_slot, student=student, status='Confirmed')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.lecturer)
+        self.url = reverse('lecturer-reservations-bulk-status')
+
+    def test_bulk_update_with_grouped_queries_and_one_task(self):
+        print("\nTest: zbiorcza zmiana statusow rezerwacji")
+        updates = [{'id': r.pk, 'status': 'Completed'} for r in self.reservations[:15]]
+        updates += [{'id': r.pk, 'status': 'No-Show Student'} for r in self.reservations[15:]]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['updated']), 20)
+
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        #wlasnosc (1 SELECT), UPDATE na status (2), licznik slotu (1), lista oczekujacych (1),
+        #statystyki: klucze slotow (1 SELECT) i UPDATE na tydzien (1), liczniki studentow (1),
+        #zdarzenia outbox (1 INSERT)
+        self.assertEqual(statements.count('UPDATE'), 5)
+        self.assertEqual(len(statements), 9)
+        self.assertEqual(OutboxEvent.objects.filter(event_type=OutboxEvent.STATUS_CHANGED).count(), 20)
+        #po commicie tylko uniewaznienie cache - bez kolejkowania zadan Celery
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertEqual(Reservation.objects.filter(slot=self.slot, status='Completed').count(), 15)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 15)
+
+    def test_foreign_reservation_rejects_whole_request(self):
+        print("\nTest: zbiorcza zmiana statusu cudzej rezerwacji")
+        updates = [{'id': self.reservations[0].pk, 'status': 'Completed'}, {'id': self.foreign.pk, 'status': 'Cancelled'}]
+        response = self.client.post(self.url, {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(Reservation.objects.get(pk=self.reservations[0].pk).status, 'Confirmed')
+
+        response = self.client.post(self.url, {'updates': updates, 'allow_partial': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [self.reservations[0].pk])
+        self.assertEqual(Reservation.objects.get(pk=self.foreign.pk).status, 'Confirmed')
+
+    def test_reactivation_is_admitted_per_row(self):
+        print("\nTest: zbiorcze przywracanie rezerwacji do pelnego slotu i po ponownej rezerwacji")
+        AvailableSlot.objects.filter(pk=self.slot.pk).update(max_attendees=20)
+        rebooked, replaced = self.reservations[:2]
+        change_reservation_status(rebooked, 'Cancelled')
+        book_slot(self.slot.pk, rebooked.student)
+        change_reservation_status(replaced, 'Cancelled')
+        newcomer = User.objects.create(username="student_bulk_nowy", email="sbn@agh.pl", role='student')
+        book_slot(self.slot.pk, newcomer)
+
+        updates = [{'id': rebooked.pk, 'status': 'Confirmed'}, {'id': replaced.pk, 'status': 'Confirmed'}]
+        response = self.client.post(self.url, {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+        self.assertEqual(Reservation.objects.get(pk=replaced.pk).status, 'Cancelled')
+
+        #zwolnione w tym samym zadaniu miejsce moze zajac przywracana rezerwacja
+        updates.append({'id': self.reservations[2].pk, 'status': 'No-Show Student'})
+        response = self.client.post(self.url, {'updates': updates, 'allow_partial': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['updated']), sorted([replaced.pk, self.reservations[2].pk]))
+        self.assertEqual([error['index'] for error in response.data['errors']], [0])
+        self.assertEqual(Reservation.objects.get(pk=rebooked.pk).status, 'Cancelled')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 20)
+
+
+class ReservationAdmissionQueryTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="prowadzacy_zapytania", email="lq@agh.pl", password="kochamAgh123$", role='lecturer'
+        )
+        self.student = User.objects.create_user(
+            username="student_zapytania", email="sq@agh.pl", password="kochamAgh123$", role='student'
+        )
+        start = timezone.now() + timedelta(days=2)
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=start, end_time=start + timedelta(hours=1), max_attendees=5,
+        )
+        #inny prowadzacy, termin nachodzacy na self.slot
+        other_lecturer = User.objects.create(username="prowadzacy_kolizja", role='lecturer')
+        self.overlapping = AvailableSlot.objects.create(
+            lecturer=other_lecturer, start_time=start + timedelta(minutes=30),
+            end_time=start + timedelta(minutes=90), max_attendees=5,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('student-reservations-list')
+
+    def test_booking_hot_path_query_count(self):
+        print("\nTest: liczba zapytan przy tworzeniu rezerwacji")
+        #SAVEPOINT, UPDATE limitu studenta, warunkowy UPDATE, SAVEPOINT, INSERT, SELECT + UPDATE statystyk,
+        #INSERT zdarzenia outbox, RELEASE, DELETE trzymania, RELEASE
+        with self.assertNumQueries(11):
+            book_slot(self.slot.pk, self.student)
+
+        #przez API dochodzi jeden SELECT slotu z prowadzacym do odpowiedzi
+        Reservation.objects.all().delete()
+        with self.assertNumQueries(12):
+            response = self.client.post(self.url, {'slot_id': self.slot.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['slot']['id'], self.slot.pk)
+
+    def test_duplicate_and_overlap_rejected_in_admission_update(self):
+        print("\nTest: duplikat i kolizja czasowa odrzucane przez warunkowy UPDATE")
+        book_slot(self.slot.pk, self.student)
+
+        #odmowa: limit studenta, UPDATE slotu (0 wierszy) + jedno zapytanie wyjasniajace przyczyne
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(BookingError) as error:
+                book_slot(self.slot.pk, self.student)
+        self.assertEqual(error.exception.code, 'duplicate')
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['UPDATE', 'UPDATE', 'SELECT'])
+
+        with self.assertRaises(BookingError) as error:
+            book_slot(self.overlapping.pk, self.student)
+        self.assertEqual(error.exception.code, 'overlap')
+        self.overlapping.refresh_from_db()
+        self.assertEqual(self.overlapping.active_reservations_count, 0)
+
+        #po anulowaniu kolizja znika
+        Reservation.objects.filter(student=self.student).update(status='Cancelled')
+        book_slot(self.overlapping.pk, self.student)
+
+
+
+class ReservationListingQueryTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            username="prowadzacy_lista", first_name="Jan", last_name="Kowalski", role='lecturer'
+        )
+        self.student = User.objects.create(username="student_lista", role='student')
+        self.start = timezone.now() + timedelta(days=3)
+        self.client = APIClient()
+
+    def add_reservations(self, count):
+        #kazda rezerwacja w osobnym slocie, z osobnym studentem (bulk_create - bez sygnalow)
+        offset = Reservation.objects.count()
+        slots = AvailableSlot.objects.bulk_create([
+            AvailableSlot(
+                lecturer=self.lecturer,
+                start_time=self.start + timedelta(hours=offset + i),
+                end_time=self.start + timedelta(hours=offset + i, minutes=30),
+            )
+            for i in range(count)
+        ])
+        students = User.objects.bulk_create([
+            User(username=f"student_lista_{offset + i}", role='student') for i in range(count)
+        ])
+        Reservation.objects.bulk_create([
+            Reservation(slot=slot, student=student, status='Confirmed')
+            for slot, student in zip(slots, students)
+        ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), response
+
+    def test_lecturer_listings_use_constant_number_of_queries(self):
+        print("\nTest: stala liczba zapytan przy liscie rezerwacji prowadzacego")
+        self.client.force_authenticate(user=self.lecturer)
+        urls = [reverse('lecturer-reservations-list'), reverse('calendar-reservations')]
+
+        self.add_reservations(3)
+        small = [self.count_queries(url)[0] for url in urls]
+        self.add_reservations(40)
+        large = [self.count_queries(url) for url in urls]
+
+        #jeden SELECT z JOIN na slot i prowadzacego, niezaleznie od liczby wierszy
+        self.assertEqual(small, [1, 1])
+        self.assertEqual([queries for queries, _ in large], [1, 1])
+        for _, response in large:
+            self.assertEqual(len(response.data['results']), 43)
+            self.assertEqual(response.data['results'][0]['slot']['lecturer_details'], "Jan Kowalski")
+
+    def test_student_listing_is_paginated_by_slot_time(self):
+        print("\nTest: stronicowanie listy rezerwacji studenta kursorem")
+        slots = AvailableSlot.objects.bulk_create([
+            AvailableSlot(
+                lecturer=self.lecturer,
+                #odwrotna kolejnosc tworzenia niz terminow
+                start_time=self.start + timedelta(hours=5 - i),
+                end_time=self.start + timedelta(hours=5 - i, minutes=30),
+            )
+            for i in range(5)
+        ])
+        Reservation.objects.bulk_create([Reservation(slot=slot, student=self.student) for slot in slots])
+        self.client.force_authenticate(user=self.student)
+        url = reverse('student-reservations-list')
+
+        with self.assertNumQueries(1):
+            first = self.client.get(url, {'page_size': 3})
+        self.assertEqual(len(first.data['results']), 3)
+        self.assertIsNotNone(first.data['next_cursor'])
+
+        second = self.client.get(url, {'page_size': 3, 'cursor': first.data['next_cursor']})
+        self.assertIsNone(second.data['next_cursor'])
+        starts = [item['slot']['start_time'] for item in first.data['results'] + second.data['results']]
+        self.assertEqual(len(starts), 5)
+        self.assertEqual(starts, sorted(starts))
+
+
+class SeatHoldTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(username="prowadzacy_trzymanie", role='lecturer')
+        self.students = User.objects.bulk_create([
+            User(username=f"student_trzymanie_{i}", role='student') for i in range(3)
+        ])
+        start = timezone.now() + timedelta(days=2)
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=start, end_time=start + timedelta(hours=1), max_attendees=2,
+        )
+        self.client = APIClient()
+        self.url = reverse('student-reservations-hold')
+
+    def hold(self, student):
+        self.client.force_authenticate(user=student)
+        return self.client.post(self.url, {'slot_id': self.slot.pk}, format='json')
+
+    def check_holds_take_seats(self):
+        first, second, third = self.students
+        self.assertEqual(self.hold(first).status_code, 201)
+        #ponowne trzymanie tego samego studenta nie zajmuje drugiego miejsca
+        self.assertEqual(self.hold(first).status_code, 201)
+        self.assertEqual(self.hold(second).status_code, 201)
+        self.assertEqual(self.hold(third).status_code, 409)
+
+        #oba miejsca trzymane - rezerwacja bez trzymania jest odrzucana
+        with self.assertRaises(BookingError) as error:
+            book_slot(self.slot.pk, third)
+        self.assertEqual(error.exception.code, 'full')
+        #trzymajacy zamienia trzymanie w rezerwacje
+        book_slot(self.slot.pk, first)
+
+        self.client.force_authenticate(user=second)
+        self.assertEqual(self.client.delete(f'{self.url}?slot_id={self.slot.pk}').status_code, 204)
+        book_slot(self.slot.pk, third)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.active_reservations_count, 2)
+
+    def test_database_holds_take_seats_and_expire_lazily(self):
+        print("\nTest: trzymanie miejsca w bazie (brak wspolnego cache)")
+        with self.settings(SEAT_HOLD_CACHE_ALIAS=''):
+            self.check_holds_take_seats()
+
+            Reservation.objects.all().delete()
+            self.assertEqual(self.hold(self.students[0]).status_code, 201)
+            self.assertEqual(self.hold(self.students[1]).status_code, 201)
+            #wygasle trzymania nie zajmuja miejsc i znikaja przy kolejnym trzymaniu
+            SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+            book_slot(self.slot.pk, self.students[2])
+            self.assertEqual(self.hold(self.students[0]).status_code, 201)
+            self.assertEqual(list(SeatHold.objects.values_list('student_id', flat=True)), [self.students[0].pk])
+
+    def test_cache_holds_take_seats(self):
+        print("\nTest: trzymanie miejsca w cache (liczniki z TTL)")
+        cache.clear()
+        with self.settings(SEAT_HOLD_CACHE_ALIAS='default'):
+            self.check_holds_take_seats()
+        self.assertFalse(SeatHold.objects.exists())
+
+
+
+class LecturerStatsTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(username="prowadzacy_statystyki", role='lecturer')
+        self.students = User.objects.bulk_create([
+            User(username=f"student_statystyki_{i}", role='student') for i in range(4)
+        ])
+        #poniedzialek za dwa tygodnie, 10:00 czasu lokalnego
+        today = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0)
+        self.monday = today + timedelta(days=14 - today.weekday())
+        self.algebra = AvailableSlot.objects.create(
+            lecturer=self.lecturer, subject="Algebra", start_time=self.monday,
+            end_time=self.monday + timedelta(hours=1), max_attendees=4,
+        )
+        self.analysis = AvailableSlot.objects.create(
+            lecturer=self.lecturer, subject="Analiza", start_time=self.monday + timedelta(days=1),
+            end_time=self.monday + timedelta(days=1, hours=1), max_attendees=2,
+        )
+        self.client = APIClient()
+
+    def snapshot(self):
+        return sorted(LecturerWeeklyStats.objects.values_list(
+            'lecturer_id', 'subject', 'week_start', 'slots', 'seats', 'pending', 'confirmed', 'cancelled',
+            'completed', 'no_show_student', 'no_show_lecturer',
+        ))
+
+    def test_rollups_follow_changes_and_match_rebuild(self):
+        print("\nTest: przyrostowe statystyki zgodne z pelnym przeliczeniem")
+        reservations = [book_slot(self.algebra.pk, student) for student in self.students]
+        book_slot(self.analysis.pk, self.students[0])
+        change_reservation_status(reservations[0], 'Completed')
+        change_reservation_status(reservations[1], 'Cancelled')
+        bulk_change_statuses(self.lecturer, {reservations[2].pk: 'No-Show Student'})
+        delete_reservation(reservations[3])
+
+        algebra = LecturerWeeklyStats.objects.get(subject="Algebra")
+        self.assertEqual((algebra.slots, algebra.seats), (1, 4))
+        self.assertEqual((algebra.pending, algebra.completed, algebra.cancelled, algebra.no_show_student), (0, 1, 1, 1))
+
+        #przeniesienie slotu na kolejny tydzien przenosi jego miejsca i rezerwacje
+        self.analysis.start_time += timedelta(days=7)
+        self.analysis.end_time += timedelta(days=7)
+        self.analysis.save()
+        incremental = self.snapshot()
+        weeks = {row[2] for row in incremental if row[1] == "Analiza" and row[3]}
+        self.assertEqual(weeks, {(self.monday + timedelta(days=7)).date()})
+
+        #rozjechane wiersze naprawia komenda przeliczajaca (partie po 1 slocie)
+        LecturerWeeklyStats.objects.update(completed=99)
+        call_command('rebuild_lecturer_stats', batch_size=1, stdout=StringIO())
+        rebuilt = self.snapshot()
+        #wiersze wyzerowane przyrostowo znikaja po przeliczeniu
+        self.assertEqual(rebuilt, [row for row in incremental if any(row[3:])])
+
+    def test_slot_delete_adjusts_stats_in_one_update(self):
+        print("\nTest: usuniecie slotu z rezerwacjami - statystyki jednym UPDATE")
+        reservations = [book_slot(self.algebra.pk, student) for student in self.students]
+        change_reservation_status(reservations[0], 'Completed')
+        change_reservation_status(reservations[1], 'Cancelled')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.algebra.delete()
+        stats_queries = [q['sql'] for q in queries.captured_queries if 'lecturerweeklystats' in q['sql']]
+        self.assertEqual(len(stats_queries), 1)
+        #bez korekty licznika slotu, ktory i tak jest usuwany
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE "schedules_availableslot"')])
+
+        algebra = LecturerWeeklyStats.objects.get(subject="Algebra")
+        self.assertEqual(
+            (algebra.slots, algebra.seats, algebra.pending, algebra.completed, algebra.cancelled), (0, 0, 0, 0, 0),
+        )
+        #liczniki otwartych rezerwacji studentow i zdarzenia outbox nadal per rezerwacja
+        self.assertEqual(OutboxEvent.objects.filter(event_type=OutboxEvent.DELETED).count(), 4)
+        self.assertEqual(User.objects.filter(pk__in=[s.pk for s in self.students], open_reservations_count=0).count(), 4)
+
+    def test_stats_api_reads_rollups_only(self):
+        print("\nTest: API statystyk czyta tylko tabele zbiorcza")
+        for student in self.students[:2]:
+            reservation = book_slot(self.algebra.pk, student)
+        change_reservation_status(reservation, 'No-Show Student')
+        url = reverse('lecturer-stats-list')
+
+        self.client.force_authenticate(user=self.lecturer)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'group_by': 'subject'})
+        self.assertEqual(response.status_code, 200)
+        by_subject = {row['subject']: row for row in response.data['results']}
+        self.assertEqual(by_subject['Algebra']['utilization'], 0.25)
+        self.assertEqual(by_subject['Algebra']['no_show_rate'], 1.0)
+        self.assertEqual(by_subject['Analiza']['utilization'], 0.0)
+        self.assertEqual(by_subject['Analiza']['seats'], 2)
+
+        response = self.client.get(url, {'group_by': 'total', 'start': self.monday.date().isoformat()})
+        self.assertEqual(response.data['results'][0]['seats'], 6)
+        self.assertEqual(self.client.get(url, {'group_by': 'day'}).status_code, 400)
+
+        #inny prowadzacy nie widzi cudzych statystyk, student nie ma dostepu
+        other = User.objects.create(username="prowadzacy_inny_statystyki", role='lecturer')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url).data['results'], [])
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        admin = User.objects.create(username="administrator_statystyki", role='admin')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(url, {'group_by': 'lecturer', 'lecturer': self.lecturer.pk})
+        self.assertEqual([row['lecturer_id'] for row in response.data['results']], [self.lecturer.pk])
+
+
+class RateLimitAndQuotaTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create(username="prowadzacy_limity", role='lecturer')
+        self.student = User.objects.create(username="student_limity", role='student')
+        start = timezone.now() + timedelta(days=2)
+        self.slots = AvailableSlot.objects.bulk_create([
+            AvailableSlot(
+                lecturer=self.lecturer, start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1), max_attendees=3,
+            )
+            for i in range(4)
+        ])
+        self.client = APIClient()
+
+    def test_booking_token_bucket_rejects_without_queries(self):
+        print("\nTest: kubelek tokenow dla tworzenia rezerwacji")
+        rates = {'booking': {'student': '2/min'}}
+        self.client.force_authenticate(user=self.student)
+        url = reverse('student-reservations-list')
+        now = 1_000_000.0
+        with self.settings(TOKEN_BUCKET_RATES=rates), mock.patch('apps.users.throttling.time.time') as clock:
+            clock.return_value = now
+            for slot in self.slots[:2]:
+                self.assertEqual(self.client.post(url, {'slot_id': slot.pk}, format='json').status_code, 201)
+            #odrzucenie bez zadnego zapytania do bazy
+            with self.assertNumQueries(0):
+                response = self.client.post(url, {'slot_id': self.slots[2].pk}, format='json')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+
+            #po 30 s kubelek ma jeden token (2 na minute)
+            clock.return_value = now + 30
+            self.assertEqual(self.client.post(url, {'slot_id': self.slots[2].pk}, format='json').status_code, 201)
+            self.assertEqual(self.client.post(url, {'slot_id': self.slots[3].pk}, format='json').status_code, 429)
+
+            #po dlugiej przerwie kubelek ma najwyzej swoja pojemnosc
+            clock.return_value = now + 3000
+            Reservation.objects.all().delete()
+            statuses = [self.client.post(url, {'slot_id': slot.pk}, format='json').status_code for slot in self.slots[:3]]
+            self.assertEqual(statuses, [201, 201, 429])
+
+    def test_anonymous_public_listing_is_limited_per_ip(self):
+        print("\nTest: limit zadan anonimowych do publicznej listy slotow")
+        url = reverse('public-slots-list')
+        with self.settings(TOKEN_BUCKET_RATES={'public_slots': {'anon': '2/min', 'student': None}}):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 429)
+            #zalogowany student ma osobny kubelek (tu bez limitu)
+            self.client.force_authenticate(user=self.student)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_open_reservation_quota_uses_counter(self):
+        print("\nTest: limit otwartych rezerwacji studenta")
+        with self.settings(MAX_OPEN_RESERVATIONS_PER_STUDENT=2):
+            first = book_slot(self.slots[0].pk, self.student)
+            book_slot(self.slots[1].pk, self.student)
+            self.student.refresh_from_db()
+            self.assertEqual(self.student.open_reservations_count, 2)
+
+            with self.assertRaises(BookingError) as error:
+                book_slot(self.slots[2].pk, self.student)
+            self.assertEqual(error.exception.code, 'quota')
+
+            #zakonczona rezerwacja zwalnia limit
+            change_reservation_status(first, 'Completed')
+            book_slot(self.slots[2].pk, self.student)
+
+            #termin, ktory minal bez zmiany statusu, jest odliczany leniwie przy osiagnieciu limitu
+            AvailableSlot.objects.filter(pk=self.slots[1].pk).update(
+                start_time=timezone.now() - timedelta(hours=2), end_time=timezone.now() - timedelta(hours=1),
+            )
+            book_slot(self.slots[3].pk, self.student)
+            self.student.refresh_from_db()
+            self.assertEqual(self.student.open_reservations_count, 2)
+
+
+
+class OutboxRelayTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create(
+            username="prowadzacy_outbox", email="lo@agh.pl", first_name="Jan", last_name="Nowak", role='lecturer'
+        )
+        self.students = User.objects.bulk_create([
+            User(username=f"student_outbox_{i}", email=f"so{i}@agh.pl", role='student') for i in range(6)
+        ])
+        start = timezone.now() + timedelta(days=2)
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=start, end_time=start + timedelta(hours=1), max_attendees=10,
+        )
+
+    def test_events_written_in_transaction_and_relayed_once(self):
+        print("\nTest: zdarzenia outbox i relay partiami")
+        reservations = [book_slot(self.slot.pk, student) for student in self.students]
+        change_reservation_status(reservations[0], 'Cancelled')
+        delete_reservation(reservations[1])
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=True).count(), 8)
+
+        #jedna partia: odczyt zdarzen, rezerwacje, sloty i studenci usunietych, INSERT powiadomien,
+        #UPDATE zdarzen (+ 2 SAVEPOINT i 2 RELEASE); etap e-maili: odczyt utworzen i UPDATE znacznika
+        #(+ SAVEPOINT i RELEASE) - niezaleznie od liczby zdarzen (e-maile w Celery)
+        with mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay') as delay, \
+                self.assertNumQueries(14):
+            self.assertEqual(relay_outbox(batch_size=10), (8, 0))
+        #jedno zadanie wysylki dla calej paczki utworzen
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(len(delay.call_args.args[0]), 6)
+
+        #5 utworzen (potwierdzenia dla studentow + jedno zbiorcze dla prowadzacego; usunieta
+        #rezerwacja jest pomijana), anulowanie (student + prowadzacy), usuniecie (prowadzacy)
+        self.assertEqual(Notification.objects.count(), 9)
+        self.assertEqual(Notification.objects.filter(notification_type='RESERVATION_CANCELLATION').count(), 2)
+        self.assertFalse(OutboxEvent.objects.filter(processed_at__isnull=True).exists())
+
+        #ponowne uruchomienie nie tworzy duplikatow
+        self.assertEqual(relay_outbox(), (0, 0))
+        self.assertEqual(Notification.objects.count(), 9)
+
+    def test_burst_for_recipient_coalesced_into_digest(self):
+        print("\nTest: seria powiadomien dla prowadzacego laczona w zbiorcze")
+        for student in self.students:
+            book_slot(self.slot.pk, student)
+        with mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay'):
+            relay_outbox()
+
+        lecturer_notifications = Notification.objects.filter(recipient=self.lecturer)
+        self.assertEqual(lecturer_notifications.count(), 1)
+        digest = lecturer_notifications.get()
+        self.assertEqual(digest.notification_type, 'NEW_RESERVATION')
+        self.assertTrue(digest.message.startswith("Masz 6 nowych rezerwacji:"))
+        self.assertIn("i 1 więcej", digest.message)
+        #studenci dostaja pojedyncze potwierdzenia
+        self.assertEqual(Notification.objects.filter(notification_type='RESERVATION_CONFIRMATION').count(), 6)
+
+        metrics = get_relay_metrics()
+        self.assertEqual(metrics['last_batch_size'], 6)
+        self.assertEqual(metrics['digests'], 1)
+        self.assertEqual(metrics['notifications'], 7)
+        self.assertEqual(metrics['pending'], 0)
+        self.assertGreaterEqual(metrics['last_lag_seconds'], 0)
+
+        #bez laczenia - osobne powiadomienie na rezerwacje
+        Notification.objects.all().delete()
+        Reservation.objects.all().delete()
+        OutboxEvent.objects.all().delete()
+        for student in self.students:
+            book_slot(self.slot.pk, student)
+        with self.settings(NOTIFICATION_DIGEST_THRESHOLD=0), \
+                mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay'):
+            relay_outbox()
+        self.assertEqual(Notification.objects.filter(recipient=self.lecturer).count(), 6)
+
+    def test_failing_event_does_not_block_batch(self):
+        print("\nTest: bledne zdarzenie outbox nie blokuje partii")
+        from apps.reservations import outbox
+
+        reservations = [book_slot(self.slot.pk, student) for student in self.students[:3]]
+        broken = reservations[1].pk
+        build = outbox.build_notifications
+
+        def build_notifications(events):
+            if any(event.reservation_id == broken for event in events):
+                raise ValueError("uszkodzone zdarzenie")
+            return build(events)
+
+        with mock.patch('apps.reservations.outbox.build_notifications', side_effect=build_notifications), \
+                mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay'):
+            self.assertEqual(relay_outbox(), (2, 1))
+        event = OutboxEvent.objects.get(reservation_id=broken)
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('uszkodzone zdarzenie', event.last_error)
+        self.assertEqual(Notification.objects.count(), 4)
+
+        with mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay'):
+            self.assertEqual(relay_outbox(), (1, 0))
+        self.assertEqual(Notification.objects.count(), 6)
+
+    def test_broker_outage_keeps_notifications_and_retries_emails(self):
+        print("\nTest: niedostepny broker nie wycofuje powiadomien ani nie zuzywa prob")
+        for student in self.students[:3]:
+            book_slot(self.slot.pk, student)
+
+        with self.settings(OUTBOX_MAX_ATTEMPTS=1), mock.patch(
+            'apps.reservations.tasks.send_confirmation_emails_task.delay',
+            side_effect=ConnectionError("broker niedostepny"),
+        ):
+            self.assertEqual(relay_outbox(), (3, 0))
+            self.assertEqual(relay_outbox(), (0, 0))
+        #powiadomienia zapisane, e-maile czekaja bez zwiekszania liczby prob
+        self.assertEqual(Notification.objects.count(), 6)
+        events = OutboxEvent.objects.all()
+        self.assertFalse(events.filter(processed_at__isnull=True).exists())
+        self.assertEqual(events.filter(emails_dispatched_at__isnull=True).count(), 3)
+        self.assertEqual(set(events.values_list('attempts', flat=True)), {1})
+        self.assertIn('broker niedostepny', events.first().last_error)
+        self.assertEqual(get_relay_metrics()['emails_pending'], 3)
+
+        with mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay') as delay:
+            self.assertEqual(relay_outbox(), (0, 0))
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(len(delay.call_args.args[0]), 3)
+        self.assertFalse(events.filter(emails_dispatched_at__isnull=True).exists())
+        self.assertEqual(Notification.objects.count(), 6)
+
+    def test_requeue_exhausted_events(self):
+        print("\nTest: ponowne kolejkowanie zdarzen po wyczerpaniu prob")
+        from django.core.management import call_command
+
+        reservation = book_slot(self.slot.pk, self.students[0])
+        OutboxEvent.objects.update(attempts=5, last_error="ValueError: blad")
+        with mock.patch('apps.reservations.tasks.send_confirmation_emails_task.delay'):
+            self.assertEqual(relay_outbox(), (0, 0))
+            call_command('relay_outbox', '--requeue', stdout=StringIO())
+        event = OutboxEvent.objects.get(reservation_id=reservation.pk)
+        self.assertIsNotNone(event.processed_at)
+        self.assertIsNotNone(event.emails_dispatched_at)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_confirmation_email_sent_once_per_event(self):
+        print("\nTest: e-mail zdarzenia outbox wysylany raz")
+        from django.core import mail
+        from apps.reservations.tasks import send_reservation_confirmation_email
+
+        reservation = book_slot(self.slot.pk, self.students[0])
+        with self.settings(OUTBOX_DISPATCH='direct'):
+            relay_outbox()
+        self.assertEqual(len(mail.outbox), 2)
+
+        #ponowione zakolejkowanie tego samego zdarzenia (at-least-once) jest pomijane
+        event = OutboxEvent.objects.get(reservation_id=reservation.pk)
+        send_reservation_confirmation_email.run(reservation.pk, event_id=event.pk)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class ConfirmationEmailBatchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create(username="prowadzacy_mail", email="lm@agh.pl", role='lecturer')
+        self.students = User.objects.bulk_create([
+            User(username=f"student_mail_{i}", email=f"sm{i}@agh.pl", role='student') for i in range(3)
+        ])
+        start = timezone.now() + timedelta(days=2)
+        slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=start, end_time=start + timedelta(hours=1), max_attendees=5,
+        )
+        self.items = [
+            [book_slot(slot.pk, student).pk, 100 + index, None] for index, student in enumerate(self.students)
+        ]
+
+    def connection(self, bad_address=None):
+        #polaczenie testowe: liczy otwarcia, odrzuca jeden adres
+        from django.core.mail.backends.locmem import EmailBackend
+
+        class Connection(EmailBackend):
+            opened = 0
+
+            def open(self):
+                Connection.opened += 1
+
+            def send_messages(self, messages):
+                if any(bad_address in message.to for message in messages):
+                    raise ValueError(f"odrzucony adres {bad_address}")
+                return super().send_messages(messages)
+
+        return Connection()
+
+    def test_batch_uses_one_connection_and_retries_only_failed(self):
+        print("\nTest: paczka e-maili przez jedno polaczenie, ponawiane tylko nieudane")
+        from django.core import mail
+        from apps.reservations.emails import send_confirmation_emails
+        from apps.reservations.tasks import send_confirmation_emails_task
+
+        connection = self.connection(bad_address='sm1@agh.pl')
+        sent, failed = send_confirmation_emails(self.items, connection=connection)
+        self.assertEqual(type(connection).opened, 1)
+        self.assertEqual(len(sent), 5)
+        self.assertEqual([key for key, _ in failed], [(self.items[1][0], 101, 'student')])
+        self.assertEqual(len(mail.outbox), 5)
+
+        #ponowienie calej paczki wysyla tylko brakujaca wiadomosc
+        sent, failed = send_confirmation_emails(self.items, connection=self.connection())
+        self.assertEqual((len(sent), failed), (1, []))
+        self.assertEqual(mail.outbox[-1].to, ['sm1@agh.pl'])
+
+        #zadanie Celery ponawia tylko nieudane wiadomosci
+        cache.clear()
+        mail.outbox = []
+        with mock.patch('apps.reservations.emails.get_connection', return_value=self.connection('sm2@agh.pl')), \
+                mock.patch.object(send_confirmation_emails_task, 'retry', side_effect=RuntimeError) as retry:
+            with self.assertRaises(RuntimeError):
+                send_confirmation_emails_task.run(self.items)
+        self.assertEqual(retry.call_args.kwargs['args'], [[[self.items[2][0], 102, 'student']]])
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_refused_connection_retries_whole_batch(self):
+        print("\nTest: niedostepny serwer SMTP - zadanie ponawia cala paczke")
+        from django.core import mail
+        from apps.reservations.tasks import send_confirmation_emails_task
+
+        connection = self.connection()
+        connection.open = mock.Mock(side_effect=ConnectionRefusedError("SMTP niedostepny"))
+        with mock.patch('apps.reservations.emails.get_connection', return_value=connection), \
+                mock.patch.object(send_confirmation_emails_task, 'retry', side_effect=RuntimeError) as retry:
+            with self.assertRaises(RuntimeError):
+                send_confirmation_emails_task.run(self.items)
+        self.assertEqual(len(retry.call_args.kwargs['args'][0]), 6)
+        self.assertIsInstance(retry.call_args.kwargs['exc'], ConnectionRefusedError)
+        self.assertEqual(mail.outbox, [])
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentReservationViewSet, LecturerReservationViewSet
+from .views import StudentReservationViewSet, LecturerReservationViewSet, WaitlistViewSet, LecturerStatsViewSet
 
 router = DefaultRouter()
 router.register(r'student', StudentReservationViewSet, basename='student-reservations')
 router.register(r'lecturer', LecturerReservationViewSet, basename='lecturer-reservations')
+router.register(r'waitlist', WaitlistViewSet, basename='waitlist')
+router.register(r'stats', LecturerStatsViewSet, basename='lecturer-stats')
 
 urlpatterns = [
     path('', include(router.urls)),
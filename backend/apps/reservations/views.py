@@ -1,11 +1,24 @@
-from rest_framework import viewsets, permissions, status
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Reservation
-from .serializers import ReservationSerializer
-from apps.users.permissions import IsLecturer, IsStudent
-from django.core.exceptions import PermissionDenied
-from django.utils import timezone
+from .models import Reservation, WaitlistEntry, LecturerWeeklyStats
+from .serializers import ReservationSerializer, WaitlistEntrySerializer
+from .services import change_reservation_status, delete_reservation, join_waitlist, bulk_change_statuses, \
+    hold_seat, release_hold, BookingError
+from .holds import get_hold_ttl
+from .stats import COUNTER_FIELDS, rates
+from .idempotency import idempotent
+from .pagination import ReservationCursorPagination
+from apps.users.permissions import IsLecturer, IsStudent, IsLecturerOrAdmin
+from apps.users.throttling import BookingThrottle
+
+#maksymalna liczba rezerwacji w jednym zadaniu bulk-status
+BULK_STATUS_LIMIT = 500
 
 
 class StudentReservationViewSet(viewsets.ModelViewSet):
@@ -13,30 +26,60 @@ class StudentReservationViewSet(viewsets.ModelViewSet):
     #post, get , delete
     serializer_class = ReservationSerializer
     permission_classes = [IsStudent]
+    pagination_class = ReservationCursorPagination
 
     def get_queryset(self):
         #student widzi tylko swoje rezerwacje
-        return Reservation.objects.filter(student=self.request.user)
+        return Reservation.objects.filter(student=self.request.user).with_slot_details()
+
+    def get_throttles(self):
+        #limit zadan tylko dla zapisow rezerwacji i trzymania miejsc (kubelek tokenow w cache)
+        if self.action in ('create', 'hold'):
+            return [BookingThrottle()]
+        return super().get_throttles()
+
+    #ponowiony POST z tym samym Idempotency-Key zwraca pierwsza odpowiedz
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        slot = serializer.validated_data['slot']
+        #wolne miejsca, termin i duplikaty sprawdzane atomowo w apps.reservations.services.book_slot
+        if serializer.validated_data.get('slot_id') is None:
+            #wystapienie reguly materializowane w tej samej transakcji co rezerwacja - odmowa je wycofuje
+            with transaction.atomic():
+                serializer.save(student=self.request.user)
+        else:
+            serializer.save(student=self.request.user)
 
-        #active slot
-        if not slot.is_active:
-            raise PermissionDenied("Slot jest nieaktywny")
+    def perform_destroy(self, instance):
+        #usuniecie aktywnej rezerwacji zwalnia miejsce dla listy oczekujacych
+        delete_reservation(instance)
 
-        #future slot
-        if slot.start_time <= timezone.now():
-            raise PermissionDenied("ten slot juz sie skonczyl")
+    #Trzymanie miejsca na czas wypelniania formularza (wygasa samo po SEAT_HOLD_TTL_SECONDS)
+    #POST /api/reservations/student/hold/ {"slot_id": 1}, DELETE /api/reservations/student/hold/?slot_id=1
+    @action(detail=False, methods=['post', 'delete'])
+    def hold(self, request):
+        source = request.data if request.method == 'POST' else request.query_params
+        try:
+            slot_id = int(source.get('slot_id'))
+        except (TypeError, ValueError):
+            return Response({"detail": "Slot jest wymagany."}, status=status.HTTP_400_BAD_REQUEST)
 
-        #cyz sa wolne miejsca
-        if slot.reservations.count() >= slot.max_attendees:
-            raise PermissionDenied("Brak wolnych miejsc")
-        #student ma juz rezerwacje na ten slot
-        if Reservation.objects.filter(slot=slot, student=self.request.user).exists():
-            raise PermissionDenied("Juz masz rezerwacje na ten slot")
+        if request.method == 'DELETE':
+            release_hold(slot_id, request.user)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        serializer.save(student=self.request.user)
+        try:
+            expires_at = hold_seat(slot_id, request.user)
+        except BookingError as e:
+            #brak miejsca to konflikt (mozna sprobowac pozniej lub zapisac sie na liste oczekujacych)
+            error_status = status.HTTP_409_CONFLICT if e.code == 'full' else status.HTTP_400_BAD_REQUEST
+            return Response({"detail": str(e), "code": e.code}, status=error_status)
+        return Response(
+            {"slot_id": slot_id, "expires_at": expires_at, "ttl_seconds": get_hold_ttl()},
+            status=status.HTTP_201_CREATED,
+        )
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -48,8 +91,8 @@ class StudentReservationViewSet(viewsets.ModelViewSet):
         if reservation.status in ('Completed', 'Cancelled', 'No-Show Student', 'No-Show Lecturer'):
             return Response({"detail":"Nie można anulować tej rezerwacji."}, status=status.HTTP_400_BAD_REQUEST)
 
-        reservation.status = 'Cancelled'
-        reservation.save()
+        #zwolnione miejsce dostaje pierwszy student z listy oczekujacych (ta sama transakcja)
+        change_reservation_status(reservation, 'Cancelled')
 
         #Tu powiadomienie
         return Response({"status": "Rezerwacja anulowana."}, status=status.HTTP_200_OK)
@@ -59,10 +102,15 @@ class LecturerReservationViewSet(viewsets.ModelViewSet):
 
     serializer_class = ReservationSerializer
     permission_classes = [IsLecturer]
+    pagination_class = ReservationCursorPagination
 
     def get_queryset(self):
         #Prowadzacy widzi rezerwacje tylko swoich slotow
-        return Reservation.objects.filter(slot__lecturer=self.request.user)
+        return Reservation.objects.filter(slot__lecturer=self.request.user).with_slot_details()
+
+    def perform_destroy(self, instance):
+        #tak jak u studenta - zwolnione miejsce dostaje pierwszy z listy oczekujacych
+        delete_reservation(instance)
 
     #Metoda do zmiany statusu rezerwacji (np zakonczona / nieobecnosc)
     @action(detail=True, methods=['post'])
@@ -74,11 +122,173 @@ class LecturerReservationViewSet(viewsets.ModelViewSet):
             return Response({"detail":"Nieprawidłowy status."}, status=status.HTTP_400_BAD_REQUEST)
 
         #sprawdzenie czy rezerwacja nalezy do prowadzacego
-        if reservation.slot.lecturer != request.user:
+        if reservation.slot.lecturer_id != request.user.pk:
             return Response({"detail":"Nie masz uprawnień do zmiany tej rezerwacji."}, status=status.HTTP_403_FORBIDDEN)
 
-        reservation.status = new_status
-        reservation.save()
+        try:
+            change_reservation_status(reservation, new_status)
+        except BookingError as e:
+            #przywrocenie anulowanej rezerwacji moze kolidowac z nowsza rezerwacja studenta
+            return Response({"detail": str(e), "code": e.code}, status=status.HTTP_409_CONFLICT)
 
         #powiadomienie
-        return Response(ReservationSerializer(reservation).data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(ReservationSerializer(reservation).data, status=status.HTTP_200_OK)
+
+    #Zbiorcza zmiana statusow po bloku konsultacji (obecnosci)
+    #POST /api/reservations/lecturer/bulk-status/  {"updates": [{"id": 1, "status": "Completed"}, ...]}
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        updates = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        allow_partial = isinstance(request.data, dict) and bool(request.data.get('allow_partial'))
+
+        if not isinstance(updates, list) or not updates:
+            return Response({"detail": "Oczekiwano niepustej listy 'updates'."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(updates) > BULK_STATUS_LIMIT:
+            return Response(
+                {"detail": f"Jednorazowo można zmienić najwyżej {BULK_STATUS_LIMIT} rezerwacji."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        valid_statuses = dict(Reservation.STATUS_CHOICES)
+        errors = {}
+        new_statuses = {}
+        for index, item in enumerate(updates):
+            reservation_id = item.get('id') if isinstance(item, dict) else None
+            new_status = item.get('status') if isinstance(item, dict) else None
+            if not isinstance(reservation_id, int) or isinstance(reservation_id, bool):
+                errors[index] = "Nieprawidłowy identyfikator rezerwacji."
+            elif new_status not in valid_statuses:
+                errors[index] = "Nieprawidłowy status."
+            elif reservation_id in new_statuses:
+                errors[index] = "Rezerwacja powtarza się w żądaniu."
+            else:
+                new_statuses[reservation_id] = new_status
+        if errors and not allow_partial:
+            report = [{'index': index, 'error': errors[index]} for index in sorted(errors)]
+            return Response({'updated': [], 'errors': report}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated, missing, rejected = bulk_change_statuses(request.user, new_statuses, allow_partial=allow_partial)
+        #rezerwacje spoza slotow prowadzacego traktujemy jak nieistniejace
+        for index, item in enumerate(updates):
+            if index in errors:
+                continue
+            if item['id'] in missing:
+                errors[index] = "Nie znaleziono rezerwacji lub nie masz do niej uprawnień."
+            elif item['id'] in rejected:
+                #przywrocenie do pelnego slotu albo kolizja z nowsza rezerwacja studenta
+                errors[index] = rejected[item['id']]
+
+        report = [{'index': index, 'error': errors[index]} for index in sorted(errors)]
+        if errors and not allow_partial:
+            return Response({'updated': [], 'errors': report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'updated': updated,
+            'unchanged': len(new_statuses) - len(updated) - len(missing) - len(rejected),
+            'errors': report,
+        }, status=status.HTTP_200_OK)
+
+
+class WaitlistViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin,
+                      viewsets.GenericViewSet):
+    #lista oczekujacych na pelne sloty - jeden wpis na studenta zamiast ponawiania rezerwacji
+    #get, post, delete
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsStudent]
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [BookingThrottle()]
+        return super().get_throttles()
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(student=self.request.user).select_related(
+            'slot', 'slot__lecturer',
+        ).with_position()
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation, entry = join_waitlist(
+                serializer.validated_data['slot_id'],
+                request.user,
+                topic=serializer.validated_data.get('topic'),
+            )
+        except BookingError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if reservation is not None:
+            #bylo wolne miejsce - od razu rezerwacja
+            return Response(
+                {"status": "reserved", "reservation": ReservationSerializer(reservation).data},
+                status=status.HTTP_201_CREATED,
+            )
+        return Response(
+            {"status": "waiting", "entry": WaitlistEntrySerializer(entry).data},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class LecturerStatsViewSet(viewsets.ViewSet):
+    #Statystyki z tabeli zbiorczej LecturerWeeklyStats - bez agregacji po historii rezerwacji
+    #GET /api/reservations/stats/?group_by=week|subject|lecturer|total&start=2026-10-01&end=2026-12-31
+    permission_classes = [IsLecturerOrAdmin]
+    group_fields = {'week': 'week_start', 'subject': 'subject', 'lecturer': 'lecturer_id', 'total': None}
+
+    def _parse_day(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Nieprawidłowa data w parametrze '{name}' (oczekiwano RRRR-MM-DD).")
+        return day
+
+    def list(self, request):
+        group_by = request.query_params.get('group_by', 'week')
+        if group_by not in self.group_fields:
+            return Response(
+                {"detail": f"Parametr group_by musi być jednym z: {', '.join(self.group_fields)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = LecturerWeeklyStats.objects.all()
+        user = request.user
+        if user.is_superuser or user.role == 'admin':
+            lecturer = request.query_params.get('lecturer')
+            if lecturer:
+                if not lecturer.isdigit():
+                    return Response({"detail": "Nieprawidłowy prowadzący."}, status=status.HTTP_400_BAD_REQUEST)
+                rows = rows.filter(lecturer_id=int(lecturer))
+        else:
+            #prowadzacy widzi tylko swoje statystyki
+            rows = rows.filter(lecturer=user)
+
+        try:
+            start, end = self._parse_day('start'), self._parse_day('end')
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if start:
+            #tydzien, w ktorym wypada poczatek zakresu, liczy sie w calosci
+            rows = rows.filter(week_start__gte=start - timedelta(days=start.weekday()))
+        if end:
+            rows = rows.filter(week_start__lte=end)
+        if request.query_params.get('subject') is not None:
+            rows = rows.filter(subject=request.query_params['subject'])
+
+        #nazwy agregatow nie moga pokrywac sie z polami modelu
+        sums = {f'sum_{field}': Sum(field) for field in COUNTER_FIELDS}
+        group_field = self.group_fields[group_by]
+        if group_field:
+            grouped = rows.order_by(group_field).values(group_field).annotate(**sums)
+        else:
+            grouped = [rows.aggregate(**sums)]
+
+        results = []
+        for row in grouped:
+            counters = {field: row[f'sum_{field}'] or 0 for field in COUNTER_FIELDS}
+            item = {group_field: row[group_field]} if group_field else {}
+            results.append({**item, **counters, **rates(counters)})
+        return Response({'group_by': group_by, 'results': results})
+
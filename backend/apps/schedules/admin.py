@@ -9,7 +9,7 @@ class  AvailableSlotAdmin(admin.ModelAdmin):
 
     #czy slot ma rezerwacje
     def is_reserved(self, obj):
-        return obj.reservations.exists()
+        return obj.active_reservations_count > 0
     is_reserved.boolean = True
     is_reserved.short_description = 'Reserved'
 admin.site.register(AvailableSlot, AvailableSlotAdmin)
\ No newline at end of file
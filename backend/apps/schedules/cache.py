@@ -0,0 +1,139 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+# Zakres generacji obejmujacy wszystkich prowadzacych (lista bez filtra lecturer_id)
+GLOBAL_SCOPE = 'all'
+
+
+def get_schedules_cache():
+    return caches[getattr(settings, 'SCHEDULES_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(scope):
+    return f'schedules:generation:{scope}'
+
+
+def _initial_generation():
+    # generacja startuje od znacznika czasu, wiec po wyczyszczeniu cache nie powtorzy starej wartosci
+    return int(time.time() * 1000)
+
+
+def get_generation(scope):
+    """Zwraca aktualny numer generacji danych dla zakresu (np. id prowadzacego)."""
+    cache = get_schedules_cache()
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_generations(scopes):
+    """Generacje wielu zakresow jednym odczytem z cache: {zakres: generacja}."""
+    cache = get_schedules_cache()
+    found = cache.get_many([_generation_key(scope) for scope in scopes])
+    return {
+        scope: found[_generation_key(scope)] if _generation_key(scope) in found else get_generation(scope)
+        for scope in scopes
+    }
+
+
+def bump_generation(*scopes):
+    """Uniewaznia wszystkie odpowiedzi zapisane w cache dla podanych zakresow."""
+    cache = get_schedules_cache()
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # brak klucza - ustawiamy nowa generacje
+            cache.add(key, _initial_generation(), timeout=None)
+
+
+def bump_lecturer_generation(lecturer_id):
+    # zmiana danych prowadzacego uniewaznia tez liste wszystkich slotow
+    if lecturer_id:
+        from apps.notifications.push import publish_slot_change
+
+        bump_generation(lecturer_id, GLOBAL_SCOPE)
+        # klienci kanalu push (SSE) odswiezaja terminy prowadzacego
+        publish_slot_change(lecturer_id)
+
+
+def student_scope(student_id):
+    #osobny zakres dla danych studenta (jego rezerwacje, kanal ICS)
+    return f'student-{student_id}'
+
+
+def bump_student_generation(*student_ids):
+    bump_generation(*(student_scope(student_id) for student_id in set(student_ids) if student_id))
+
+
+class VersionedListCacheMixin:
+    """
+    Cache odpowiedzi `list` kluczowany filtrami zapytania i numerem generacji.
+
+    Numer generacji jest podbijany przy zmianie danych (sygnaly w apps.schedules.signals
+    i apps.reservations.signals), wiec stare wpisy nie sa nigdy odczytywane i nie trzeba
+    ich usuwac. Odpowiedz niesie silny ETag; gdy klient odesle go w If-None-Match,
+    dostaje 304 bez zapytan do bazy i bez serializacji.
+    """
+    cache_prefix = None
+    #parametry zapytania, ktore wplywaja na tresc odpowiedzi
+    cache_query_params = ()
+    #parametr zawezajacy generacje do jednego prowadzacego
+    cache_scope_param = None
+
+    def get_cache_ttl(self):
+        return getattr(settings, 'PUBLIC_SLOTS_CACHE_TTL', 60)
+
+    def get_cache_scope(self, request):
+        scope = request.query_params.get(self.cache_scope_param, '') if self.cache_scope_param else ''
+        return scope if scope.isdigit() else GLOBAL_SCOPE
+
+    def get_list_cache_key(self, request):
+        params = '&'.join(
+            f'{name}={request.query_params.get(name, "")}' for name in sorted(self.cache_query_params)
+        )
+        digest = hashlib.sha1(params.encode('utf-8')).hexdigest()
+        scope = self.get_cache_scope(request)
+        return f'{self.cache_prefix}:{scope}:{get_generation(scope)}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        cache = get_schedules_cache()
+        cache_key = self.get_list_cache_key(request)
+        cached = cache.get(cache_key)
+
+        if cached is not None:
+            etag, data = cached
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = quote_etag(hashlib.sha256(JSONRenderer().render(response.data)).hexdigest())
+            cache.set(cache_key, (etag, response.data), timeout=self.get_cache_ttl())
+
+        if self._etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        response['ETag'] = etag
+        #klient moze trzymac odpowiedz, ale przed uzyciem musi ja zwalidowac ETagiem
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def _etag_matches(self, request, etag):
+        header = request.headers.get('If-None-Match')
+        if not header:
+            return False
+        etags = parse_etags(header)
+        return '*' in etags or etag in etags
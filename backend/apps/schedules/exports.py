@@ -0,0 +1,148 @@
+"""
+Strumieniowy eksport harmonogramu prowadzacego do CSV.
+
+Wiersze sa generowane leniwie z queryset.iterator(chunk_size=...) z projekcja only(),
+wiec pamiec zuzywana przez eksport nie zalezy od liczby wierszy.
+"""
+import csv
+import zlib
+
+from django.utils import timezone
+
+from apps.reservations.models import Reservation
+from .models import AvailableSlot, BlockedTime, AvailabilityRule
+
+# separator ';' ulatwia otwieranie pliku w polskim Excelu
+CSV_DELIMITER = ';'
+EXPORT_CHUNK_SIZE = 2000
+
+SLOT_HEADER = ['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'POJEMNOSC', 'MIEJSCE', 'PRZEDMIOT', 'AKTYWNY', 'ZAJETE']
+BLOCKED_HEADER = ['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'POWOD', 'DATA_KONIEC']
+RULE_HEADER = ['TYP', 'DZIEN_TYGODNIA', 'GODZINA_START', 'GODZINA_KONIEC', 'POJEMNOSC', 'CZESTOTLIWOSC', 'OD', 'DO', 'MIEJSCE', 'PRZEDMIOT']
+RESERVATION_HEADER = ['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'STUDENT', 'EMAIL', 'TEMAT', 'STATUS']
+
+
+class Echo:
+    #pseudo-bufor dla csv.writer - zwraca zapisany wiersz zamiast go przechowywac
+    def write(self, value):
+        return value
+
+
+def _local(value):
+    return timezone.localtime(value)
+
+
+def _in_range(queryset, start_field, end_field, start, end):
+    if start:
+        queryset = queryset.filter(**{f'{end_field}__gt': start})
+    if end:
+        queryset = queryset.filter(**{f'{start_field}__lt': end})
+    return queryset
+
+
+def iter_schedule_rows(lecturer, start=None, end=None, include_reservations=True):
+    """Kolejne wiersze CSV (listy) z sekcjami: sloty, blokady, reguly, rezerwacje."""
+    yield SLOT_HEADER
+    slots = _in_range(AvailableSlot.objects.filter(lecturer=lecturer), 'start_time', 'end_time', start, end).only(
+        'start_time', 'end_time', 'max_attendees', 'meeting_location', 'subject', 'is_active',
+        'active_reservations_count',
+    ).order_by('start_time', 'id')
+    for slot in slots.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        slot_start, slot_end = _local(slot.start_time), _local(slot.end_time)
+        yield [
+            'DOSTEPNOSC',
+            slot_start.strftime('%Y-%m-%d'),
+            slot_start.strftime('%H:%M'),
+            slot_end.strftime('%H:%M'),
+            slot.max_attendees,
+            slot.meeting_location or '',
+            slot.subject or '',
+            'TAK' if slot.is_active else 'NIE',
+            slot.active_reservations_count,
+        ]
+
+    yield []
+    yield BLOCKED_HEADER
+    blocked_times = _in_range(BlockedTime.objects.filter(lecturer=lecturer), 'start_time', 'end_time', start, end).only(
+        'start_time', 'end_time', 'reason',
+    ).order_by('start_time', 'id')
+    for blocked in blocked_times.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        blocked_start, blocked_end = _local(blocked.start_time), _local(blocked.end_time)
+        yield [
+            'BLOKADA',
+            blocked_start.strftime('%Y-%m-%d'),
+            blocked_start.strftime('%H:%M'),
+            blocked_end.strftime('%H:%M'),
+            blocked.reason or '',
+            blocked_end.strftime('%Y-%m-%d'),
+        ]
+
+    yield []
+    yield RULE_HEADER
+    rules = AvailabilityRule.objects.filter(lecturer=lecturer)
+    if start:
+        rules = rules.filter(valid_until__gte=_local(start).date())
+    if end:
+        rules = rules.filter(valid_from__lte=_local(end).date())
+    for rule in rules.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            'REGULA',
+            rule.weekday,
+            rule.start_time.strftime('%H:%M'),
+            rule.end_time.strftime('%H:%M'),
+            rule.max_attendees,
+            rule.frequency,
+            rule.valid_from.isoformat(),
+            rule.valid_until.isoformat(),
+            rule.meeting_location or '',
+            rule.subject or '',
+        ]
+
+    if not include_reservations:
+        return
+
+    yield []
+    yield RESERVATION_HEADER
+    reservations = _in_range(
+        Reservation.objects.filter(slot__lecturer=lecturer), 'slot__start_time', 'slot__end_time', start, end,
+    ).select_related('slot', 'student').only(
+        'topic', 'status', 'slot__start_time', 'slot__end_time',
+        'student__username', 'student__first_name', 'student__last_name', 'student__email',
+    ).order_by('slot__start_time', 'id')
+    for reservation in reservations.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        slot_start, slot_end = _local(reservation.slot.start_time), _local(reservation.slot.end_time)
+        student = reservation.student
+        yield [
+            'REZERWACJA',
+            slot_start.strftime('%Y-%m-%d'),
+            slot_start.strftime('%H:%M'),
+            slot_end.strftime('%H:%M'),
+            student.get_full_name() or student.username,
+            student.email,
+            reservation.topic or '',
+            reservation.status,
+        ]
+
+
+def stream_csv(rows):
+    """Zamienia wiersze na kolejne fragmenty tekstu CSV (bez buforowania calego pliku)."""
+    writer = csv.writer(Echo(), delimiter=CSV_DELIMITER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_gzip(chunks, flush_size=64 * 1024):
+    """Kompresuje strumien tekstu gzipem, oddajac dane porcjami ok. flush_size bajtow."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> naglowek gzip
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= flush_size:
+            compressed = compressor.compress(b''.join(pending))
+            pending, pending_size = [], 0
+            if compressed:
+                yield compressed
+    yield compressor.compress(b''.join(pending)) + compressor.flush()
@@ -0,0 +1,125 @@
+"""
+Silnik free/busy dla kalendarza prowadzacego.
+
+Wszystkie operacje dzialaja na listach przedzialow (start, end) i sa przebiegami po
+posortowanych danych: sortowanie O(n log n), potem scalanie/odejmowanie O(n + m).
+Modul nie zalezy od ORM, wiec mozna go testowac i mierzyc na zwyklych krotkach.
+"""
+from bisect import bisect_left
+
+
+def clip_intervals(intervals, window_start, window_end):
+    """Przycina przedzialy do okna [window_start, window_end), odrzuca puste."""
+    clipped = []
+    for start, end in intervals:
+        start = max(start, window_start)
+        end = min(end, window_end)
+        if start < end:
+            clipped.append((start, end))
+    return clipped
+
+
+def merge_intervals(intervals):
+    """Sortuje i scala nachodzace lub stykajace sie przedzialy."""
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(base, cuts):
+    """
+    Zwraca base minus cuts. Obie listy musza byc posortowane i scalone
+    (wynik merge_intervals) - wtedy wystarczy jeden przebieg dwoma wskaznikami.
+    """
+    result = []
+    j = 0
+    for start, end in base:
+        # pomijamy wyciecia konczace sie przed biezacym przedzialem
+        while j < len(cuts) and cuts[j][1] <= start:
+            j += 1
+        current = start
+        k = j
+        while k < len(cuts) and cuts[k][0] < end:
+            cut_start, cut_end = cuts[k]
+            if cut_start > current:
+                result.append((current, cut_start))
+            current = max(current, cut_end)
+            if current >= end:
+                break
+            k += 1
+        if current < end:
+            result.append((current, end))
+    return result
+
+
+class IntervalIndex:
+    """
+    Posortowane, scalone przedzialy z wyszukiwaniem kolizji w O(log n).
+    Po scaleniu przedzialy sie nie nakladaja, wiec wystarczy sprawdzic ostatni
+    przedzial zaczynajacy sie przed koncem badanego.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = merge_intervals(intervals)
+        self.starts = [start for start, _ in self.intervals]
+
+    def overlaps(self, start, end):
+        index = bisect_left(self.starts, end) - 1
+        return index >= 0 and self.intervals[index][1] > start
+
+
+def find_mutual_overlaps(intervals):
+    """
+    Dla listy (start, end) zwraca slownik {indeks: indeks kolidujacego przedzialu}.
+    Jeden przebieg po posortowanych przedzialach z zapamietanym najdalszym koncem.
+    """
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i])
+    conflicts = {}
+    furthest = None
+    for i in order:
+        start, end = intervals[i]
+        if furthest is not None and start < intervals[furthest][1]:
+            conflicts[i] = furthest
+        if furthest is None or end > intervals[furthest][1]:
+            furthest = i
+    return conflicts
+
+
+def compute_free_busy(slots, blocked, window_start, window_end):
+    """
+    Laczy sloty, blokady i rezerwacje prowadzacego w oknie czasowym.
+
+    slots   - krotki (start, end, active_reservations_count, max_attendees)
+    blocked - krotki (start, end)
+
+    Zwraca slownik list przedzialow:
+      free    - czas, w ktorym mozna jeszcze zarezerwowac miejsce,
+      booked  - czas slotow z co najmniej jedna aktywna rezerwacja,
+      blocked - czas zablokowany przez prowadzacego.
+    """
+    bookable, booked = [], []
+    for start, end, reserved, capacity in slots:
+        if reserved < capacity:
+            bookable.append((start, end))
+        if reserved > 0:
+            booked.append((start, end))
+
+    bookable = merge_intervals(clip_intervals(bookable, window_start, window_end))
+    booked = merge_intervals(clip_intervals(booked, window_start, window_end))
+    blocked = merge_intervals(clip_intervals(blocked, window_start, window_end))
+
+    # wolny czas = sloty z wolnymi miejscami minus blokady
+    free = subtract_intervals(bookable, blocked)
+
+    return {
+        'free': free,
+        'booked': booked,
+        'blocked': blocked,
+    }
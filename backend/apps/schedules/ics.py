@@ -0,0 +1,221 @@
+"""
+Kanal iCalendar (RFC 5545) z harmonogramem prowadzacego lub rezerwacjami studenta.
+
+Klienci kalendarzy odpytuja kanal co kilka minut, dlatego gotowy plik trzymany jest
+w cache pod kluczem z numerem generacji (patrz cache.py). Token subskrypcji tez jest
+w cache, wiec odpowiedz 304 na If-None-Match/If-Modified-Since nie dotyka bazy.
+"""
+import hashlib
+import secrets
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from apps.reservations.models import Reservation, INACTIVE_STATUSES
+from .cache import get_schedules_cache, get_generation, student_scope
+from .models import BlockedTime, CalendarFeedToken
+from .recurrence import expand_slots
+
+#zakres kanalu wzgledem chwili generowania
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 180
+
+PRODID = '-//AGH Konsultacje//Harmonogram//PL'
+
+
+def get_feed_cache_ttl():
+    return getattr(settings, 'CALENDAR_FEED_CACHE_TTL', 3600)
+
+
+def _token_key(token):
+    return f'ics:token:{token}'
+
+
+def get_or_create_feed_token(user):
+    feed_token, _ = CalendarFeedToken.objects.get_or_create(
+        user=user, defaults={'token': secrets.token_urlsafe(24)}
+    )
+    return feed_token.token
+
+
+def regenerate_feed_token(user):
+    """Nowy token uniewaznia stary adres subskrypcji (np. po jego wycieku)."""
+    token = secrets.token_urlsafe(24)
+    old_token = CalendarFeedToken.objects.filter(user=user).values_list('token', flat=True).first()
+    CalendarFeedToken.objects.update_or_create(user=user, defaults={'token': token})
+    if old_token:
+        get_schedules_cache().delete(_token_key(old_token))
+    return token
+
+
+def resolve_feed_token(token):
+    """Zwraca (user_id, role) wlasciciela tokenu albo None. Wynik trzymany w cache."""
+    cache = get_schedules_cache()
+    key = _token_key(token)
+    owner = cache.get(key)
+    if owner is None:
+        owner = CalendarFeedToken.objects.filter(token=token).values_list('user_id', 'user__role').first()
+        if owner is None:
+            return None
+        cache.set(key, tuple(owner), timeout=get_feed_cache_ttl())
+    return tuple(owner)
+
+
+def feed_scope(user_id, role):
+    return user_id if role == 'lecturer' else student_scope(user_id)
+
+
+def _escape(value):
+    return (
+        str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    #linie dluzsze niz 75 bajtow lamiemy (kontynuacja zaczyna sie od spacji)
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        #nie przecinamy wielobajtowego znaku UTF-8
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    return '\r\n '.join(parts)
+
+
+def _format_dt(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(uid, start, end, summary, stamp, location=None, description=None, status=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_format_dt(start)}',
+        f'DTEND:{_format_dt(end)}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    if location:
+        lines.append(f'LOCATION:{_escape(location)}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    if status:
+        lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def _lecturer_events(lecturer_id, window_start, window_end, stamp):
+    slots = expand_slots([lecturer_id], window_start, window_end)
+    reservations = Reservation.objects.filter(
+        slot__lecturer_id=lecturer_id,
+        slot__start_time__lt=window_end,
+        slot__end_time__gt=window_start,
+    ).exclude(status__in=INACTIVE_STATUSES).select_related('student').only(
+        'slot_id', 'topic', 'student__username', 'student__first_name', 'student__last_name',
+    )
+    students_by_slot = {}
+    for reservation in reservations:
+        student = reservation.student
+        label = student.get_full_name() or student.username
+        if reservation.topic:
+            label += f' ({reservation.topic})'
+        students_by_slot.setdefault(reservation.slot_id, []).append(label)
+
+    for slot in slots:
+        if slot.pk:
+            uid = f'slot-{slot.pk}@konsultacje'
+        else:
+            #wystapienie reguly bez zapisanego slotu - UID stabilny dla (regula, termin)
+            uid = f'rule-{slot.rule_id}-{_format_dt(slot.start_time)}@konsultacje'
+        students = students_by_slot.get(slot.pk, [])
+        description = f'Zajęte miejsca: {slot.active_reservations_count}/{slot.max_attendees}'
+        if students:
+            description += '\n' + '\n'.join(students)
+        yield from _event(
+            uid, slot.start_time, slot.end_time, f'Konsultacje: {slot.subject or "dyżur"}', stamp,
+            location=slot.meeting_location, description=description,
+        )
+
+    blocked_times = BlockedTime.objects.filter(
+        lecturer_id=lecturer_id, start_time__lt=window_end, end_time__gt=window_start,
+    ).only('start_time', 'end_time', 'reason')
+    for blocked in blocked_times:
+        yield from _event(
+            f'blocked-{blocked.pk}@konsultacje', blocked.start_time, blocked.end_time,
+            f'Niedostępny: {blocked.reason or "zablokowany czas"}', stamp,
+        )
+
+
+def _student_events(student_id, window_start, window_end, stamp):
+    reservations = Reservation.objects.filter(
+        student_id=student_id,
+        slot__start_time__lt=window_end,
+        slot__end_time__gt=window_start,
+    ).exclude(status__in=INACTIVE_STATUSES).select_related('slot', 'slot__lecturer')
+    for reservation in reservations:
+        slot = reservation.slot
+        lecturer = slot.lecturer
+        yield from _event(
+            f'reservation-{reservation.pk}@konsultacje', slot.start_time, slot.end_time,
+            f'Konsultacje: {lecturer.get_full_name() or lecturer.username}', stamp,
+            location=slot.meeting_location,
+            description=reservation.topic,
+            status='CONFIRMED' if reservation.status == 'Confirmed' else 'TENTATIVE',
+        )
+
+
+def build_feed(user_id, role, now=None):
+    """Zwraca tresc pliku .ics (str) dla wlasciciela tokenu."""
+    now = now or timezone.now()
+    window_start = now - timedelta(days=FEED_PAST_DAYS)
+    window_end = now + timedelta(days=FEED_FUTURE_DAYS)
+    stamp = _format_dt(now)
+    if role == 'lecturer':
+        name = 'Konsultacje - harmonogram'
+        events = _lecturer_events(user_id, window_start, window_end, stamp)
+    else:
+        name = 'Konsultacje - moje rezerwacje'
+        events = _student_events(user_id, window_start, window_end, stamp)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{name}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+        #sugerowany odstep odpytywania dla klientow
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        *events,
+        'END:VCALENDAR',
+    ]
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def get_cached_feed(user_id, role):
+    """
+    Zwraca (etag, last_modified, body) z cache albo buduje kanal od nowa.
+    Klucz zawiera numer generacji, wiec zmiana danych automatycznie omija stary wpis.
+    """
+    cache = get_schedules_cache()
+    scope = feed_scope(user_id, role)
+    key = f'ics:feed:{scope}:{get_generation(scope)}'
+    cached = cache.get(key)
+    if cached is None:
+        body = build_feed(user_id, role)
+        etag = quote_etag(hashlib.sha256(body.encode('utf-8')).hexdigest())
+        #DTSTAMP zmienia sie przy kazdym budowaniu, ale wpis zyje do zmiany generacji
+        cached = (etag, timezone.now().replace(microsecond=0), body)
+        cache.set(key, cached, timeout=get_feed_cache_ttl())
+    return cached
@@ -0,0 +1,192 @@
+"""
+Wsadowy import harmonogramu z pliku CSV (format zgodny z eksportem, patrz exports.py).
+
+Plik czytany jest strumieniowo, wiersze walidowane sa w paczkach i zapisywane przez
+bulk_create - jedna krotka transakcja na paczke zamiast jednej transakcji na caly plik,
+wiec SQLite nie jest blokowany przez caly czas importu.
+"""
+import codecs
+import csv
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.reservations.stats import record_slots
+from .cache import bump_lecturer_generation
+from .exports import CSV_DELIMITER
+from .models import AvailableSlot, BlockedTime, AvailabilityRule, ScheduleImportJob
+
+IMPORT_CHUNK_SIZE = 1000
+#ile opisow bledow zapisujemy w zadaniu (licznik odrzuconych wierszy jest zawsze pelny)
+MAX_REPORTED_ERRORS = 200
+
+
+class RowError(ValueError):
+    pass
+
+
+def _parse_datetime(day, clock):
+    try:
+        value = datetime.strptime(f"{day.strip()} {clock.strip()}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        raise RowError(f"Nieprawidłowa data lub godzina: '{day} {clock}'.")
+    return timezone.make_aware(value)
+
+
+def _parse_capacity(value):
+    try:
+        capacity = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"Nieprawidłowa pojemność: '{value}'.")
+    if not 1 <= capacity <= 32767:
+        raise RowError("Pojemność musi być z zakresu 1-32767.")
+    return capacity
+
+
+def _column(row, index, default=''):
+    return row[index].strip() if len(row) > index else default
+
+
+def parse_slot_row(row, lecturer):
+    # [TYP, DATA, GODZINA_START, GODZINA_KONIEC, POJEMNOSC, MIEJSCE, PRZEDMIOT, AKTYWNY, ...]
+    if len(row) < 5:
+        raise RowError("Za mało kolumn dla wiersza DOSTEPNOSC.")
+    start = _parse_datetime(row[1], row[2])
+    end = _parse_datetime(row[1], row[3])
+    if end <= start:
+        raise RowError("Koniec slotu musi być po jego początku.")
+    return AvailableSlot(
+        lecturer=lecturer,
+        start_time=start,
+        end_time=end,
+        max_attendees=_parse_capacity(row[4]),
+        meeting_location=_column(row, 5) or None,
+        subject=_column(row, 6) or None,
+        is_active=_column(row, 7, 'TAK').upper() != 'NIE',
+    )
+
+
+def parse_blocked_row(row, lecturer):
+    # [TYP, DATA, GODZINA_START, GODZINA_KONIEC, POWOD, DATA_KONIEC]
+    if len(row) < 4:
+        raise RowError("Za mało kolumn dla wiersza BLOKADA.")
+    start = _parse_datetime(row[1], row[2])
+    end = _parse_datetime(_column(row, 5) or row[1], row[3])
+    if end <= start:
+        raise RowError("Koniec blokady musi być po jej początku.")
+    return BlockedTime(lecturer=lecturer, start_time=start, end_time=end, reason=_column(row, 4) or None)
+
+
+def parse_rule_row(row, lecturer):
+    # [TYP, DZIEN_TYGODNIA, GODZINA_START, GODZINA_KONIEC, POJEMNOSC, CZESTOTLIWOSC, OD, DO, MIEJSCE, PRZEDMIOT]
+    if len(row) < 8:
+        raise RowError("Za mało kolumn dla wiersza REGULA.")
+    try:
+        weekday = int(row[1])
+        start_time = datetime.strptime(row[2].strip(), '%H:%M').time()
+        end_time = datetime.strptime(row[3].strip(), '%H:%M').time()
+        valid_from = datetime.strptime(row[6].strip(), '%Y-%m-%d').date()
+        valid_until = datetime.strptime(row[7].strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError("Nieprawidłowy dzień tygodnia, godzina lub data reguły.")
+    frequency = row[5].strip().lower()
+    if weekday not in range(7) or frequency not in dict(AvailabilityRule.FREQUENCY_CHOICES):
+        raise RowError("Nieprawidłowy dzień tygodnia lub częstotliwość reguły.")
+    if end_time <= start_time or valid_until < valid_from:
+        raise RowError("Nieprawidłowy zakres godzin lub dat reguły.")
+    return AvailabilityRule(
+        lecturer=lecturer,
+        weekday=weekday,
+        frequency=frequency,
+        start_time=start_time,
+        end_time=end_time,
+        max_attendees=_parse_capacity(row[4]),
+        valid_from=valid_from,
+        valid_until=valid_until,
+        meeting_location=_column(row, 8) or None,
+        subject=_column(row, 9) or None,
+    )
+
+
+ROW_PARSERS = {
+    'DOSTEPNOSC': parse_slot_row,
+    'BLOKADA': parse_blocked_row,
+    'REGULA': parse_rule_row,
+}
+
+
+def _save_chunk(job, objects, processed, rejected, errors):
+    with transaction.atomic():
+        for model in (AvailableSlot, BlockedTime, AvailabilityRule):
+            batch = [obj for obj in objects if isinstance(obj, model)]
+            if batch:
+                model.objects.bulk_create(batch)
+        #bulk_create nie wysyla sygnalow - sloty dopisujemy do statystyk recznie
+        record_slots([obj for obj in objects if isinstance(obj, AvailableSlot)])
+        job.rows_processed = processed
+        job.rows_imported += len(objects)
+        job.rows_rejected = rejected
+        job.errors = errors
+        job.save(update_fields=['rows_processed', 'rows_imported', 'rows_rejected', 'errors'])
+
+
+def run_schedule_import(job_id, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Przetwarza zadanie importu; postep zapisywany jest po kazdej paczce.
+    Zadanie przejmuje warunkowy UPDATE (ponownie dostarczone zadanie Celery nie importuje
+    pliku drugi raz). Import zakonczony bledem jest wznawiany po rows_processed - wczesniejsze
+    paczki sa juz zapisane razem z licznikami.
+    """
+    claimed = ScheduleImportJob.objects.filter(pk=job_id, status__in=('pending', 'failed')).update(
+        status='running', started_at=Coalesce('started_at', Value(timezone.now())), finished_at=None,
+    )
+    job = ScheduleImportJob.objects.select_related('lecturer').get(pk=job_id)
+    if not claimed:
+        return job
+
+    #stan z ostatniej zapisanej paczki (bez opisu bledu przerwanego przebiegu)
+    resume_after = processed = job.rows_processed
+    rejected = job.rows_rejected
+    errors = [error for error in job.errors if error.get('row') is not None]
+    saved_errors = len(errors)
+    pending = []
+    try:
+        with job.file.open('rb') as raw:
+            #dekodowanie strumieniowe - plik nigdy nie jest w calosci w pamieci
+            reader = csv.reader(codecs.iterdecode(raw, 'utf-8-sig'), delimiter=CSV_DELIMITER)
+            for line_number, row in enumerate(reader, start=1):
+                row_type = row[0].strip().upper() if row else ''
+                parser = ROW_PARSERS.get(row_type)
+                if parser is None:
+                    continue  # naglowki, puste wiersze, sekcja rezerwacji
+                if resume_after:
+                    #wiersz zapisany w poprzednim przebiegu
+                    resume_after -= 1
+                    continue
+                processed += 1
+                try:
+                    pending.append(parser(row, job.lecturer))
+                except RowError as e:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': line_number, 'error': str(e)})
+                if processed % chunk_size == 0:
+                    _save_chunk(job, pending, processed, rejected, errors)
+                    saved_errors = len(errors)
+                    pending = []
+        _save_chunk(job, pending, processed, rejected, errors)
+    except Exception as e:
+        job.status = 'failed'
+        #bledy wierszy z niezapisanej paczki pojawia sie ponownie przy wznowieniu
+        job.errors = errors[:saved_errors] + [{'row': None, 'error': f"Błąd przetwarzania pliku CSV: {e}"}]
+    else:
+        job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'errors', 'finished_at'])
+
+    #bulk_create nie wysyla sygnalow - uniewazniamy cache harmonogramu recznie
+    bump_lecturer_generation(job.lecturer_id)
+    return job
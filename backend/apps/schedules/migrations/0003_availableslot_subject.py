@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0002_blockedtime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availableslot',
+            name='subject',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Przedmiot'),
+        ),
+    ]
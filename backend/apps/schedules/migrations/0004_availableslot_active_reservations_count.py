@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+INACTIVE_STATUSES = ('Cancelled', 'No-Show Student', 'No-Show Lecturer')
+
+
+def fill_active_reservations_count(apps, schema_editor):
+    AvailableSlot = apps.get_model('schedules', 'AvailableSlot')
+    slots = AvailableSlot.objects.annotate(
+        real_count=Count('reservations', filter=~Q(reservations__status__in=INACTIVE_STATUSES))
+    ).filter(real_count__gt=0)
+    for slot in slots.iterator():
+        AvailableSlot.objects.filter(pk=slot.pk).update(active_reservations_count=slot.real_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0003_availableslot_subject'),
+        ('reservations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availableslot',
+            name='active_reservations_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba aktywnych rezerwacji'),
+        ),
+        migrations.RunPython(fill_active_reservations_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0004_availableslot_active_reservations_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availableslot',
+            index=models.Index(fields=['is_active', 'start_time'], name='slot_active_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availableslot',
+            index=models.Index(fields=['lecturer', 'is_active', 'start_time'], name='slot_lecturer_active_start_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedules', '0005_availableslot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('weekly', 'Co tydzień'), ('biweekly', 'Co dwa tygodnie')], default='weekly', max_length=10, verbose_name='Częstotliwość')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Poniedziałek'), (1, 'Wtorek'), (2, 'Środa'), (3, 'Czwartek'), (4, 'Piątek'), (5, 'Sobota'), (6, 'Niedziela')], verbose_name='Dzień tygodnia')),
+                ('start_time', models.TimeField(verbose_name='Godzina rozpoczęcia')),
+                ('end_time', models.TimeField(verbose_name='Godzina zakończenia')),
+                ('valid_from', models.DateField(verbose_name='Obowiązuje od')),
+                ('valid_until', models.DateField(verbose_name='Obowiązuje do')),
+                ('meeting_location', models.CharField(blank=True, max_length=255, null=True, verbose_name='Miejsce spotkania')),
+                ('max_attendees', models.PositiveSmallIntegerField(default=1, verbose_name='Maksymalna liczba studentów na slot')),
+                ('subject', models.CharField(blank=True, max_length=255, null=True, verbose_name='Przedmiot')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Czy reguła jest aktywna')),
+            ],
+            options={
+                'verbose_name': 'Reguła dostępności',
+                'verbose_name_plural': 'Reguły dostępności',
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityRuleException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data wyjątku')),
+            ],
+            options={
+                'verbose_name': 'Wyjątek reguły',
+                'verbose_name_plural': 'Wyjątki reguł',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='availabilityruleexception',
+            name='rule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='schedules.availabilityrule'),
+        ),
+        migrations.AddField(
+            model_name='availabilityrule',
+            name='lecturer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='availableslot',
+            name='rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='materialized_slots', to='schedules.availabilityrule', verbose_name='Reguła cykliczna'),
+        ),
+        migrations.AddConstraint(
+            model_name='availableslot',
+            constraint=models.UniqueConstraint(fields=('rule', 'start_time'), name='unique_rule_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='availabilityruleexception',
+            constraint=models.UniqueConstraint(fields=('rule', 'date'), name='unique_rule_exception_date'),
+        ),
+        migrations.AddIndex(
+            model_name='availabilityrule',
+            index=models.Index(fields=['lecturer', 'is_active', 'valid_until'], name='rule_lecturer_active_idx'),
+        ),
+    ]
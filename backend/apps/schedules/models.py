@@ -1,5 +1,82 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+
+class AvailabilityRule(models.Model):
+    #regula cyklicznych konsultacji (np. kazdy wtorek 10:00-11:30 przez semestr)
+    #wystapienia sa rozwijane w locie, w bazie zapisujemy tylko te zarezerwowane lub edytowane
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Co tydzień'),
+        ('biweekly', 'Co dwa tygodnie'),
+    ]
+    WEEKDAY_CHOICES = [
+        (0, 'Poniedziałek'),
+        (1, 'Wtorek'),
+        (2, 'Środa'),
+        (3, 'Czwartek'),
+        (4, 'Piątek'),
+        (5, 'Sobota'),
+        (6, 'Niedziela'),
+    ]
+
+    lecturer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='availability_rules',
+    )
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly', verbose_name="Częstotliwość")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name="Dzień tygodnia")
+
+    #godziny w czasie lokalnym (TIME_ZONE)
+    start_time = models.TimeField(verbose_name="Godzina rozpoczęcia")
+    end_time = models.TimeField(verbose_name="Godzina zakończenia")
+
+    #okres obowiazywania reguly (np. semestr)
+    valid_from = models.DateField(verbose_name="Obowiązuje od")
+    valid_until = models.DateField(verbose_name="Obowiązuje do")
+
+    meeting_location = models.CharField(max_length=255, blank=True, null=True, verbose_name="Miejsce spotkania")
+    max_attendees = models.PositiveSmallIntegerField(default=1, verbose_name="Maksymalna liczba studentów na slot")
+    subject = models.CharField(max_length=255, blank=True, null=True, verbose_name="Przedmiot")
+    is_active = models.BooleanField(default=True, verbose_name="Czy reguła jest aktywna")
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        verbose_name = "Reguła dostępności"
+        verbose_name_plural = "Reguły dostępności"
+        indexes = [
+            models.Index(fields=['lecturer', 'is_active', 'valid_until'], name='rule_lecturer_active_idx'),
+        ]
+
+    @property
+    def interval_weeks(self):
+        return 2 if self.frequency == 'biweekly' else 1
+
+    def __str__(self):
+        return (
+            f"Reguła {self.lecturer.get_full_name()} "
+            f"({self.get_frequency_display()}, {self.get_weekday_display()} "
+            f"{self.start_time.strftime('%H:%M')}-{self.end_time.strftime('%H:%M')})"
+        )
+
+
+class AvailabilityRuleException(models.Model):
+    #dzien, w ktorym regula nie obowiazuje (np. swieto, wyjazd)
+    rule = models.ForeignKey(AvailabilityRule, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField(verbose_name="Data wyjątku")
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = "Wyjątek reguły"
+        verbose_name_plural = "Wyjątki reguł"
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'date'], name='unique_rule_exception_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.rule_id}: bez zajęć {self.date}"
+
 
 class AvailableSlot(models.Model):
     #relacja dla prowadzacego ktory utworzyl ten slot
@@ -40,12 +117,38 @@ class AvailableSlot(models.Model):
     #kolumna przedmiot
     subject = models.CharField(max_length=255, blank=True, null=True, verbose_name="Przedmiot")
 
+    #regula, z ktorej slot zostal zmaterializowany (None dla slotow tworzonych recznie)
+    rule = models.ForeignKey(
+        AvailabilityRule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='materialized_slots',
+        verbose_name="Reguła cykliczna"
+    )
+
+    #licznik aktywnych rezerwacji (bez anulowanych i nieobecnosci)
+    #utrzymywany przez apps.reservations w tej samej transakcji co zmiana rezerwacji
+    active_reservations_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Liczba aktywnych rezerwacji"
+    )
+
     class Meta:
         ordering = ['start_time']
         verbose_name = "Dostępny slot"
         verbose_name_plural = "Dostępne sloty"
-
-        # backend/apps/schedules/models.py (Poprawka)
+        indexes = [
+            #publiczna lista slotow (paginacja kursorowa po start_time)
+            models.Index(fields=['is_active', 'start_time'], name='slot_active_start_idx'),
+            #lista slotow konkretnego prowadzacego
+            models.Index(fields=['lecturer', 'is_active', 'start_time'], name='slot_lecturer_active_start_idx'),
+        ]
+        constraints = [
+            #kazde wystapienie reguly materializowane jest co najwyzej raz
+            models.UniqueConstraint(fields=['rule', 'start_time'], name='unique_rule_occurrence'),
+        ]
 
     def __str__(self):
         return (
@@ -73,3 +176,63 @@ class BlockedTime(models.Model):
     def __str__(self):
         return f"{self.lecturer.get_full_name()} blocked {self.start_time} - {self.end_time}"
 
+
+class ScheduleImportJob(models.Model):
+    #import CSV przetwarzany w tle przez Celery (postep odczytywany przez endpoint statusu)
+    STATUS_CHOICES = [
+        ('pending', 'Oczekuje'),
+        ('running', 'W trakcie'),
+        ('completed', 'Zakończony'),
+        ('failed', 'Błąd'),
+    ]
+
+    lecturer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='schedule_imports'
+    )
+    file = models.FileField(upload_to='schedule_imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    #lista {"row": nr, "error": opis} - przycinana, zeby nie rosla z rozmiarem pliku
+    errors = models.JSONField(default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import harmonogramu"
+        verbose_name_plural = "Importy harmonogramu"
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.lecturer.username}, {self.status})"
+
+
+class CalendarFeedToken(models.Model):
+    #tajny token w adresie subskrypcji .ics (klienci kalendarzy nie wysylaja JWT)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed_token'
+    )
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Token subskrypcji kalendarza"
+        verbose_name_plural = "Tokeny subskrypcji kalendarza"
+
+    def __str__(self):
+        return f"Kanał ICS {self.user.username}"
@@ -0,0 +1,183 @@
+"""
+"Najblizszy wolny termin" - K najwczesniejszych terminow do zarezerwowania.
+
+Dla kazdego prowadzacego budowany jest indeks wolnych terminow z najblizszych
+RECOMMENDATION_HORIZON_DAYS dni: posortowana po starcie lista gotowych do wyslania slotow
+(takze wystapien regul) oraz osobne listy per przedmiot. Indeks jest kluczowany numerem
+generacji prowadzacego (patrz cache.py), wiec zmiana slotu lub rezerwacji przebudowuje
+tylko indeks tego prowadzacego. Zapytanie bez prowadzacego nie ma wlasnego indeksu
+(generacja globalna zmienia sie przy kazdej rezerwacji) - laczy leniwie (heapq.merge)
+indeksy wszystkich prowadzacych. Zapytanie to bisect po czasie startu i przejscie do przodu
+az do znalezienia K pasujacych terminow - bez skanowania tabeli slotow.
+"""
+import heapq
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from apps.reservations.models import Reservation, INACTIVE_STATUSES
+from .cache import get_generations, get_schedules_cache
+from .freebusy import IntervalIndex
+from .recurrence import expand_slots
+from .serializers import AvailableSlotSerializer
+
+RECOMMENDATION_HORIZON_DAYS = 60
+#indeksy prowadzacych trzymane tez w pamieci procesu (bez odczytu z cache) - jeden na prowadzacego
+LOCAL_INDEX_LIMIT = 1024
+#lista prowadzacych do zapytan bez lecturer_id (nowy prowadzacy pojawia sie po tym czasie)
+LECTURERS_CACHE_TTL = 300
+_local_indexes = OrderedDict()
+#watki workera wspoldziela slownik - get/move_to_end/popitem pod jedna blokada (bez budowania indeksu)
+_local_indexes_lock = threading.Lock()
+
+
+class SlotIndex:
+    """Terminy posortowane po starcie; `starts` pozwala znalezc pierwszy przyszly w O(log n)."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.starts = [entry['start'] for entry in entries]
+
+    def iter_from(self, moment):
+        for index in range(bisect_left(self.starts, moment), len(self.entries)):
+            yield self.entries[index]
+
+
+def _subject_key(subject):
+    return (subject or '').strip().lower()
+
+
+def _minute_of_day(value):
+    local = timezone.localtime(value)
+    return local.hour * 60 + local.minute
+
+
+def build_index(lecturer_ids, now):
+    """Zwraca {'all': SlotIndex, 'subjects': {przedmiot: SlotIndex}} dla wolnych terminow."""
+    slots = expand_slots(lecturer_ids, now, now + timedelta(days=RECOMMENDATION_HORIZON_DAYS))
+    entries = []
+    for slot in slots:
+        if slot.start_time <= now or slot.active_reservations_count >= slot.max_attendees:
+            continue
+        entries.append({
+            'start': slot.start_time,
+            'end': slot.end_time,
+            'subject': _subject_key(slot.subject),
+            'lecturer_id': slot.lecturer_id,
+            'start_minute': _minute_of_day(slot.start_time),
+            'end_minute': _minute_of_day(slot.end_time),
+            'weekday': timezone.localtime(slot.start_time).isoweekday(),
+            #gotowa odpowiedz - zapytanie nie serializuje slotow
+            'data': dict(AvailableSlotSerializer(slot).data),
+        })
+    by_subject = {}
+    for entry in entries:
+        by_subject.setdefault(entry['subject'], []).append(entry)
+    return {
+        'all': SlotIndex(entries),
+        'subjects': {subject: SlotIndex(items) for subject, items in by_subject.items()},
+    }
+
+
+def _index_key(lecturer_id, generation, now):
+    #data w kluczu przesuwa horyzont raz na dobe
+    return f'recommend:{lecturer_id}:{generation}:{timezone.localdate(now).isoformat()}'
+
+
+def get_indexes(lecturer_ids):
+    """
+    Indeksy prowadzacych w kolejnosci lecturer_ids. Generacje i brakujace indeksy sa czytane
+    z cache jednym get_many; budowany jest tylko indeks prowadzacego, ktorego dane sie zmienily.
+    """
+    now = timezone.now()
+    cache = get_schedules_cache()
+    keys = {
+        lecturer_id: _index_key(lecturer_id, generation, now)
+        for lecturer_id, generation in get_generations(lecturer_ids).items()
+    }
+
+    indexes = {}
+    with _local_indexes_lock:
+        for lecturer_id, key in keys.items():
+            local = _local_indexes.get(lecturer_id)
+            if local is not None and local[0] == key:
+                _local_indexes.move_to_end(lecturer_id)
+                indexes[lecturer_id] = local[1]
+
+    missing = [lecturer_id for lecturer_id in lecturer_ids if lecturer_id not in indexes]
+    cached = cache.get_many([keys[lecturer_id] for lecturer_id in missing]) if missing else {}
+    for lecturer_id in missing:
+        index = cached.get(keys[lecturer_id])
+        if index is None:
+            index = build_index([lecturer_id], now)
+            cache.set(keys[lecturer_id], index, timeout=getattr(settings, 'RECOMMENDATION_CACHE_TTL', 86400))
+        indexes[lecturer_id] = index
+        with _local_indexes_lock:
+            _local_indexes[lecturer_id] = (keys[lecturer_id], index)
+            _local_indexes.move_to_end(lecturer_id)
+            if len(_local_indexes) > LOCAL_INDEX_LIMIT:
+                _local_indexes.popitem(last=False)
+    return [indexes[lecturer_id] for lecturer_id in lecturer_ids]
+
+
+def get_index(lecturer_id):
+    return get_indexes([lecturer_id])[0]
+
+
+def get_lecturer_ids():
+    cache = get_schedules_cache()
+    lecturer_ids = cache.get('recommend:lecturers')
+    if lecturer_ids is None:
+        lecturer_ids = list(
+            get_user_model().objects.filter(role='lecturer').order_by('pk').values_list('pk', flat=True)
+        )
+        cache.set('recommend:lecturers', lecturer_ids, timeout=LECTURERS_CACHE_TTL)
+    return lecturer_ids
+
+
+def student_busy_index(student_id, now):
+    #aktywne przyszle rezerwacje studenta - terminy z nimi kolidujace sa pomijane
+    intervals = Reservation.objects.filter(
+        student_id=student_id, slot__end_time__gt=now,
+    ).exclude(status__in=INACTIVE_STATUSES).values_list('slot__start_time', 'slot__end_time')
+    return IntervalIndex(list(intervals))
+
+
+def recommend_slots(lecturer_id=None, subject=None, after=None, before=None, weekdays=None,
+                    student_id=None, limit=5):
+    """
+    Zwraca do `limit` najwczesniejszych wolnych terminow (dane AvailableSlotSerializer).
+    after/before - minuty od polnocy (czas lokalny), weekdays - zbior dni ISO (1 = poniedzialek).
+    """
+    now = timezone.now()
+    indexes = get_indexes([lecturer_id] if lecturer_id else get_lecturer_ids())
+    if subject:
+        indexes = [index['subjects'].get(_subject_key(subject)) for index in indexes]
+        indexes = [index for index in indexes if index is not None]
+    else:
+        indexes = [index['all'] for index in indexes]
+    if not indexes:
+        return []
+    busy = student_busy_index(student_id, now) if student_id else None
+
+    #leniwe scalanie - odczytywane sa tylko terminy do K-tego pasujacego
+    candidates = heapq.merge(*(index.iter_from(now) for index in indexes), key=lambda entry: entry['start'])
+    results = []
+    for entry in candidates:
+        if after is not None and entry['start_minute'] < after:
+            continue
+        if before is not None and entry['end_minute'] > before:
+            continue
+        if weekdays and entry['weekday'] not in weekdays:
+            continue
+        if busy is not None and busy.overlaps(entry['start'], entry['end']):
+            continue
+        results.append(entry['data'])
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,132 @@
+"""
+Leniwe rozwijanie regul cyklicznych (AvailabilityRule) w wystapienia.
+
+Wystapienia istnieja tylko w pamieci, dopoki ktos ich nie zarezerwuje albo nie
+edytuje - wtedy materialize_occurrence zapisuje pojedynczy AvailableSlot.
+Dzieki temu rozmiar tabeli slotow zalezy od liczby rezerwacji, a nie od dlugosci semestru.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import AvailabilityRule, AvailableSlot
+
+
+class OccurrenceError(ValueError):
+    pass
+
+
+def _aware(day, clock):
+    return timezone.make_aware(datetime.combine(day, clock))
+
+
+def iter_occurrence_dates(rule, first_day, last_day):
+    """Daty wystapien reguly w zakresie [first_day, last_day] (bez uwzgledniania wyjatkow)."""
+    last_day = min(last_day, rule.valid_until)
+    step = timedelta(weeks=rule.interval_weeks)
+    #pierwsze wystapienie reguly wyznacza faze dla trybu co dwa tygodnie
+    first_occurrence = rule.valid_from + timedelta(days=(rule.weekday - rule.valid_from.weekday()) % 7)
+    if first_day <= first_occurrence:
+        current = first_occurrence
+    else:
+        steps = -(-(first_day - first_occurrence).days // step.days)
+        current = first_occurrence + steps * step
+    while current <= last_day:
+        yield current
+        current += step
+
+
+def iter_rule_occurrences(rule, window_start, window_end, excluded_dates=()):
+    """Zwraca (start, end) kolejnych wystapien reguly nachodzacych na okno czasowe."""
+    first_day = timezone.localtime(window_start).date() - timedelta(days=1)
+    last_day = timezone.localtime(window_end).date()
+    for day in iter_occurrence_dates(rule, first_day, last_day):
+        if day in excluded_dates:
+            continue
+        start = _aware(day, rule.start_time)
+        end = _aware(day, rule.end_time)
+        if start < window_end and end > window_start:
+            yield start, end
+
+
+def build_virtual_slot(rule, start, end):
+    #niezapisany AvailableSlot (pk=None) - serializuje sie tak samo jak prawdziwy slot
+    return AvailableSlot(
+        lecturer=rule.lecturer,
+        rule=rule,
+        start_time=start,
+        end_time=end,
+        meeting_location=rule.meeting_location,
+        max_attendees=rule.max_attendees,
+        subject=rule.subject,
+        is_active=True,
+    )
+
+
+def expand_slots(lecturer_ids, window_start, window_end, only_active=True):
+    """
+    Zwraca posortowana po czasie liste slotow w oknie: zapisane w bazie + wirtualne
+    wystapienia regul. Liczba zapytan jest stala (sloty, reguly z wyjatkami).
+    lecturer_ids=None oznacza wszystkich prowadzacych.
+    """
+    slots = AvailableSlot.objects.filter(
+        start_time__lt=window_end, end_time__gt=window_start,
+    ).select_related('lecturer')
+    rules = AvailabilityRule.objects.filter(
+        is_active=True,
+        valid_from__lte=timezone.localtime(window_end).date(),
+        valid_until__gte=timezone.localtime(window_start).date(),
+    ).select_related('lecturer').prefetch_related('exceptions')
+    if lecturer_ids is not None:
+        slots = slots.filter(lecturer_id__in=lecturer_ids)
+        rules = rules.filter(lecturer_id__in=lecturer_ids)
+
+    result = []
+    #wystapienia juz zmaterializowane (takze dezaktywowane) nie sa generowane ponownie
+    materialized = set()
+    for slot in slots:
+        if slot.rule_id:
+            materialized.add((slot.rule_id, slot.start_time))
+        if slot.is_active or not only_active:
+            result.append(slot)
+
+    for rule in rules:
+        excluded = {exception.date for exception in rule.exceptions.all()}
+        for start, end in iter_rule_occurrences(rule, window_start, window_end, excluded):
+            if (rule.pk, start) not in materialized:
+                result.append(build_virtual_slot(rule, start, end))
+
+    result.sort(key=lambda slot: (slot.start_time, slot.pk or 0))
+    return result
+
+
+def find_occurrence(rule, start):
+    """Sprawdza, czy `start` jest prawidlowym wystapieniem reguly, i zwraca (start, end)."""
+    if not rule.is_active:
+        raise OccurrenceError("Reguła jest nieaktywna.")
+    day = timezone.localtime(start).date()
+    excluded = set(rule.exceptions.filter(date=day).values_list('date', flat=True))
+    for occurrence_start, occurrence_end in iter_rule_occurrences(rule, start, start + timedelta(seconds=1), excluded):
+        if occurrence_start == start:
+            return occurrence_start, occurrence_end
+    raise OccurrenceError("Podany termin nie jest wystąpieniem tej reguły.")
+
+
+def materialize_occurrence(rule, start):
+    """
+    Zapisuje wystapienie reguly jako AvailableSlot (lub zwraca juz istniejacy).
+    Unikalne ograniczenie (rule, start_time) chroni przed podwojnym zapisem przy wyscigu.
+    """
+    occurrence_start, occurrence_end = find_occurrence(rule, start)
+    existing = AvailableSlot.objects.filter(rule=rule, start_time=occurrence_start).first()
+    if existing is not None:
+        return existing, False
+
+    slot = build_virtual_slot(rule, occurrence_start, occurrence_end)
+    try:
+        with transaction.atomic():
+            slot.save()
+    except IntegrityError:
+        return AvailableSlot.objects.get(rule=rule, start_time=occurrence_start), False
+    return slot, True
@@ -1,13 +1,13 @@
 from rest_framework import serializers
 from django.db import models
-from .models import AvailableSlot,  BlockedTime
+from .models import AvailableSlot, BlockedTime, AvailabilityRule, AvailabilityRuleException, ScheduleImportJob
 from apps.reservations.models import Reservation
 from apps.users.serializers import UserSerializer
 
 class AvailableSlotSerializer(serializers.ModelSerializer):
     #read only dla wyswietlenia nazwy wykladowcy
     lecturer_details = serializers.CharField(source='lecturer.get_full_name', read_only=True)
-    reservations_count=serializers.SerializerMethodField()
+    reservations_count = serializers.IntegerField(source='active_reservations_count', read_only=True)
     class Meta:
         model = AvailableSlot
         fields=(
@@ -20,13 +20,9 @@ class AvailableSlotSerializer(serializers.ModelSerializer):
             'reservations_count',
             'is_active',
             'subject',
+            'rule',
         )
-        read_only_fields=('lecturer','lecturer_details')
-
-    def get_reservations_count(self, obj):
-        return obj.reservations.exclude(
-            status__in=['Cancelled', 'No-Show Student', 'No-Show Lecturer']
-        ).count()
+        read_only_fields=('lecturer','lecturer_details','rule')
 
 class AvailableSlotCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -57,4 +53,77 @@ class BlockedTimeCreateSerializer(serializers.ModelSerializer):
             'start_time',
             'end_time',
             'reason'
-        )
\ No newline at end of file
+        )
+
+class AvailabilityRuleSerializer(serializers.ModelSerializer):
+    #daty, w ktorych regula nie obowiazuje (zapisywane jako AvailabilityRuleException)
+    excluded_dates = serializers.ListField(child=serializers.DateField(), required=False)
+
+    class Meta:
+        model = AvailabilityRule
+        fields = (
+            'id',
+            'frequency',
+            'weekday',
+            'start_time',
+            'end_time',
+            'valid_from',
+            'valid_until',
+            'meeting_location',
+            'max_attendees',
+            'subject',
+            'is_active',
+            'excluded_dates',
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['excluded_dates'] = [exception.date.isoformat() for exception in instance.exceptions.all()]
+        return data
+
+    def validate(self, data):
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        valid_from = data.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = data.get('valid_until', getattr(self.instance, 'valid_until', None))
+
+        if start_time and end_time and end_time <= start_time:
+            raise serializers.ValidationError("Godzina zakończenia musi być późniejsza niż rozpoczęcia.")
+        if valid_from and valid_until:
+            if valid_until < valid_from:
+                raise serializers.ValidationError("Data końcowa reguły nie może być wcześniejsza niż początkowa.")
+            if (valid_until - valid_from).days > 366:
+                raise serializers.ValidationError("Reguła może obowiązywać najwyżej rok.")
+        return data
+
+    def create(self, validated_data):
+        excluded_dates = validated_data.pop('excluded_dates', [])
+        rule = super().create(validated_data)
+        self._save_exceptions(rule, excluded_dates)
+        return rule
+
+    def update(self, instance, validated_data):
+        excluded_dates = validated_data.pop('excluded_dates', None)
+        rule = super().update(instance, validated_data)
+        if excluded_dates is not None:
+            rule.exceptions.all().delete()
+            self._save_exceptions(rule, excluded_dates)
+        return rule
+
+    def _save_exceptions(self, rule, excluded_dates):
+        AvailabilityRuleException.objects.bulk_create(
+            [AvailabilityRuleException(rule=rule, date=day) for day in set(excluded_dates)]
+        )
+
+
+class ScheduleImportJobSerializer(serializers.ModelSerializer):
+    #postep importu CSV (odpytywany przez frontend)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ScheduleImportJob
+        fields = [
+            'id', 'status', 'rows_processed', 'rows_imported', 'rows_rejected', 'errors',
+            'rows_per_second', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
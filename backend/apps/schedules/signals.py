@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_lecturer_generation, bump_student_generation
+from .models import AvailableSlot, BlockedTime, AvailabilityRule
+
+
+@receiver(post_save, sender=AvailableSlot)
+@receiver(post_delete, sender=AvailableSlot)
+@receiver(post_save, sender=BlockedTime)
+@receiver(post_delete, sender=BlockedTime)
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+def invalidate_lecturer_schedule(sender, instance, **kwargs):
+    # nowa generacja dopiero po commicie, zeby nikt nie zapisal w cache starych danych pod nowym kluczem
+    lecturer_id = instance.lecturer_id
+    transaction.on_commit(lambda: bump_lecturer_generation(lecturer_id))
+
+
+@receiver(post_save, sender=AvailableSlot)
+def invalidate_student_feeds(sender, instance, created, **kwargs):
+    # zmiana terminu/miejsca slotu musi trafic do kanalow ICS studentow, ktorzy go zarezerwowali
+    if created:
+        return
+    student_ids = list(instance.reservations.values_list('student_id', flat=True))
+    if student_ids:
+        transaction.on_commit(lambda: bump_student_generation(*student_ids))
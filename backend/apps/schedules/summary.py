@@ -0,0 +1,121 @@
+"""
+Dzienne podsumowania kalendarza (widok miesiaca/tygodnia).
+
+Zamiast listy wszystkich slotow z zagniezdzonymi danymi prowadzacego zwracamy po
+jednym wierszu na dzien. Sloty i blokady sa grupowane po dniu (czas lokalny) w bazie,
+a oba zbiory laczone przez UNION ALL - jedno zapytanie niezaleznie od liczby slotow.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import AvailableSlot, BlockedTime, AvailabilityRule
+from .recurrence import iter_rule_occurrences
+
+ZERO_DURATION = Value(timedelta(0), output_field=DurationField())
+ZERO = Value(0, output_field=IntegerField())
+
+
+def _duration():
+    return ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+
+
+def _sum_duration(condition=None):
+    return Coalesce(Sum(_duration(), filter=condition, output_field=DurationField()), ZERO_DURATION)
+
+
+def _minutes(value):
+    return int(value.total_seconds() // 60) if value else 0
+
+
+def _empty_day():
+    return {
+        'slots': 0, 'free_slots': 0, 'booked_slots': 0, 'free_seats': 0, 'reservations': 0,
+        'free_minutes': 0, 'booked_minutes': 0, 'blocked_minutes': 0,
+    }
+
+
+def summarize_days(lecturer_ids, window_start, window_end, only_active=True, include_blocked=True,
+                   include_rules=True):
+    """
+    Zwraca liste {'date', 'slots', 'free_slots', 'booked_slots', 'free_seats', 'reservations',
+    'free_minutes', 'booked_minutes', 'blocked_minutes'} dla dni z jakimikolwiek danymi.
+    lecturer_ids=None oznacza wszystkich prowadzacych.
+    """
+    tz = timezone.get_current_timezone()
+    has_free_seats = Q(active_reservations_count__lt=F('max_attendees'))
+    is_booked = Q(active_reservations_count__gt=0)
+
+    slots = AvailableSlot.objects.filter(start_time__lt=window_end, end_time__gt=window_start)
+    if only_active:
+        slots = slots.filter(is_active=True)
+    if lecturer_ids is not None:
+        slots = slots.filter(lecturer_id__in=lecturer_ids)
+    slot_days = slots.annotate(day=TruncDate('start_time', tzinfo=tz)).order_by().values('day').annotate(
+        slots=Count('id'),
+        free_slots=Count('id', filter=has_free_seats),
+        booked_slots=Count('id', filter=is_booked),
+        free_seats=Coalesce(Sum(F('max_attendees') - F('active_reservations_count'), filter=has_free_seats), ZERO),
+        reservations=Coalesce(Sum('active_reservations_count'), ZERO),
+        free_duration=_sum_duration(has_free_seats),
+        booked_duration=_sum_duration(is_booked),
+        blocked_duration=ZERO_DURATION,
+    )
+
+    rows = slot_days
+    if include_blocked:
+        blocked = BlockedTime.objects.filter(start_time__lt=window_end, end_time__gt=window_start)
+        if lecturer_ids is not None:
+            blocked = blocked.filter(lecturer_id__in=lecturer_ids)
+        #te same kolumny co dla slotow - wymog UNION
+        blocked_days = blocked.annotate(day=TruncDate('start_time', tzinfo=tz)).order_by().values('day').annotate(
+            slots=ZERO, free_slots=ZERO, booked_slots=ZERO, free_seats=ZERO, reservations=ZERO,
+            free_duration=ZERO_DURATION, booked_duration=ZERO_DURATION,
+            blocked_duration=_sum_duration(),
+        )
+        rows = slot_days.union(blocked_days, all=True)
+
+    days = {}
+    for row in rows:
+        day = days.setdefault(row['day'], _empty_day())
+        for field in ('slots', 'free_slots', 'booked_slots', 'free_seats', 'reservations'):
+            day[field] += row[field]
+        day['free_minutes'] += _minutes(row['free_duration'])
+        day['booked_minutes'] += _minutes(row['booked_duration'])
+        day['blocked_minutes'] += _minutes(row['blocked_duration'])
+
+    if include_rules:
+        _add_rule_occurrences(days, lecturer_ids, window_start, window_end)
+
+    return [{'date': day.isoformat(), **values} for day, values in sorted(days.items())]
+
+
+def _add_rule_occurrences(days, lecturer_ids, window_start, window_end):
+    #wirtualne wystapienia regul nie maja wierszy w tabeli slotow - liczymy je w pamieci
+    rules = AvailabilityRule.objects.filter(
+        is_active=True,
+        valid_from__lte=timezone.localtime(window_end).date(),
+        valid_until__gte=timezone.localtime(window_start).date(),
+    ).prefetch_related('exceptions')
+    if lecturer_ids is not None:
+        rules = rules.filter(lecturer_id__in=lecturer_ids)
+    rules = list(rules)
+    if not rules:
+        return
+
+    #zmaterializowane wystapienia sa juz policzone jako zwykle sloty
+    materialized = set(AvailableSlot.objects.filter(
+        rule__in=rules, start_time__lt=window_end, end_time__gt=window_start,
+    ).values_list('rule_id', 'start_time'))
+    for rule in rules:
+        excluded = {exception.date for exception in rule.exceptions.all()}
+        for start, end in iter_rule_occurrences(rule, window_start, window_end, excluded):
+            if (rule.pk, start) in materialized:
+                continue
+            day = days.setdefault(timezone.localtime(start).date(), _empty_day())
+            day['slots'] += 1
+            day['free_slots'] += 1
+            day['free_seats'] += rule.max_attendees
+            day['free_minutes'] += _minutes(end - start)
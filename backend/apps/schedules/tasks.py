@@ -0,0 +1,13 @@
+#logika wykonywana w tle
+from celery import shared_task
+
+from .imports import run_schedule_import
+
+
+@shared_task(name='schedules.import_schedule')
+def import_schedule_task(job_id):
+    job = run_schedule_import(job_id)
+    print(
+        f"Import harmonogramu {job_id}: {job.status}, wierszy {job.rows_processed}, "
+        f"odrzuconych {job.rows_rejected}, {job.rows_per_second} wierszy/s"
+    )
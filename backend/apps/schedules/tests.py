@@ -1,9 +1,25 @@
 from rest_framework.test import APITestCase, APIClient
+import csv
+import gzip
+import io
 from django.urls import reverse
 from apps.users.models import User
-from apps.schedules.models import AvailableSlot
+from apps.schedules.models import AvailableSlot, BlockedTime, AvailabilityRule, ScheduleImportJob
+from apps.schedules.imports import run_schedule_import
+from apps.schedules.pagination import SlotCursorPagination
+from apps.reservations.models import Reservation
+from apps.schedules.recurrence import expand_slots
+from apps.schedules.freebusy import merge_intervals, subtract_intervals, compute_free_busy
 from django.utils import timezone
-from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+import shutil
+from unittest import mock
+import tempfile
+from datetime import timedelta, time
 
 class AvailableSlotPermissionTest(APITestCase):
     def setUp(self):
@@ -24,6 +40,7 @@ class AvailableSlotPermissionTest(APITestCase):
             role='student'
         )
         self.url=reverse('slots-list') #endpoiny dla prowadzącego
+        cache.clear()
 
     def test_student_cannot_access_lecturer_slots(self):
         print("Test dostepu studenta do slotow prowadzacego")
@@ -92,9 +109,10 @@ class AvailableSlotPermissionTest(APITestCase):
         #expected -> 200
         self.assertEqual(response.status_code,200)
 
-        #weryfikacja czy jest widoczny slot
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['max_attendees'], 1)
+        #weryfikacja czy jest widoczny slot (odpowiedz stronicowana)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['max_attendees'], 1)
+        self.assertIsNone(response.data['next'])
 
     #Test crud
     def test_lecturer_can_update_own_slot(self):
@@ -130,3 +148,720 @@ class AvailableSlotPermissionTest(APITestCase):
         self.assertEqual(slot.max_attendees, 2)
 
 
+
+class PublicSlotPaginationTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_stronicowanie',
+            email='ls@agh.pl',
+            password='password123',
+            role='lecturer'
+        )
+        start = timezone.now() + timedelta(days=1)
+        #kilka slotow o tej samej godzinie startu - kursor musi rozstrzygac po id
+        for offset in [0, 0, 0, 1, 2, 2, 3]:
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=start + timedelta(hours=offset),
+                end_time=start + timedelta(hours=offset + 1),
+            )
+        self.url = reverse('public-slots-list')
+        cache.clear()
+
+    def test_cursor_walks_all_slots_once(self):
+        print("Test paginacji kursorowej publicznych slotow")
+        client = APIClient()
+        seen = []
+        url = self.url + '?page_size=2'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        expected = list(AvailableSlot.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_404(self):
+        response = APIClient().get(self.url, {'cursor': 'nie-kursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor_values_return_404(self):
+        print("\nTest: kursor z wartosciami zlego typu daje 404, nie 500")
+        client = APIClient()
+        pagination = SlotCursorPagination()
+        for position in (["abc", 1], [{"a": 1}, 1], ["2026-01-01T00:00:00", "x"], [None, None], ["2026-01-01T00:00:00", [1]]):
+            response = client.get(self.url, {'cursor': pagination.encode_cursor(position)})
+            self.assertEqual(response.status_code, 404, position)
+
+
+class PublicSlotCacheTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_cache',
+            email='lcache@agh.pl',
+            password='password123',
+            role='lecturer'
+        )
+        self.other_lecturer = User.objects.create_user(
+            username='lecturer_cache_2',
+            email='lcache2@agh.pl',
+            password='password123',
+            role='lecturer'
+        )
+        self.start = timezone.now() + timedelta(days=1)
+        AvailableSlot.objects.create(
+            lecturer=self.lecturer,
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=1),
+        )
+        self.url = reverse('public-slots-list')
+        cache.clear()
+
+    def test_etag_returns_304_without_queries(self):
+        print("Test ETag/304 dla publicznej listy slotow")
+        client = APIClient()
+        response = client.get(self.url, {'lecturer_id': self.lecturer.pk})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = client.get(self.url, {'lecturer_id': self.lecturer.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        #cache trafiony bez ETagu tez nie odpytuje bazy
+        with self.assertNumQueries(0):
+            response = client.get(self.url, {'lecturer_id': self.lecturer.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_change_invalidates_only_affected_lecturer(self):
+        print("Test uniewazniania cache po zmianie slotu")
+        client = APIClient()
+        own_etag = client.get(self.url, {'lecturer_id': self.lecturer.pk})['ETag']
+        other_etag = client.get(self.url, {'lecturer_id': self.other_lecturer.pk})['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=self.start + timedelta(hours=2),
+                end_time=self.start + timedelta(hours=3),
+            )
+
+        response = client.get(self.url, {'lecturer_id': self.lecturer.pk}, HTTP_IF_NONE_MATCH=own_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = client.get(self.url, {'lecturer_id': self.other_lecturer.pk}, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class FreeBusyEngineTest(APITestCase):
+    def test_merge_and_subtract(self):
+        print("Test operacji na przedzialach free/busy")
+        self.assertEqual(merge_intervals([(5, 7), (1, 3), (2, 4), (7, 8)]), [(1, 4), (5, 8)])
+        self.assertEqual(
+            subtract_intervals([(0, 10), (12, 20)], [(2, 3), (5, 13), (19, 25)]),
+            [(0, 2), (3, 5), (13, 19)],
+        )
+        self.assertEqual(subtract_intervals([(0, 10)], []), [(0, 10)])
+
+    def test_full_slots_and_blocked_time_are_not_free(self):
+        slots = [(0, 10, 0, 1), (10, 20, 1, 1), (20, 30, 1, 2)]
+        result = compute_free_busy(slots, [(5, 8)], 0, 100)
+        self.assertEqual(result['free'], [(0, 5), (8, 10), (20, 30)])
+        self.assertEqual(result['booked'], [(10, 30)])
+        self.assertEqual(result['blocked'], [(5, 8)])
+
+    def test_free_busy_endpoint(self):
+        print("Test endpointu calendar/free-busy")
+        lecturer = User.objects.create_user(
+            username='lecturer_freebusy', email='lfb@agh.pl', password='password123', role='lecturer'
+        )
+        start = (timezone.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        AvailableSlot.objects.create(lecturer=lecturer, start_time=start, end_time=start + timedelta(hours=2))
+        BlockedTime.objects.create(
+            lecturer=lecturer, start_time=start + timedelta(minutes=30), end_time=start + timedelta(hours=1)
+        )
+
+        client = APIClient()
+        client.force_authenticate(user=lecturer)
+        response = client.get(reverse('calendar-free-busy'), {
+            'start': (start - timedelta(hours=1)).isoformat(),
+            'end': (start + timedelta(hours=3)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['free']), 2)
+        self.assertEqual(len(response.data['blocked']), 1)
+        self.assertEqual(response.data['booked'], [])
+
+        response = client.get(reverse('calendar-free-busy'), {'start': '2025-01-10', 'end': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_blocked_times_listed_in_order(self):
+        print("Test listy zablokowanych okresow")
+        lecturer = User.objects.create_user(
+            username='lecturer_blocked', email='lbt@agh.pl', password='password123', role='lecturer'
+        )
+        start = timezone.now() + timedelta(days=1)
+        later = BlockedTime.objects.create(
+            lecturer=lecturer, start_time=start + timedelta(days=1), end_time=start + timedelta(days=1, hours=1)
+        )
+        earlier = BlockedTime.objects.create(lecturer=lecturer, start_time=start, end_time=start + timedelta(hours=1))
+
+        client = APIClient()
+        client.force_authenticate(user=lecturer)
+        response = client.get(reverse('calendar-blocked-times'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [earlier.pk, later.pk])
+
+
+class AvailabilityRuleTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_reguly', email='lr@agh.pl', password='password123', role='lecturer'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.lecturer)
+        self.today = timezone.localdate()
+        self.rule = AvailabilityRule.objects.create(
+            lecturer=self.lecturer,
+            frequency='weekly',
+            weekday=(self.today.weekday() + 1) % 7,
+            start_time=time(10, 0),
+            end_time=time(11, 30),
+            valid_from=self.today,
+            valid_until=self.today + timedelta(days=120),
+            max_attendees=2,
+        )
+
+    def window(self, days):
+        start = timezone.now()
+        return start, start + timedelta(days=days)
+
+    def test_weekly_and_biweekly_expansion(self):
+        print("Test rozwijania reguly cyklicznej")
+        start, end = self.window(28)
+        occurrences = expand_slots([self.lecturer.pk], start, end)
+        self.assertEqual(len(occurrences), 4)
+        self.assertTrue(all(slot.pk is None for slot in occurrences))
+        self.assertEqual(AvailableSlot.objects.count(), 0)
+
+        self.rule.frequency = 'biweekly'
+        self.rule.save()
+        self.assertEqual(len(expand_slots([self.lecturer.pk], start, end)), 2)
+
+    def test_create_rule_with_exception_via_api(self):
+        print("Test tworzenia reguly z wyjatkiem przez API")
+        first = self.today + timedelta(days=(3 - self.today.weekday()) % 7 or 7)
+        response = self.client.post(reverse('availability-rules-list'), {
+            'frequency': 'weekly',
+            'weekday': first.weekday(),
+            'start_time': '12:00',
+            'end_time': '13:00',
+            'valid_from': self.today.isoformat(),
+            'valid_until': (self.today + timedelta(days=60)).isoformat(),
+            'excluded_dates': [first.isoformat()],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['excluded_dates'], [first.isoformat()])
+
+        rule = AvailabilityRule.objects.get(pk=response.data['id'])
+        starts = [
+            timezone.localtime(slot.start_time).date()
+            for slot in expand_slots([self.lecturer.pk], *self.window(21)) if slot.rule_id == rule.pk
+        ]
+        self.assertNotIn(first, starts)
+        self.assertEqual(len(starts), 2)
+
+    def test_materialized_occurrence_replaces_virtual_one(self):
+        print("Test materializacji wystapienia reguly")
+        start, end = self.window(14)
+        occurrence = expand_slots([self.lecturer.pk], start, end)[0]
+        url = reverse('availability-rules-occurrence', kwargs={'pk': self.rule.pk})
+
+        response = self.client.post(url, {
+            'start_time': occurrence.start_time.isoformat(),
+            'meeting_location': 'D17 sala 1.38',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['meeting_location'], 'D17 sala 1.38')
+
+        #drugie wywolanie zwraca ten sam slot
+        response = self.client.post(url, {'start_time': occurrence.start_time.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AvailableSlot.objects.filter(rule=self.rule).count(), 1)
+
+        slots = expand_slots([self.lecturer.pk], start, end)
+        self.assertEqual(len(slots), 2)
+        self.assertIsNotNone(slots[0].pk)
+
+        response = self.client.post(url, {
+            'start_time': (occurrence.start_time + timedelta(hours=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(MAX_OPEN_RESERVATIONS_PER_STUDENT=1)
+    def test_rejected_occurrence_booking_leaves_no_slot(self):
+        print("\nTest: odrzucona rezerwacja wystapienia reguly nie zostawia slotu")
+        student = User.objects.create(username='student_reguly', email='sr@agh.pl', role='student')
+        client = APIClient()
+        client.force_authenticate(user=student)
+        first, second = expand_slots([self.lecturer.pk], *self.window(14))
+        url = reverse('student-reservations-list')
+
+        response = client.post(url, {'rule_id': self.rule.pk, 'occurrence_start': first.start_time.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AvailableSlot.objects.filter(rule=self.rule).count(), 1)
+
+        #limit otwartych rezerwacji - odmowa wycofuje tez materializacje wystapienia
+        response = client.post(url, {'rule_id': self.rule.pk, 'occurrence_start': second.start_time.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AvailableSlot.objects.filter(rule=self.rule).count(), 1)
+
+    def test_free_busy_includes_rule_occurrences(self):
+        print("Test free/busy z wystapieniami reguly")
+        first = expand_slots([self.lecturer.pk], *self.window(7))[0]
+        response = self.client.get(reverse('calendar-free-busy'), {
+            'start': (first.start_time - timedelta(hours=1)).isoformat(),
+            'end': (first.start_time + timedelta(hours=3)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['free'], [[
+            timezone.localtime(first.start_time).isoformat(), timezone.localtime(first.end_time).isoformat(),
+        ]])
+
+    def test_public_occurrences_endpoint(self):
+        response = APIClient().get(reverse('public-slots-occurrences'), {'lecturer_id': self.lecturer.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['rule'], self.rule.pk)
+        self.assertIsNone(response.data[0]['id'])
+
+
+class BulkSlotCreationTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_bulk', email='lb@agh.pl', password='password123', role='lecturer'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.lecturer)
+        self.url = reverse('calendar-time-windows-bulk')
+        self.base = (timezone.now() + timedelta(days=2)).replace(hour=8, minute=0, second=0, microsecond=0)
+
+    def item(self, hour, length=1):
+        return {
+            'start_time': (self.base + timedelta(hours=hour)).isoformat(),
+            'end_time': (self.base + timedelta(hours=hour + length)).isoformat(),
+            'max_attendees': 1,
+        }
+
+    def test_bulk_create_hundreds_of_slots(self):
+        print("Test masowego tworzenia slotow")
+        slots = [self.item(hour) for hour in range(300)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'slots': slots}, format='json')
+        #stala liczba zapytan (blokada, sloty, blokady, partie INSERT) - nie zalezy od liczby kolizji do sprawdzenia
+        #statystyki: SELECT i INSERT wierszy tygodni + UPDATE na tydzien (tu 3 tygodnie)
+        self.assertLess(len(queries), 16)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 300)
+        self.assertEqual(AvailableSlot.objects.filter(lecturer=self.lecturer).count(), 300)
+
+    def test_overlaps_are_reported_per_item(self):
+        print("Test raportu kolizji przy masowym tworzeniu slotow")
+        AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=self.base, end_time=self.base + timedelta(hours=1)
+        )
+        BlockedTime.objects.create(
+            lecturer=self.lecturer,
+            start_time=self.base + timedelta(hours=5),
+            end_time=self.base + timedelta(hours=6),
+        )
+        slots = [
+            self.item(0),               # koliduje z istniejacym slotem
+            self.item(2, length=2),     # poprawny
+            self.item(3),               # nachodzi na pozycje 1
+            self.item(5),               # zablokowany okres
+            {'start_time': 'zle'},      # bledne pola
+            self.item(8),               # poprawny
+        ]
+        response = self.client.post(self.url, {'slots': slots}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 2, 3, 4])
+        self.assertEqual(AvailableSlot.objects.count(), 1)
+
+        response = self.client.post(self.url, {'slots': slots, 'allow_partial': True}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(AvailableSlot.objects.count(), 3)
+
+
+class ScheduleExportTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_export', email='le@agh.pl', password='password123', role='lecturer',
+            first_name='Jan', last_name='Kowalski',
+        )
+        self.student = User.objects.create_user(
+            username='student_export', email='se@agh.pl', password='password123', role='student',
+            first_name='Anna', last_name='Nowak',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.lecturer)
+        self.start = (timezone.now() + timedelta(days=3)).replace(hour=9, minute=0, second=0, microsecond=0)
+        for day in range(5):
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=self.start + timedelta(days=day),
+                end_time=self.start + timedelta(days=day, hours=1),
+                meeting_location='B5 410',
+                subject='Analiza',
+            )
+        BlockedTime.objects.create(
+            lecturer=self.lecturer, start_time=self.start - timedelta(days=1),
+            end_time=self.start - timedelta(days=1, hours=-2), reason='Konferencja',
+        )
+        Reservation.objects.create(
+            slot=AvailableSlot.objects.first(), student=self.student, topic='Całki', status='Confirmed'
+        )
+        self.url = reverse('schedule-export-csv')
+
+    def read_rows(self, response, compressed=False):
+        content = b''.join(response.streaming_content)
+        if compressed:
+            content = gzip.decompress(content)
+        return list(csv.reader(io.StringIO(content.decode('utf-8')), delimiter=';'))
+
+    def test_streaming_export_contains_all_sections(self):
+        print("Test strumieniowego eksportu CSV")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = self.read_rows(response)
+        types = [row[0] for row in rows if row]
+        self.assertEqual(types.count('DOSTEPNOSC'), 5)
+        self.assertEqual(types.count('BLOKADA'), 1)
+        self.assertEqual(types.count('REZERWACJA'), 1)
+        reservation_row = next(row for row in rows if row and row[0] == 'REZERWACJA')
+        self.assertEqual(reservation_row[4], 'Anna Nowak')
+        self.assertEqual(reservation_row[6], 'Całki')
+
+    def test_gzip_and_date_range(self):
+        print("Test eksportu CSV z kompresja i zakresem dat")
+        response = self.client.get(self.url, {
+            'gzip': '1',
+            'start': (self.start + timedelta(days=1)).isoformat(),
+            'end': (self.start + timedelta(days=3)).isoformat(),
+            'reservations': '0',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        types = [row[0] for row in self.read_rows(response, compressed=True) if row]
+        self.assertEqual(types.count('DOSTEPNOSC'), 2)
+        self.assertEqual(types.count('BLOKADA'), 0)
+        self.assertNotIn('REZERWACJA', types)
+
+
+class ScheduleImportTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.lecturer = User.objects.create_user(
+            username='lecturer_import', email='li@agh.pl', password='password123', role='lecturer'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.lecturer)
+
+    def make_file(self, rows):
+        content = '\n'.join(';'.join(row) for row in rows)
+        return SimpleUploadedFile('harmonogram.csv', content.encode('utf-8'), content_type='text/csv')
+
+    def test_upload_returns_202_and_queues_job(self):
+        print("Test przyjecia importu CSV do kolejki")
+        upload = self.make_file([['TYP', 'DATA'], ['DOSTEPNOSC', '2030-01-07', '10:00', '11:00', '2']])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('schedule-import-csv'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        job = ScheduleImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, 'pending')
+        # zadanie Celery zlecane jest dopiero po commicie
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(AvailableSlot.objects.count(), 0)
+
+    def test_batched_import_reports_progress_and_errors(self):
+        print("Test wsadowego importu CSV z raportem bledow")
+        rows = [['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'POJEMNOSC']]
+        for day in range(1, 26):
+            rows.append(['DOSTEPNOSC', f'2030-03-{day:02d}', '10:00', '11:00', '1', 'B5', 'Analiza'])
+        rows.append(['DOSTEPNOSC', '2030-03-40', '10:00', '11:00', '1'])  # zla data
+        rows.append(['DOSTEPNOSC', '2030-03-01', '12:00', '11:00', '1'])  # koniec przed poczatkiem
+        rows.append([])
+        rows.append(['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'POWOD'])
+        rows.append(['BLOKADA', '2030-03-02', '08:00', '09:00', 'Rada wydziału'])
+        job = ScheduleImportJob.objects.create(lecturer=self.lecturer, file=self.make_file(rows))
+
+        job = run_schedule_import(job.pk, chunk_size=10)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.rows_processed, 28)
+        self.assertEqual(job.rows_imported, 26)
+        self.assertEqual(job.rows_rejected, 2)
+        self.assertEqual([error['row'] for error in job.errors], [27, 28])
+        self.assertEqual(AvailableSlot.objects.filter(lecturer=self.lecturer).count(), 25)
+        self.assertEqual(BlockedTime.objects.filter(lecturer=self.lecturer).count(), 1)
+
+        response = self.client.get(reverse('schedule-import-status', kwargs={'pk': job.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rows_rejected'], 2)
+
+    def test_failed_import_resumes_and_running_job_is_not_claimed_twice(self):
+        print("\nTest: wznowienie przerwanego importu bez duplikatow i jednokrotne przejecie zadania")
+        from apps.schedules import imports
+
+        rows = [['DOSTEPNOSC', f'2030-04-{day:02d}', '10:00', '11:00', '1'] for day in range(1, 26)]
+        rows.insert(12, ['DOSTEPNOSC', '2030-04-40', '10:00', '11:00', '1'])
+        job = ScheduleImportJob.objects.create(lecturer=self.lecturer, file=self.make_file(rows))
+
+        save_chunk = imports._save_chunk
+        calls = []
+
+        def failing_save_chunk(*args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("utracone polaczenie z baza")
+            save_chunk(*args)
+
+        with mock.patch.object(imports, '_save_chunk', side_effect=failing_save_chunk):
+            job = run_schedule_import(job.pk, chunk_size=10)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual((job.rows_processed, job.rows_imported), (10, 10))
+
+        job = run_schedule_import(job.pk, chunk_size=10)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.rows_processed, job.rows_imported, job.rows_rejected), (26, 25, 1))
+        self.assertEqual([error['row'] for error in job.errors], [13])
+        self.assertEqual(AvailableSlot.objects.filter(lecturer=self.lecturer).count(), 25)
+
+        #ukonczone lub trwajace zadanie nie jest przetwarzane ponownie (np. redelivery Celery)
+        ScheduleImportJob.objects.filter(pk=job.pk).update(status='running')
+        self.assertEqual(run_schedule_import(job.pk, chunk_size=10).rows_imported, 25)
+        self.assertEqual(AvailableSlot.objects.filter(lecturer=self.lecturer).count(), 25)
+
+
+class CalendarFeedTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create_user(
+            username='lecturer_ics', email='lics@agh.pl', password='password123', role='lecturer',
+            first_name='Jan', last_name='Kowalski',
+        )
+        self.student = User.objects.create_user(
+            username='student_ics', email='sics@agh.pl', password='password123', role='student'
+        )
+        self.start = (timezone.now() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+        self.slot = AvailableSlot.objects.create(
+            lecturer=self.lecturer, start_time=self.start, end_time=self.start + timedelta(hours=1),
+            meeting_location='B5, pokój 410', subject='Analiza matematyczna',
+        )
+        # kanal nie byl jeszcze budowany, wiec nie trzeba wykonywac callbackow on_commit
+        Reservation.objects.create(slot=self.slot, student=self.student, topic='Całki', status='Confirmed')
+        self.client = APIClient()
+
+    def feed_url(self, user):
+        self.client.force_authenticate(user=user)
+        url = self.client.get(reverse('schedule-calendar-feed-token')).data['url']
+        self.client.force_authenticate(user=None)
+        return url
+
+    def test_lecturer_feed_and_conditional_requests(self):
+        print("Test kanalu ICS prowadzacego z ETag/304")
+        url = self.feed_url(self.lecturer)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode('utf-8')
+        self.assertIn('BEGIN:VCALENDAR', body)
+        self.assertIn(f'UID:slot-{self.slot.pk}@konsultacje', body)
+        self.assertIn('LOCATION:B5\\, pokój 410', body)
+
+        # kolejne odpytanie klienta kalendarza - bez zapytan do bazy
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # zmiana harmonogramu uniewaznia kanal
+        with self.captureOnCommitCallbacks(execute=True):
+            BlockedTime.objects.create(
+                lecturer=self.lecturer, start_time=self.start + timedelta(days=1),
+                end_time=self.start + timedelta(days=1, hours=2), reason='Konferencja',
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Konferencja', response.content.decode('utf-8'))
+
+    def test_student_feed_follows_slot_changes_and_token_rotation(self):
+        print("Test kanalu ICS studenta")
+        url = self.feed_url(self.student)
+        body = self.client.get(url).content.decode('utf-8')
+        self.assertIn('SUMMARY:Konsultacje: Jan Kowalski', body)
+
+        # zmiana miejsca slotu trafia do kanalu studenta
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.meeting_location = 'D17, sala 1.38'
+            self.slot.save()
+        self.assertIn('D17\\, sala 1.38', self.client.get(url).content.decode('utf-8'))
+
+        # nowy token - stary adres przestaje dzialac
+        self.client.force_authenticate(user=self.student)
+        new_url = self.client.post(reverse('schedule-calendar-feed-token')).data['url']
+        self.client.force_authenticate(user=None)
+        self.assertNotEqual(new_url, url)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+
+class CalendarSummaryTest(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='lecturer_summary', email='lsum@agh.pl', password='password123', role='lecturer'
+        )
+        self.student = User.objects.create_user(
+            username='student_summary', email='ssum@agh.pl', password='password123', role='student'
+        )
+        self.client = APIClient()
+        self.day = (timezone.localtime() + timedelta(days=5)).replace(hour=9, minute=0, second=0, microsecond=0)
+        #dzien 1: 40 slotow po 15 minut, jeden pelny
+        for i in range(40):
+            AvailableSlot.objects.create(
+                lecturer=self.lecturer,
+                start_time=self.day + timedelta(minutes=15 * i),
+                end_time=self.day + timedelta(minutes=15 * (i + 1)),
+            )
+        Reservation.objects.create(slot=AvailableSlot.objects.first(), student=self.student, status='Confirmed')
+        #dzien 2: blokada
+        BlockedTime.objects.create(
+            lecturer=self.lecturer, start_time=self.day + timedelta(days=1),
+            end_time=self.day + timedelta(days=1, hours=2), reason='Rada wydziału',
+        )
+        self.params = {
+            'start': (self.day - timedelta(days=1)).date().isoformat(),
+            'end': (self.day + timedelta(days=7)).date().isoformat(),
+        }
+
+    def test_lecturer_summary_single_query(self):
+        print("Test dziennego podsumowania kalendarza prowadzacego")
+        self.client.force_authenticate(user=self.lecturer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('calendar-summary'), self.params)
+        self.assertEqual(response.status_code, 200)
+        days = {day['date']: day for day in response.data['days']}
+        first = days[self.day.date().isoformat()]
+        self.assertEqual(first['slots'], 40)
+        self.assertEqual(first['free_slots'], 39)
+        self.assertEqual(first['booked_slots'], 1)
+        self.assertEqual(first['free_minutes'], 39 * 15)
+        self.assertEqual(first['booked_minutes'], 15)
+        second = days[(self.day + timedelta(days=1)).date().isoformat()]
+        self.assertEqual(second['blocked_minutes'], 120)
+        self.assertEqual(second['slots'], 0)
+        # sloty i blokady w jednym zapytaniu UNION (+ reguly, uzytkownik z autoryzacji)
+        aggregate_queries = [q for q in queries.captured_queries if 'UNION' in q['sql']]
+        self.assertEqual(len(aggregate_queries), 1)
+
+    def test_public_summary_with_rules(self):
+        print("Test publicznego podsumowania kalendarza z regulami")
+        AvailabilityRule.objects.create(
+            lecturer=self.lecturer, weekday=(self.day + timedelta(days=2)).weekday(),
+            start_time=time(12, 0), end_time=time(13, 0), max_attendees=3,
+            valid_from=self.day.date(), valid_until=(self.day + timedelta(days=30)).date(),
+        )
+        response = self.client.get(
+            reverse('public-slots-summary'), {**self.params, 'lecturer_id': self.lecturer.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        days = {day['date']: day for day in response.data['days']}
+        rule_day = days[(self.day + timedelta(days=2)).date().isoformat()]
+        self.assertEqual(rule_day['free_seats'], 3)
+        # publiczny wariant nie ujawnia blokad prowadzacego
+        self.assertNotIn((self.day + timedelta(days=1)).date().isoformat(), days)
+
+
+
+class RecommendedSlotsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create(username="prowadzacy_polecane", role='lecturer')
+        other = User.objects.create(username="prowadzacy_polecane_2", role='lecturer')
+        self.student = User.objects.create(username="student_polecane", role='student')
+        #jutro 8:00 czasu lokalnego
+        self.day = timezone.localtime().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        def slot(lecturer, hour, subject, **extra):
+            start = self.day + timedelta(hours=hour)
+            return AvailableSlot.objects.create(
+                lecturer=lecturer, start_time=start, end_time=start + timedelta(hours=1), subject=subject, **extra
+            )
+
+        self.early = slot(self.lecturer, 0, "Algebra")
+        self.clashing = slot(self.lecturer, 2, "Algebra")
+        self.full = slot(self.lecturer, 3, "Algebra", max_attendees=1, active_reservations_count=1)
+        self.afternoon = slot(self.lecturer, 8, "Analiza")
+        self.later = slot(self.lecturer, 24, "Algebra")
+        #rezerwacja studenta u innego prowadzacego w tym samym czasie co self.clashing
+        busy = slot(other, 2, "Fizyka")
+        Reservation.objects.create(slot=busy, student=self.student, status='Confirmed')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('public-slots-recommended')
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [slot['id'] for slot in response.data]
+
+    def test_earliest_matching_slots_skip_full_and_clashing(self):
+        print("\nTest: najblizsze wolne terminy z indeksu prowadzacego")
+        params = {'lecturer_id': self.lecturer.pk, 'subject': 'algebra', 'limit': 2}
+        self.assertEqual(self.ids(self.client.get(self.url, params)), [self.early.pk, self.later.pk])
+
+        #indeks w pamieci - zostaje tylko zapytanie o rezerwacje studenta
+        with self.assertNumQueries(1):
+            self.client.get(self.url, params)
+
+        #filtr godzin i wszyscy prowadzacy (indeks globalny)
+        response = self.client.get(self.url, {'after': '12:00', 'before': '18:00'})
+        self.assertEqual(self.ids(response), [self.afternoon.pk])
+        self.assertEqual(self.client.get(self.url, {'after': '25:00'}).status_code, 400)
+
+        #nowy slot podbija generacje - indeks jest przebudowany
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = AvailableSlot.objects.create(
+                lecturer=self.lecturer, subject="Algebra",
+                start_time=self.day + timedelta(hours=1), end_time=self.day + timedelta(hours=1, minutes=30),
+            )
+        self.assertEqual(self.ids(self.client.get(self.url, params)), [self.early.pk, newer.pk])
+
+    def test_global_query_merges_lecturer_indexes(self):
+        print("\nTest: zapytanie bez prowadzacego przebudowuje tylko zmieniony indeks")
+        from apps.schedules import recommendations
+
+        self.assertEqual(self.ids(self.client.get(self.url, {'limit': 3})), [self.early.pk, self.afternoon.pk, self.later.pk])
+        other = User.objects.get(username="prowadzacy_polecane_2")
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(slot=self.early, student=other, status='Confirmed')
+
+        with mock.patch.object(recommendations, 'build_index', wraps=recommendations.build_index) as build:
+            response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(self.ids(response), [self.afternoon.pk, self.later.pk])
+        self.assertEqual([call.args[0] for call in build.call_args_list], [[self.lecturer.pk]])
+
+        for days in ('0', '8', '1,9', ','):
+            self.assertEqual(self.client.get(self.url, {'days': days}).status_code, 400)
@@ -1,13 +1,14 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import LecturerSlotViewSet, PublicAvailableSlotViewSet, LecturerCalendarViewSet, ScheduleExportView, \
-    ScheduleImportView
+    ScheduleImportView, ScheduleImportStatusView, AvailabilityRuleViewSet, CalendarFeedTokenView, calendar_feed
 
 router=DefaultRouter()
 
 router.register(r'lecturer-slots', LecturerSlotViewSet, basename='slots')
 router.register(r'public-available-slots', PublicAvailableSlotViewSet, basename='public-slots')
 router.register(r'calendar',LecturerCalendarViewSet , basename='calendar')
+router.register(r'availability-rules', AvailabilityRuleViewSet, basename='availability-rules')
 
 
 
@@ -23,5 +24,26 @@ urlpatterns=router.urls + [
         'import/',
         ScheduleImportView.as_view(),
         name='schedule-import-csv'
+    ),
+
+    #postep importu  get api/schedules/import/<id>/
+    path(
+        'import/<int:pk>/',
+        ScheduleImportStatusView.as_view(),
+        name='schedule-import-status'
+    ),
+
+    #adres subskrypcji kalendarza  get/post api/schedules/calendar-feed/
+    path(
+        'calendar-feed/',
+        CalendarFeedTokenView.as_view(),
+        name='schedule-calendar-feed-token'
+    ),
+
+    #kanal iCalendar  get api/schedules/feed/<token>.ics
+    path(
+        'feed/<str:token>.ics',
+        calendar_feed,
+        name='schedule-calendar-feed'
     )
 ]
@@ -2,19 +2,86 @@ from rest_framework import viewsets, permissions
 from django.utils import timezone
 from ..reservations.models import Reservation
 from ..reservations.serializers import ReservationSerializer
+from ..reservations.pagination import ReservationCursorPagination
+from ..reservations.stats import record_slots
 from rest_framework.response import Response
-from .models import AvailableSlot, BlockedTime
-from .serializers import AvailableSlotSerializer, BlockedTimeSerializer, AvailableSlotCreateSerializer, BlockedTimeCreateSerializer
-from django.http import HttpResponse
-import csv
-import io
+from .models import AvailableSlot, BlockedTime, AvailabilityRule, ScheduleImportJob
+from .serializers import AvailableSlotSerializer, BlockedTimeSerializer, AvailableSlotCreateSerializer, BlockedTimeCreateSerializer, \
+    AvailabilityRuleSerializer, ScheduleImportJobSerializer
+from .recurrence import expand_slots, materialize_occurrence, OccurrenceError
+from .pagination import SlotCursorPagination
+from .cache import VersionedListCacheMixin, bump_lecturer_generation
+from .freebusy import compute_free_busy, IntervalIndex, find_mutual_overlaps
+from .summary import summarize_days
+from .recommendations import recommend_slots
+from .exports import iter_schedule_rows, stream_csv, stream_gzip
+from .tasks import import_schedule_task
+from .ics import get_cached_feed, resolve_feed_token, get_or_create_feed_token, regenerate_feed_token
+from django.http import StreamingHttpResponse, HttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from rest_framework.exceptions import ValidationError
 from django.db import transaction
 from rest_framework import status
 from rest_framework import generics
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.urls import reverse
 
+from apps.users.models import User
+from apps.users.throttling import PublicSlotsThrottle
 from apps.users.permissions import IsLecturer, IsStudent
+from apps.reservations.idempotency import idempotent
+
+#maksymalna liczba slotow w jednym zadaniu time-windows/bulk
+BULK_SLOTS_LIMIT = 500
+#najwiecej terminow zwracanych przez public-available-slots/recommended
+MAX_RECOMMENDED_SLOTS = 50
+
+
+def _parse_range_value(value, name):
+    #akceptujemy date (2025-01-31) albo date z godzina w formacie ISO
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Nieprawidłowa data (oczekiwano formatu ISO)."})
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_time_range(request, default_days=30, max_days=366):
+    """Zwraca okno (start, end) z parametrow ?start=&end= z ograniczeniem dlugosci."""
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    start = _parse_range_value(start, 'start') if start else timezone.now()
+    end = _parse_range_value(end, 'end') if end else start + timedelta(days=default_days)
+    if end <= start:
+        raise ValidationError({'end': "Koniec zakresu musi być po jego początku."})
+    if end - start > timedelta(days=max_days):
+        raise ValidationError({'end': f"Zakres nie może przekraczać {max_days} dni."})
+    return start, end
+
+
+def _parse_minute_of_day(value, name):
+    #'HH:MM' -> minuty od polnocy
+    if not value:
+        return None
+    try:
+        clock = time.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: "Oczekiwano godziny w formacie HH:MM."})
+    return clock.hour * 60 + clock.minute
+
+
+def _format_intervals(intervals):
+    return [[timezone.localtime(start).isoformat(), timezone.localtime(end).isoformat()] for start, end in intervals]
 
 class LecturerSlotViewSet(viewsets.ModelViewSet):
 
@@ -37,10 +104,19 @@ class LecturerSlotViewSet(viewsets.ModelViewSet):
         slot.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class PublicAvailableSlotViewSet(viewsets.ReadOnlyModelViewSet):
+class PublicAvailableSlotViewSet(VersionedListCacheMixin, viewsets.ReadOnlyModelViewSet):
     #dostep do publicznych slotow dla studentow i nie zalogowanych uzytkownikow
     serializer_class = AvailableSlotSerializer
     permission_classes = [permissions.AllowAny]
+    #limit zadan per rola / adres IP (kubelek tokenow w cache, bez zapisow do bazy)
+    throttle_classes = [PublicSlotsThrottle]
+    #stronicowanie kursorem (start_time, id) -> ?cursor=<next_cursor>&page_size=N
+    pagination_class = SlotCursorPagination
+
+    #cache listy (ETag/304), generacja per prowadzacy z lecturer_id
+    cache_prefix = 'public-slots'
+    cache_query_params = ('lecturer_id', 'cursor', 'page_size')
+    cache_scope_param = 'lecturer_id'
 
     def get_queryset(self):
         #Student widzi aktywne sloty w przyszlosci
@@ -49,7 +125,7 @@ class PublicAvailableSlotViewSet(viewsets.ReadOnlyModelViewSet):
             is_active=True,
             #w przyszlosci
             start_time__gte=timezone.now(),
-        ).select_related('lecturer').order_by('start_time')
+        ).select_related('lecturer').order_by('start_time', 'id')
 
         #Filtrowanie dla studentow zeby znalezc konkretnego prowadzacego
         lecturer_id = self.request.query_params.get('lecturer_id')
@@ -58,6 +134,72 @@ class PublicAvailableSlotViewSet(viewsets.ReadOnlyModelViewSet):
             queryset =queryset.filter(lecturer__id=lecturer_id)
         return queryset
 
+    #sloty w oknie czasowym razem z wystapieniami regul cyklicznych (rozwijanymi w locie)
+    #GET /api/schedules/public-available-slots/occurrences/?start=...&end=...&lecturer_id=...
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        start, end = get_time_range(request, default_days=14, max_days=62)
+        start = max(start, timezone.now())
+        lecturer_id = request.query_params.get('lecturer_id')
+        if lecturer_id and not lecturer_id.isdigit():
+            raise ValidationError({'lecturer_id': "Nieprawidłowy identyfikator prowadzącego."})
+        slots = expand_slots([int(lecturer_id)] if lecturer_id else None, start, end)
+        #okno moze zaczynac sie w trakcie slotu - pokazujemy tylko przyszle terminy
+        slots = [slot for slot in slots if slot.start_time >= start]
+        return Response(AvailableSlotSerializer(slots, many=True).data)
+
+    #K najblizszych wolnych terminow z indeksu per prowadzacy (bez skanowania listy)
+    #GET /api/schedules/public-available-slots/recommended/?lecturer_id=&subject=&after=09:00&before=16:00&days=1,3&limit=5
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def recommended(self, request):
+        params = request.query_params
+        lecturer_id = params.get('lecturer_id')
+        if lecturer_id and not lecturer_id.isdigit():
+            raise ValidationError({'lecturer_id': "Nieprawidłowy identyfikator prowadzącego."})
+        try:
+            limit = min(max(int(params.get('limit', 5)), 1), MAX_RECOMMENDED_SLOTS)
+        except ValueError:
+            raise ValidationError({'limit': "Nieprawidłowa liczba terminów."})
+        weekdays = params.get('days')
+        if weekdays:
+            try:
+                weekdays = {int(day) for day in weekdays.split(',')}
+            except ValueError:
+                weekdays = None
+            if not weekdays or not weekdays <= set(range(1, 8)):
+                raise ValidationError({'days': "Oczekiwano numerów dni 1-7 oddzielonych przecinkami."})
+
+        slots = recommend_slots(
+            lecturer_id=int(lecturer_id) if lecturer_id else None,
+            subject=params.get('subject'),
+            after=_parse_minute_of_day(params.get('after'), 'after'),
+            before=_parse_minute_of_day(params.get('before'), 'before'),
+            weekdays=weekdays,
+            #student nie dostaje terminow kolidujacych z jego rezerwacjami
+            student_id=request.user.pk if request.user.role == 'student' else None,
+            limit=limit,
+        )
+        return Response(slots)
+
+    #dzienne podsumowanie wolnych terminow do widoku miesiaca
+    #GET /api/schedules/public-available-slots/summary/?start=...&end=...&lecturer_id=...
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        start, end = get_time_range(request, default_days=31, max_days=93)
+        start = max(start, timezone.now())
+        lecturer_id = request.query_params.get('lecturer_id')
+        if lecturer_id and not lecturer_id.isdigit():
+            raise ValidationError({'lecturer_id': "Nieprawidłowy identyfikator prowadzącego."})
+        if end <= start:
+            return Response({'start': start.isoformat(), 'end': end.isoformat(), 'days': []})
+        #blokady sa prywatne - publicznie pokazujemy tylko sloty
+        days = summarize_days([int(lecturer_id)] if lecturer_id else None, start, end, include_blocked=False)
+        return Response({
+            'start': timezone.localtime(start).isoformat(),
+            'end': timezone.localtime(end).isoformat(),
+            'days': days,
+        })
+
 
 class LecturerCalendarViewSet(viewsets.ViewSet):
     """
@@ -67,12 +209,18 @@ class LecturerCalendarViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated, IsLecturer]
 
     @action(detail=False, methods=['get', 'post'], url_path='time-windows')
+    @idempotent
     def time_windows(self, request):
         user = request.user
 
         # --- GET (fetchTimeWindows) ---
         if request.method == 'GET':
-            time_windows = AvailableSlot.objects.filter(lecturer=user, is_active=True).order_by('start_time')
+            if 'start' in request.query_params or 'end' in request.query_params:
+                #okno czasowe -> sloty razem z rozwinietymi regulami cyklicznymi
+                start, end = get_time_range(request, max_days=62)
+                time_windows = expand_slots([user.pk], start, end)
+            else:
+                time_windows = AvailableSlot.objects.filter(lecturer=user, is_active=True).order_by('start_time')
             serializer = AvailableSlotSerializer(time_windows, many=True)
             return Response(serializer.data)
 
@@ -88,6 +236,93 @@ class LecturerCalendarViewSet(viewsets.ViewSet):
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    # ************************************************************
+    # MASOWE TWORZENIE OKIEN DOSTEPNOSCI
+    # Endpoint: /api/schedules/calendar/time-windows/bulk/
+    # Body: {"slots": [{...}, ...], "allow_partial": false}
+    # ************************************************************
+
+    @action(detail=False, methods=['post'], url_path='time-windows/bulk')
+    @idempotent
+    def time_windows_bulk(self, request):
+        user = request.user
+        items = request.data.get('slots') if isinstance(request.data, dict) else request.data
+        allow_partial = isinstance(request.data, dict) and bool(request.data.get('allow_partial'))
+
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Oczekiwano niepustej listy 'slots'."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_SLOTS_LIMIT:
+            return Response(
+                {"detail": f"Jednorazowo można dodać najwyżej {BULK_SLOTS_LIMIT} slotów."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        #1. walidacja pol kazdej pozycji osobno
+        errors = {}
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = AvailableSlotCreateSerializer(data=item)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            data = dict(serializer.validated_data)
+            #porownania w UTC - daty w tej samej strefie porownywane sa po czasie sciennym (zmiana czasu!)
+            data['start_time'] = data['start_time'].astimezone(dt_timezone.utc)
+            data['end_time'] = data['end_time'].astimezone(dt_timezone.utc)
+            if data['end_time'] <= data['start_time']:
+                errors[index] = {'end_time': ["Koniec slotu musi być po jego początku."]}
+            else:
+                valid[index] = data
+
+        with transaction.atomic():
+            #blokada wiersza prowadzacego - rownolegle zadania bulk nie ominą wzajemnie kontroli kolizji
+            User.objects.select_for_update().filter(pk=user.pk).first()
+
+            if valid:
+                #2. kolizje miedzy pozycjami zadania (jeden przebieg po posortowanych przedzialach)
+                indices = list(valid)
+                intervals = [(valid[i]['start_time'], valid[i]['end_time']) for i in indices]
+                for position, other in find_mutual_overlaps(intervals).items():
+                    errors[indices[position]] = {
+                        'non_field_errors': [f"Slot nachodzi na pozycję {indices[other]} z tego żądania."]
+                    }
+
+                #3. kolizje z istniejacymi slotami i blokadami - dwa zapytania + wyszukiwanie binarne
+                window_start = min(start for start, _ in intervals)
+                window_end = max(end for _, end in intervals)
+                existing_slots = IntervalIndex(AvailableSlot.objects.filter(
+                    lecturer=user, is_active=True, start_time__lt=window_end, end_time__gt=window_start,
+                ).values_list('start_time', 'end_time'))
+                blocked = IntervalIndex(BlockedTime.objects.filter(
+                    lecturer=user, start_time__lt=window_end, end_time__gt=window_start,
+                ).values_list('start_time', 'end_time'))
+                for index in indices:
+                    if index in errors:
+                        continue
+                    start, end = valid[index]['start_time'], valid[index]['end_time']
+                    if existing_slots.overlaps(start, end):
+                        errors[index] = {'non_field_errors': ["Slot nachodzi na istniejący slot."]}
+                    elif blocked.overlaps(start, end):
+                        errors[index] = {'non_field_errors': ["Slot nachodzi na zablokowany okres."]}
+
+            report = [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+            if errors and not allow_partial:
+                return Response({'created': 0, 'errors': report}, status=status.HTTP_400_BAD_REQUEST)
+
+            created = AvailableSlot.objects.bulk_create([
+                AvailableSlot(lecturer=user, **valid[index]) for index in sorted(valid) if index not in errors
+            ])
+            #bulk_create nie wysyla sygnalow post_save - cache i statystyki aktualizujemy recznie
+            if created:
+                record_slots(created)
+                transaction.on_commit(lambda: bump_lecturer_generation(user.pk))
+
+        return Response({
+            'created': len(created),
+            'slots': AvailableSlotSerializer(created, many=True).data,
+            'errors': report,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
     # ************************************************************
     # AKCJE DLA ZABLOKOWANYCH OKRESÓW (BLOCKED TIMES)
     # Endpoint: /api/schedules/calendar/blocked-times/
@@ -99,7 +334,7 @@ class LecturerCalendarViewSet(viewsets.ViewSet):
 
         # --- GET (fetchBlockedTimes) ---
         if request.method == 'GET':
-            blocked_times = BlockedTime.objects.filter(lecturer=user).order_by('date', 'start_time')
+            blocked_times = BlockedTime.objects.filter(lecturer=user).order_by('start_time')
             serializer = BlockedTimeSerializer(blocked_times, many=True)
             return Response(serializer.data)
 
@@ -113,64 +348,124 @@ class LecturerCalendarViewSet(viewsets.ViewSet):
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    # ************************************************************
+    # FREE/BUSY - realnie dostepny czas prowadzacego
+    # Endpoint: /api/schedules/calendar/free-busy/?start=...&end=...
+    # ************************************************************
+
+    @action(detail=False, methods=['get'], url_path='free-busy')
+    def free_busy(self, request):
+        user = request.user
+        start, end = get_time_range(request)
+
+        #sloty z bazy i niezmaterializowane wystapienia regul (wolne - bez rezerwacji)
+        slots = [
+            (slot.start_time, slot.end_time, slot.active_reservations_count, slot.max_attendees)
+            for slot in expand_slots([user.pk], start, end)
+        ]
+        blocked = BlockedTime.objects.filter(
+            lecturer=user, start_time__lt=end, end_time__gt=start,
+        ).values_list('start_time', 'end_time')
+
+        result = compute_free_busy(slots, blocked, start, end)
+        return Response({
+            'start': timezone.localtime(start).isoformat(),
+            'end': timezone.localtime(end).isoformat(),
+            'free': _format_intervals(result['free']),
+            'booked': _format_intervals(result['booked']),
+            'blocked': _format_intervals(result['blocked']),
+        })
+
+    # ************************************************************
+    # PODSUMOWANIE DZIENNE - widok miesiaca/tygodnia
+    # Endpoint: /api/schedules/calendar/summary/?start=...&end=...
+    # ************************************************************
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        start, end = get_time_range(request, default_days=31, max_days=93)
+        return Response({
+            'start': timezone.localtime(start).isoformat(),
+            'end': timezone.localtime(end).isoformat(),
+            'days': summarize_days([request.user.pk], start, end),
+        })
+
     @action(detail=False, methods=['get'], url_path='reservations')
     def reservations(self, request):
         user = request.user
-        # Filtrujemy rezerwacje powiązane ze slotami tego prowadzącego
-        reservations = Reservation.objects.filter(slot__lecturer=user).order_by('date', 'time')
+        # Filtrujemy rezerwacje powiązane ze slotami tego prowadzącego (slot i prowadzacy w jednym JOIN)
+        reservations = Reservation.objects.filter(slot__lecturer=user).with_slot_details()
 
-        # Używamy zaimportowanego ReservationSerializer
-        serializer = ReservationSerializer(reservations, many=True)
-        return Response(serializer.data)
+        #strona po (termin slotu, id) - stala liczba zapytan niezaleznie od liczby rezerwacji
+        paginator = ReservationCursorPagination()
+        page = paginator.paginate_queryset(reservations, request, view=self)
+        serializer = ReservationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
-class ScheduleExportView(APIView):
+class AvailabilityRuleViewSet(viewsets.ModelViewSet):
+    """
+    Reguly cyklicznej dostepnosci prowadzacego.
+    Bazowy URL: /api/schedules/availability-rules/
+    """
+    serializer_class = AvailabilityRuleSerializer
     permission_classes = [permissions.IsAuthenticated, IsLecturer]
 
-    def get(self, request, *args, **kwargs):
-        """Eksportuje okna dostępności i zablokowane okresy do pliku CSV."""
+    def get_queryset(self):
+        return AvailabilityRule.objects.filter(lecturer=self.request.user).prefetch_related('exceptions')
 
-        # 1. Pobieranie danych dla zalogowanego prowadzącego
-        user = request.user
-        time_windows = AvailableSlot.objects.filter(lecturer=user)
-        blocked_times = BlockedTime.objects.filter(lecturer=user)
-
-        # 2. Tworzenie odpowiedzi HTTP z nagłówkami
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="harmonogram_agh_{}.csv"'.format(user.username)
-
-        writer = csv.writer(response, delimiter=';')  # Użycie średnika ułatwia obsługę polskiego CSV
-
-        # Nagłówek dla Okien Dostępności
-        writer.writerow(['TYP', 'DZIEŃ', 'GODZINA_START', 'GODZINA_KONIEC', 'POJEMNOSC', 'POWTAZALNE'])
-
-        # 3. Zapis Okien Dostępności
-        for tw in time_windows:
-            writer.writerow([
-                'DOSTEPNOSC',
-                tw.day,
-                tw.start_time.strftime("%H:%M"),
-                tw.end_time.strftime("%H:%M"),
-                tw.capacity,
-                'TAK' if tw.is_recurring else 'NIE'
-            ])
+    def perform_create(self, serializer):
+        serializer.save(lecturer=self.request.user)
 
-        # Pusta linia dla separacji
-        writer.writerow([])
+    #materializacja (i opcjonalnie edycja) pojedynczego wystapienia reguly
+    #POST /api/schedules/availability-rules/{id}/occurrence/ {"start_time": ..., "meeting_location": ...}
+    @action(detail=True, methods=['post'])
+    def occurrence(self, request, pk=None):
+        rule = self.get_object()
+        start = request.data.get('start_time')
+        if not start:
+            raise ValidationError({'start_time': "To pole jest wymagane."})
+        start = _parse_range_value(start, 'start_time')
+        try:
+            with transaction.atomic():
+                slot, created = materialize_occurrence(rule, start)
+                changes = {key: value for key, value in request.data.items() if key != 'start_time'}
+                if changes:
+                    serializer = AvailableSlotCreateSerializer(slot, data=changes, partial=True)
+                    serializer.is_valid(raise_exception=True)
+                    slot = serializer.save()
+        except OccurrenceError as e:
+            raise ValidationError({'start_time': str(e)})
+        return Response(
+            AvailableSlotSerializer(slot).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
-        # Nagłówek dla Zablokowanych Okresów
-        writer.writerow(['TYP', 'DATA', 'GODZINA_START', 'GODZINA_KONIEC', 'POWOD'])
 
-        # 4. Zapis Zablokowanych Okresów
-        for bt in blocked_times:
-            writer.writerow([
-                'BLOKADA',
-                bt.date.strftime("%Y-%m-%d"),
-                bt.start_time.strftime("%H:%M"),
-                bt.end_time.strftime("%H:%M"),
-                bt.reason
-            ])
+class ScheduleExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsLecturer]
 
+    def get(self, request, *args, **kwargs):
+        """
+        Eksportuje okna dostępności, zablokowane okresy, reguły i rezerwacje do pliku CSV.
+        Parametry: ?start=&end= (zakres dat), ?gzip=1 (plik .csv.gz), ?reservations=0 (bez rezerwacji).
+        """
+        user = request.user
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        start = _parse_range_value(start, 'start') if start else None
+        end = _parse_range_value(end, 'end') if end else None
+        include_reservations = request.query_params.get('reservations', '1') not in ('0', 'false')
+
+        # Odpowiedz strumieniowa - wiersze powstaja w trakcie wysylania
+        chunks = stream_csv(iter_schedule_rows(user, start, end, include_reservations))
+        filename = 'harmonogram_agh_{}.csv'.format(user.username)
+        if request.query_params.get('gzip') in ('1', 'true'):
+            response = StreamingHttpResponse(stream_gzip(chunks), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
         return response
 
 
@@ -178,64 +473,70 @@ class ScheduleExportView(APIView):
 # Endpoint: /api/schedules/import/
 class ScheduleImportView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsLecturer]
+    parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
-        """Importuje dane z pliku CSV."""
+        """
+        Przyjmuje plik CSV i zleca import w tle (Celery).
+        Zwraca 202 z id zadania - postep dostepny pod /api/schedules/import/<id>/.
+        """
 
         if 'file' not in request.FILES:
             return Response({"error": "Brak pliku 'file' w żądaniu."}, status=status.HTTP_400_BAD_REQUEST)
 
-        csv_file = request.FILES['file']
-        decoded_file = csv_file.read().decode('utf-8')
-        io_string = io.StringIO(decoded_file)
+        job = ScheduleImportJob.objects.create(lecturer=request.user, file=request.FILES['file'])
+        # zadanie wysylamy dopiero po zatwierdzeniu transakcji, zeby worker widzial rekord
+        transaction.on_commit(lambda: import_schedule_task.delay(job.pk))
 
-        # Używamy ';' jako separatora, aby dopasować się do eksportu
-        reader = csv.reader(io_string, delimiter=';')
-        next(reader)  # Pomiń pierwszy wiersz (nagłówek)
+        return Response({
+            "job_id": job.pk,
+            "status": job.status,
+            "status_url": reverse('schedule-import-status', kwargs={'pk': job.pk}),
+            "message": "Plik został przyjęty do importu.",
+        }, status=status.HTTP_202_ACCEPTED)
 
-        imported_count = 0
 
-        try:
-            with transaction.atomic():
-                for row in reader:
-                    if not row or row[0].upper() not in ['DOSTEPNOSC', 'BLOKADA']:
-                        continue  # Pomiń puste wiersze lub nieznany typ
-
-                    row_type = row[0].upper()
-
-                    if row_type == 'DOSTEPNOSC' and len(row) >= 6:
-                        # [TYP, DZIEŃ, GODZINA_START, GODZINA_KONIEC, POJEMNOSC, POWTAZALNE]
-                        data = {
-                            'lecturer': request.user.pk,
-                            'day': row[1],
-                            'start_time': row[2],
-                            'end_time': row[3],
-                            'capacity': int(row[4]),
-                            'is_recurring': row[5].upper() == 'TAK',
-                            'location': 'Imported Location'  # Domyślna lokalizacja dla importowanych slotów
-                        }
-                        serializer = AvailableSlotSerializer(data=data)
-                        if serializer.is_valid(raise_exception=True):
-                            serializer.save(lecturer=request.user)
-                            imported_count += 1
-
-                    elif row_type == 'BLOKADA' and len(row) >= 5:
-                        # [TYP, DATA, GODZINA_START, GODZINA_KONIEC, POWOD]
-                        data = {
-                            'lecturer': request.user.pk,
-                            'date': row[1],
-                            'start_time': row[2],
-                            'end_time': row[3],
-                            'reason': row[4],
-                        }
-                        serializer = BlockedTimeSerializer(data=data)
-                        if serializer.is_valid(raise_exception=True):
-                            serializer.save(lecturer=request.user)
-                            imported_count += 1
-
-        except Exception as e:
-            return Response({"error": f"Błąd przetwarzania pliku CSV: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({"message": f"Pomyślnie zaimportowano {imported_count} pozycji."},
-                        status=status.HTTP_201_CREATED)
+# Endpoint: /api/schedules/import/<id>/
+class ScheduleImportStatusView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsLecturer]
+    serializer_class = ScheduleImportJobSerializer
+
+    def get_queryset(self):
+        return ScheduleImportJob.objects.filter(lecturer=self.request.user)
+
+
+# Endpoint: /api/schedules/calendar-feed/
+class CalendarFeedTokenView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _response(self, request, token):
+        url = request.build_absolute_uri(reverse('schedule-calendar-feed', kwargs={'token': token}))
+        return Response({"token": token, "url": url})
+
+    def get(self, request, *args, **kwargs):
+        """Adres subskrypcji .ics zalogowanego uzytkownika (prowadzacy - harmonogram, student - rezerwacje)."""
+        return self._response(request, get_or_create_feed_token(request.user))
+
+    def post(self, request, *args, **kwargs):
+        """Generuje nowy token - poprzedni adres przestaje dzialac."""
+        return self._response(request, regenerate_feed_token(request.user))
+
+
+# Endpoint: /api/schedules/feed/<token>.ics
+# zwykly widok Django - klienci kalendarzy nie uzywaja JWT ani negocjacji formatu DRF
+@require_GET
+def calendar_feed(request, token):
+    owner = resolve_feed_token(token)
+    if owner is None:
+        raise Http404("Nieznany kanał kalendarza.")
+    etag, last_modified, body = get_cached_feed(*owner)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified.timestamp())
+    if response is None:
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="konsultacje.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
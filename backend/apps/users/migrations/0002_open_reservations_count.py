@@ -0,0 +1,35 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def fill_open_reservations_count(apps, schema_editor):
+    #otwarte rezerwacje na przyszle terminy (tak samo liczy book_slot przy osiagnieciu limitu)
+    User = apps.get_model('users', 'User')
+    counts = User.objects.annotate(
+        open_count=Count('my_reservations', filter=Q(
+            my_reservations__status__in=('Pending', 'Confirmed'),
+            my_reservations__slot__start_time__gt=timezone.now(),
+        )),
+    ).filter(open_count__gt=0).values_list('pk', 'open_count')
+    for user_id, open_count in counts:
+        User.objects.filter(pk=user_id).update(open_reservations_count=open_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('reservations', '0006_lecturerweeklystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='open_reservations_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_open_reservations_count, migrations.RunPython.noop),
+    ]
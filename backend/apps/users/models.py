@@ -8,6 +8,9 @@ class User(AbstractUser):
         ('admin', 'Admin'),
     ]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='student')
+    #liczba otwartych (Pending/Confirmed) rezerwacji studenta - limit sprawdzany bez COUNT
+    #(apps.reservations.services.book_slot); rezerwacje z przeszlosci odliczane leniwie przy limicie
+    open_reservations_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
\ No newline at end of file
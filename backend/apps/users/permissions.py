@@ -26,4 +26,16 @@ class IsReservationOwner(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
-        return obj.student == request.user
\ No newline at end of file
+        return obj.student == request.user
+
+
+class IsLecturerOrAdmin(permissions.BasePermission):
+    #statystyki: prowadzacy widzi swoje, administrator wszystkie
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        if request.user.is_superuser:
+            return True
+
+        return request.user.role in ('lecturer', 'admin')
@@ -0,0 +1,100 @@
+"""
+Ograniczanie liczby zadan (DRF throttle) jako kubelek tokenow w cache Django.
+
+Kubelek o pojemnosci N napelnia sie N tokenami na okres (np. '20/min'). Stan to dwa
+klucze cache: chwila startu kubelka (cache.add) i licznik zuzytych tokenow (cache.incr),
+wiec sprawdzenie to jeden odczyt i jeden atomowy incr - bez zapisow do bazy i bez
+wyscigow typu odczyt-zapis. Dostepne tokeny = N + dolane od startu - zuzyte; nadmiar
+ponad pojemnosc (po dluzszej przerwie) jest "spalany" dodatkowym incr.
+
+Limity per rola (student, lecturer, anon) w settings.TOKEN_BUCKET_RATES[scope].
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+#klucze zyja co najmniej tyle - po wygasnieciu kubelek startuje pelny
+MIN_BUCKET_TTL = 3600
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60). None oznacza brak limitu."""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period.strip()[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def get_role(self, request):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anon'
+        return getattr(user, 'role', 'student')
+
+    def get_rate(self, request):
+        rates = getattr(settings, 'TOKEN_BUCKET_RATES', {}).get(self.scope, {})
+        return parse_rate(rates.get(self.get_role(request)))
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(request)
+        if rate is None:
+            return True
+        capacity, period = rate
+        cache = self.get_cache()
+        key = self.get_cache_key(request)
+        ttl = max(MIN_BUCKET_TTL, 2 * period)
+        now = time.time()
+
+        started = cache.get(key)
+        if started is None:
+            cache.add(key, now, timeout=ttl)
+            started = cache.get(key, now)
+        #licznik ma w nazwie chwile startu - nowy kubelek nie dziedziczy starego licznika
+        used_key = f'{key}:{int(started * 1000)}'
+        try:
+            used = cache.incr(used_key)
+        except ValueError:
+            cache.add(used_key, 0, timeout=ttl)
+            used = cache.incr(used_key)
+
+        allowance = capacity + int((now - started) * capacity / period)
+        #po przerwie kubelek nie moze miec wiecej niz `capacity` tokenow
+        excess = allowance - (used - 1) - capacity
+        if excess > 0:
+            used = cache.incr(used_key, excess)
+
+        if used <= allowance:
+            return True
+        #odrzucone zadanie nie zuzywa tokenu
+        cache.decr(used_key)
+        self.wait_seconds = (used - allowance) * period / capacity
+        return False
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class BookingThrottle(TokenBucketThrottle):
+    #tworzenie rezerwacji, trzymanie miejsca, lista oczekujacych
+    scope = 'booking'
+
+
+class PublicSlotsThrottle(TokenBucketThrottle):
+    #publiczna lista slotow (dostepna bez logowania)
+    scope = 'public_slots'
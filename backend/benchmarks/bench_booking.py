@@ -0,0 +1,176 @@
+"""
+Benchmark rezerwacji pod obciazeniem rownoleglym (apps.reservations.services.book_slot).
+
+Tworzy tymczasowa baze SQLite (plik), kilka popularnych slotow i tysiace studentow,
+a nastepnie uruchamia N procesow, ktore po wspolnym starcie (bariera) jednoczesnie
+rezerwuja miejsca. Raportuje przepustowosc, percentyle opoznien i liczbe nadmiarowych
+rezerwacji (overbooking) policzona z tabeli rezerwacji, nie z licznika.
+
+Tryb --mode naive odtwarza stara sciezke (COUNT, potem INSERT) dla porownania.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_booking
+    python -m benchmarks.bench_booking --processes 16 --bookings 4000 --slots 10 --capacity 5
+    python -m benchmarks.bench_booking --mode naive
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+
+def setup_django(db_path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+    settings.DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': db_path,
+        #czekamy na blokade zapisu zamiast od razu zwracac "database is locked"
+        'OPTIONS': {'timeout': 60},
+    }
+    import django
+    #powiadomienia i e-maile ida przez outbox (INSERT w transakcji rezerwacji) - relay nie jest uruchamiany
+    django.setup()
+
+
+def prepare_data(slot_count, capacity, student_count):
+    from django.core.management import call_command
+    from django.utils import timezone
+    from apps.schedules.models import AvailableSlot
+    from apps.users.models import User
+
+    call_command('migrate', verbosity=0)
+    lecturer = User.objects.create_user(username='bench_lecturer', password='x', role='lecturer')
+    start = timezone.now() + timedelta(days=7)
+    slots = AvailableSlot.objects.bulk_create([
+        AvailableSlot(
+            lecturer=lecturer,
+            start_time=start + timedelta(hours=i),
+            end_time=start + timedelta(hours=i, minutes=30),
+            max_attendees=capacity,
+        )
+        for i in range(slot_count)
+    ])
+    students = User.objects.bulk_create([
+        User(username=f'bench_student_{i}', role='student', password='!')
+        for i in range(student_count)
+    ])
+    return [slot.pk for slot in slots], [student.pk for student in students]
+
+
+def naive_book(slot_id, student):
+    #stara sciezka: odczyt liczby rezerwacji i zapis bez blokady
+    from django.core.exceptions import PermissionDenied
+    from apps.reservations.models import Reservation
+    from apps.schedules.models import AvailableSlot
+
+    slot = AvailableSlot.objects.get(pk=slot_id)
+    if slot.reservations.count() >= slot.max_attendees:
+        raise PermissionDenied("Brak wolnych miejsc")
+    return Reservation.objects.create(slot=slot, student=student, status='Pending')
+
+
+def worker(db_path, mode, jobs, barrier, results):
+    setup_django(db_path)
+    from django.core.exceptions import PermissionDenied
+    from django.db import OperationalError, connection
+    from apps.reservations.services import book_slot, BookingError
+    from apps.users.models import User
+
+    students = User.objects.in_bulk([student_id for _, student_id in jobs])
+    connection.close()
+    book = book_slot if mode == 'engine' else naive_book
+
+    latencies = []
+    outcomes = {}
+    barrier.wait()
+    for slot_id, student_id in jobs:
+        started = time.perf_counter()
+        try:
+            book(slot_id, students[student_id])
+            outcome = 'ok'
+        except BookingError as e:
+            outcome = e.code
+        except PermissionDenied:
+            outcome = 'full'
+        except OperationalError:
+            outcome = 'db_error'
+        latencies.append((time.perf_counter() - started) * 1000)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    results.put((latencies, outcomes))
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def run(args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_booking_'), 'bench.sqlite3')
+    setup_django(db_path)
+    from django.db import connections
+    from django.db.models import Count, Q
+    from apps.reservations.models import INACTIVE_STATUSES
+    from apps.schedules.models import AvailableSlot
+
+    slot_ids, student_ids = prepare_data(args.slots, args.capacity, args.bookings)
+    #kazdy student probuje zarezerwowac jeden z kilku popularnych slotow
+    jobs = [(slot_ids[i % len(slot_ids)], student_id) for i, student_id in enumerate(student_ids)]
+    chunks = [jobs[i::args.processes] for i in range(args.processes)]
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(args.processes + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(db_path, args.mode, chunk, barrier, results))
+        for chunk in chunks
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for chunk_latencies, _ in collected for latency in chunk_latencies)
+    outcomes = {}
+    for _, chunk_outcomes in collected:
+        for outcome, count in chunk_outcomes.items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + count
+
+    #overbooking liczony z rzeczywistych rezerwacji, nie z licznika w slocie
+    slots = AvailableSlot.objects.annotate(
+        real_count=Count('reservations', filter=~Q(reservations__status__in=INACTIVE_STATUSES)),
+    ).values('max_attendees', 'real_count', 'active_reservations_count')
+    overbooked = sum(max(0, slot['real_count'] - slot['max_attendees']) for slot in slots)
+    counter_mismatches = sum(1 for slot in slots if slot['real_count'] != slot['active_reservations_count'])
+
+    print(f"tryb: {args.mode}, procesy: {args.processes}, proby: {len(jobs)}, "
+          f"sloty: {args.slots} x {args.capacity} miejsc")
+    print(f"czas: {elapsed:.2f} s, przepustowosc: {len(jobs) / elapsed:.0f} prob/s")
+    print(f"opoznienie [ms]: p50 {percentile(latencies, 0.5):.1f}, p95 {percentile(latencies, 0.95):.1f}, "
+          f"p99 {percentile(latencies, 0.99):.1f}, max {latencies[-1]:.1f}, "
+          f"srednia {statistics.mean(latencies):.1f}")
+    print("wyniki:", ', '.join(f"{name}={count}" for name, count in sorted(outcomes.items())))
+    print(f"przyjete: {outcomes.get('ok', 0)} / pojemnosc {args.slots * args.capacity}, "
+          f"overbooking: {overbooked}, niezgodne liczniki: {counter_mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=2000, help="liczba prob rezerwacji (= liczba studentow)")
+    parser.add_argument('--slots', type=int, default=5)
+    parser.add_argument('--capacity', type=int, default=10)
+    parser.add_argument('--mode', choices=('engine', 'naive'), default='engine')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark wysylki e-maili potwierdzajacych: polaczenie SMTP na wiadomosc vs paczka.
+
+Uruchamia lokalny serwer SMTP (aiosmtpd) i wysyla N wiadomosci:
+  - per-message: kazda wiadomosc przez EmailMultiAlternatives.send() (nowe polaczenie,
+    tak jak dawne zadanie send_confirmation_email),
+  - batched: apps.reservations.emails.send_batch - jedno polaczenie na paczke --batch-size.
+--latency dodaje opoznienie serwera przy EHLO (koszt nawiazania sesji z odleglym serwerem).
+
+Wymaga aiosmtpd (pip install aiosmtpd). Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_email
+    python -m benchmarks.bench_email --messages 2000 --batch-size 200 --latency 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+
+class CountingHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def setup_django(port):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = port
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = ''
+    settings.EMAIL_HOST_PASSWORD = ''
+    settings.DEFAULT_FROM_EMAIL = 'bench@example.com'
+    import django
+    django.setup()
+
+
+def build_messages(count):
+    from django.core.mail import EmailMultiAlternatives
+
+    return [
+        EmailMultiAlternatives(
+            subject=f"Potwierdzenie rezerwacji {i}",
+            body="Twoja rezerwacja zostala potwierdzona.\n" * 20,
+            from_email='bench@example.com',
+            to=[f'student{i}@example.com'],
+        )
+        for i in range(count)
+    ]
+
+
+def run_per_message(messages):
+    for message in messages:
+        message.send(fail_silently=False)
+
+
+def run_batched(messages, batch_size):
+    from apps.reservations.emails import send_batch
+
+    failed = 0
+    for start in range(0, len(messages), batch_size):
+        chunk = messages[start:start + batch_size]
+        _, errors = send_batch([((start + i, None, 'student'), message) for i, message in enumerate(chunk)])
+        failed += len(errors)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0, help="opoznienie EHLO serwera [ms]")
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("Brak aiosmtpd - zainstaluj: pip install aiosmtpd")
+
+    handler = CountingHandler(args.latency / 1000)
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    try:
+        setup_django(args.port)
+        for mode in ('per-message', 'batched'):
+            handler.received = handler.sessions = 0
+            messages = build_messages(args.messages)
+            started = time.perf_counter()
+            failed = run_per_message(messages) if mode == 'per-message' else run_batched(messages, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"{mode}: {args.messages} wiadomosci w {elapsed:.2f} s, "
+                  f"{args.messages / elapsed:.0f} wiad./s, sesje SMTP: {handler.sessions}, "
+                  f"odebrane: {handler.received}, bledy: {failed or 0}")
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
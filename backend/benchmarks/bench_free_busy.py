@@ -0,0 +1,66 @@
+"""
+Benchmark silnika free/busy (apps.schedules.freebusy).
+
+Generuje losowy kalendarz prowadzacego z dziesiatkami tysiecy przedzialow
+i mierzy czas compute_free_busy. Nie wymaga bazy danych.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_free_busy
+    python -m benchmarks.bench_free_busy --sizes 10000 50000 100000 --repeat 5
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from apps.schedules.freebusy import compute_free_busy
+
+
+def generate_calendar(slot_count, blocked_ratio, seed):
+    rng = random.Random(seed)
+    base = datetime(2025, 10, 1, 8, 0, tzinfo=timezone.utc)
+    slots = []
+    for i in range(slot_count):
+        # sloty po 15-90 minut, rozrzucone na okolo rok
+        start = base + timedelta(minutes=15 * rng.randrange(0, 35000))
+        end = start + timedelta(minutes=15 * rng.randint(1, 6))
+        capacity = rng.choice((1, 1, 1, 2, 5))
+        slots.append((start, end, rng.randint(0, capacity), capacity))
+
+    blocked = []
+    for i in range(int(slot_count * blocked_ratio)):
+        start = base + timedelta(minutes=15 * rng.randrange(0, 35000))
+        blocked.append((start, start + timedelta(minutes=30 * rng.randint(1, 8))))
+    return base, slots, blocked
+
+
+def run(sizes, blocked_ratio, repeat, seed):
+    print(f"{'sloty':>10} {'blokady':>10} {'min [ms]':>10} {'mediana [ms]':>13} {'wolne':>8}")
+    for size in sizes:
+        base, slots, blocked = generate_calendar(size, blocked_ratio, seed)
+        window_start, window_end = base, base + timedelta(days=400)
+        timings = []
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = compute_free_busy(slots, blocked, window_start, window_end)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(
+            f"{size:>10} {len(blocked):>10} {min(timings):>10.1f} "
+            f"{statistics.median(timings):>13.1f} {len(result['free']):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000, 100000])
+    parser.add_argument('--blocked-ratio', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.blocked_ratio, args.repeat, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark kanalu push SSE (apps.notifications.stream) na aplikacji ASGI (config.asgi).
+
+Otwiera N polaczen SSE bezposrednio przez aplikacje ASGI w jednej petli zdarzen (bez
+serwera HTTP - mierzony jest sam stos Django + pub/sub), czeka az wszystkie zasubskrybuja
+kanal, a nastepnie publikuje K zmian terminow (kanal 'slots') z osobnego watku, tak jak
+relay/sygnal po commicie. Raportuje czas zestawienia polaczen, pamiec na polaczenie
+i opoznienie fan-outu (od publikacji do wyslania zdarzenia przez kazde polaczenie).
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_push
+    python -m benchmarks.bench_push --connections 5000 --messages 20
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import threading
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+    settings.PUSH_BACKEND = 'apps.notifications.push.LocalPubSub'
+    #bez heartbeatu w trakcie pomiaru
+    settings.PUSH_HEARTBEAT_SECONDS = 3600
+    import django
+    django.setup()
+
+
+class Connection:
+    delivered = 0
+
+    def __init__(self, sent_at):
+        self.sent_at = sent_at
+        self.ready = asyncio.Event()
+        self.disconnect = asyncio.Event()
+        self.latencies = []
+
+    async def receive(self):
+        if not hasattr(self, '_requested'):
+            self._requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] != 'http.response.body':
+            return
+        body = message.get('body', b'')
+        if body.startswith(b'retry:'):
+            self.ready.set()
+        elif body.startswith(b'event: slots'):
+            #numer wiadomosci przekazany jako lecturer_id
+            sequence = int(body.rsplit(b':', 1)[1].strip(b' }\n'))
+            self.latencies.append(time.perf_counter() - self.sent_at[sequence])
+            Connection.delivered += 1
+
+
+def scope(token):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/api/notifications/stream/',
+        'raw_path': b'/api/notifications/stream/',
+        'query_string': f'token={token}&slots=1'.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 8000),
+    }
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args):
+    from rest_framework_simplejwt.tokens import AccessToken
+    from config.asgi import application
+    from apps.notifications.push import SLOTS_CHANNEL, get_pubsub, publish_slot_change
+    from apps.users.models import User
+
+    #token weryfikowany bez odczytu uzytkownika z bazy - wystarczy obiekt z pk
+    tokens = [str(AccessToken.for_user(User(pk=i + 1))) for i in range(min(args.connections, 100))]
+    sent_at = {}
+    connections = [Connection(sent_at) for _ in range(args.connections)]
+
+    rss_before = max_rss_mb()
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(application(scope(tokens[i % len(tokens)]), conn.receive, conn.send))
+        for i, conn in enumerate(connections)
+    ]
+    await asyncio.gather(*(conn.ready.wait() for conn in connections))
+    setup_time = time.perf_counter() - started
+    rss_after = max_rss_mb()
+    subscribed = get_pubsub().subscriber_count(SLOTS_CHANNEL)
+
+    loop = asyncio.get_running_loop()
+    fanout_times = []
+    for sequence in range(args.messages):
+        expected = args.connections * (sequence + 1)
+        sent_at[sequence] = time.perf_counter()
+        #publikacja z innego watku (jak po commicie w widoku synchronicznym / relayu)
+        await loop.run_in_executor(None, publish_slot_change, sequence)
+        while Connection.delivered < expected:
+            await asyncio.sleep(0.001)
+        fanout_times.append(time.perf_counter() - sent_at[sequence])
+
+    for conn in connections:
+        conn.disconnect.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = sorted(latency * 1000 for conn in connections for latency in conn.latencies)
+    print(f"polaczenia: {args.connections} (subskrypcje kanalu slots: {subscribed}), "
+          f"zestawienie: {setup_time:.2f} s, {args.connections / setup_time:.0f} pol./s")
+    print(f"pamiec: +{rss_after - rss_before:.1f} MB max RSS, "
+          f"~{(rss_after - rss_before) * 1024 / args.connections:.1f} KB na polaczenie")
+    print(f"fan-out {args.messages} wiadomosci x {args.connections} polaczen: "
+          f"srednio {statistics.mean(fanout_times) * 1000:.1f} ms do ostatniego odbiorcy")
+    print(f"opoznienie dostarczenia [ms]: p50 {latencies[len(latencies) // 2]:.2f}, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.2f}, max {latencies[-1]:.2f}")
+    print(f"watki: {threading.active_count()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=10)
+    args = parser.parse_args()
+    setup_django()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # <--- TO JEST KLUCZOWE
 
+#pliki przesylane przez uzytkownikow (np. importy CSV czekajace na przetworzenie)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
 SECRET_KEY = 'django-insecure-dev-key-change-this'
 DEBUG = True
 
@@ -107,6 +111,28 @@ DATABASES = {
     }
 }
 
+#CACHE - domyslnie pamiec procesu, na produkcji wspolny Redis (REDIS_CACHE_URL)
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+#cache publicznej listy slotow (alias z CACHES i czas zycia wpisu w sekundach)
+SCHEDULES_CACHE_ALIAS = config('SCHEDULES_CACHE_ALIAS', default='default')
+PUBLIC_SLOTS_CACHE_TTL = config('PUBLIC_SLOTS_CACHE_TTL', default=60, cast=int)
+#gotowe kanaly .ics (wpis i tak przestaje byc uzywany po zmianie generacji)
+CALENDAR_FEED_CACHE_TTL = config('CALENDAR_FEED_CACHE_TTL', default=3600, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -188,6 +214,9 @@ REST_AUTH = {
 # ]
 
 CORS_ALLOW_CREDENTIALS = True
+#klienci moga ponawiac POST z naglowkiem Idempotency-Key
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 # CSRF_TRUSTED_ORIGINS = [
 #     "http://localhost:3000",
 #     "http://localhost:5173",
@@ -225,6 +254,67 @@ CELERY_TASK_EAGER_PROPAGATION=False
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
 
+#zadania okresowe (DatabaseScheduler kopiuje je do bazy przy starcie beat)
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-idempotency-keys': {
+        'task': 'reservations.purge_expired_idempotency_keys',
+        'schedule': timedelta(hours=1),
+    },
+    #zdarzenia rezerwacji (outbox) -> powiadomienia i e-maile
+    'relay-reservation-outbox': {
+        'task': 'reservations.relay_outbox',
+        'schedule': timedelta(seconds=config('OUTBOX_RELAY_INTERVAL_SECONDS', default=5, cast=int)),
+    },
+    'purge-reservation-outbox': {
+        'task': 'reservations.purge_outbox',
+        'schedule': timedelta(days=1),
+    },
+}
+
+#relay outbox: partia zdarzen, limit prob, retencja przetworzonych; 'direct' wysyla e-maile bez Celery
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=500, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+OUTBOX_DISPATCH = config('OUTBOX_DISPATCH', default='celery')
+#liczba rezerwacji w jednym zadaniu wysylki potwierdzen (jedno polaczenie SMTP na zadanie)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=100, cast=int)
+#licznik nieprzeczytanych powiadomien w cache (apps.notifications.inbox)
+NOTIFICATION_UNREAD_CACHE_TTL = config('NOTIFICATION_UNREAD_CACHE_TTL', default=300, cast=int)
+#kanal push (SSE, apps.notifications.stream): backend pub/sub, heartbeat, maksymalny czas strumienia
+#LocalPubSub - bez Redisa, tylko w obrebie procesu; z workerem Celery: apps.notifications.push.RedisPubSub
+PUSH_BACKEND = config('PUSH_BACKEND', default='apps.notifications.push.LocalPubSub')
+PUSH_REDIS_URL = config('PUSH_REDIS_URL', default=REDIS_CACHE_URL or CELERY_BROKER_URL)
+PUSH_QUEUE_SIZE = config('PUSH_QUEUE_SIZE', default=100, cast=int)
+PUSH_HEARTBEAT_SECONDS = config('PUSH_HEARTBEAT_SECONDS', default=20, cast=int)
+PUSH_STREAM_MAX_SECONDS = config('PUSH_STREAM_MAX_SECONDS', default=1800, cast=int)
+#wiecej powiadomien jednego typu dla odbiorcy w partii relaya -> jedno zbiorcze (0 wylacza)
+NOTIFICATION_DIGEST_THRESHOLD = config('NOTIFICATION_DIGEST_THRESHOLD', default=3, cast=int)
+
+#czas przechowywania odpowiedzi dla naglowka Idempotency-Key
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+#po tym czasie klucz wciaz "w trakcie" (np. po awarii workera) moze przejac ponowienie
+IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS = config('IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS', default=60, cast=int)
+#trzymanie miejsca na czas formularza rezerwacji; bez wspolnego cache (Redis) trzymania sa w bazie
+SEAT_HOLD_TTL_SECONDS = config('SEAT_HOLD_TTL_SECONDS', default=300, cast=int)
+SEAT_HOLD_CACHE_ALIAS = config('SEAT_HOLD_CACHE_ALIAS', default='default' if REDIS_CACHE_URL else '')
+
+#limity zadan (kubelki tokenow w cache, apps.users.throttling) - 'N/okres' per rola, None = bez limitu
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+TOKEN_BUCKET_RATES = {
+    'booking': {
+        'student': config('BOOKING_RATE_STUDENT', default='30/min'),
+        'lecturer': config('BOOKING_RATE_LECTURER', default='60/min'),
+        'anon': None,
+    },
+    'public_slots': {
+        'student': config('PUBLIC_SLOTS_RATE_STUDENT', default='300/min'),
+        'lecturer': config('PUBLIC_SLOTS_RATE_LECTURER', default='300/min'),
+        'anon': config('PUBLIC_SLOTS_RATE_ANON', default='120/min'),
+    },
+}
+#najwiecej otwartych (oczekujacych/potwierdzonych) przyszlych rezerwacji studenta; 0 = bez limitu
+MAX_OPEN_RESERVATIONS_PER_STUDENT = config('MAX_OPEN_RESERVATIONS_PER_STUDENT', default=10, cast=int)
+
 #TWILIO - sms
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
@@ -48,6 +48,28 @@ export const login = async (email:string, password:string) => {
 
 export const logout = () => {
   localStorage.removeItem("authToken");
+  localStorage.removeItem("refreshToken");
+};
+
+//czy token dostepu wygasa w ciagu marginSeconds (odczyt "exp" z JWT bez weryfikacji)
+export const accessTokenExpiresSoon = (token: string | null, marginSeconds = 30) => {
+  if (!token) return true;
+  try {
+    const payload = JSON.parse(atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/")));
+    return payload.exp * 1000 < Date.now() + marginSeconds * 1000;
+  } catch {
+    return true;
+  }
+};
+
+//nowy token dostepu z tokenu odswiezania (ROTATE_REFRESH_TOKENS - zapisujemy tez nowy refresh)
+export const refreshAccessToken = async () => {
+  const refresh = localStorage.getItem("refreshToken");
+  if (!refresh) return localStorage.getItem("authToken");
+  const response = await api.post<{ access: string; refresh?: string }>("/api/users/token/refresh/", { refresh });
+  localStorage.setItem("authToken", response.data.access);
+  if (response.data.refresh) localStorage.setItem("refreshToken", response.data.refresh);
+  return response.data.access;
 };
 
 
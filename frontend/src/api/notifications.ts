@@ -0,0 +1,76 @@
+import api from './axios'
+import type {CursorPage, Notification} from "@/api/types.ts";
+import {accessTokenExpiresSoon, refreshAccessToken} from "./auth";
+
+export const notificationsAPI = {
+  //skrzynka - najnowsze najpierw, cursor z poprzedniej odpowiedzi
+  getInbox: (cursor?: string | null, unreadOnly = false) =>
+    api.get<CursorPage<Notification>>("/api/notifications/inbox/", {
+      params: { ...(cursor ? { cursor } : {}), ...(unreadOnly ? { unread: 1 } : {}) },
+    }),
+
+  //licznik z cache po stronie backendu - tani do odpytywania w naglowku
+  getUnreadCount: () =>
+    api.get<{ unread_count: number }>("/api/notifications/inbox/unread-count/"),
+
+  markRead: (id: number) =>
+    api.post<{ unread_count: number }>(`/api/notifications/inbox/${id}/read/`),
+
+  //upToId - najnowsze widoczne powiadomienie; nowsze (przyszle w miedzyczasie) zostaja nieprzeczytane
+  markAllRead: (upToId?: number) =>
+    api.post<{ updated: number; unread_count: number }>(
+      "/api/notifications/inbox/read-all/",
+      upToId !== undefined ? { up_to_id: upToId } : {},
+    ),
+
+  //kanal push (SSE) zamiast odpytywania: nowe powiadomienia i (opcjonalnie) zmiany terminow
+  //token jest w adresie, a automatyczne wznowienie EventSource uzywa zawsze tego samego adresu -
+  //po wygasnieciu tokenu (401) strumien zamknalby sie na stale. Dlatego przy bledzie zamykamy
+  //polaczenie i otwieramy nowe z aktualnym (w razie potrzeby odswiezonym) tokenem i last_event_id
+  openStream: (onNotification: (n: Notification) => void, onSlotsChanged?: (lecturerId: number) => void) => {
+    let source: EventSource | null = null
+    let lastEventId = ""
+    let stopped = false
+    let retryTimer: ReturnType<typeof setTimeout> | undefined
+
+    const connect = () => {
+      const params = new URLSearchParams({ token: localStorage.getItem("authToken") ?? "" })
+      if (onSlotsChanged) params.set("slots", "1")
+      //nowy EventSource nie wysyla Last-Event-ID - pominiete powiadomienia wracaja przez parametr
+      if (lastEventId) params.set("last_event_id", lastEventId)
+      source = new EventSource(`${api.defaults.baseURL ?? ""}/api/notifications/stream/?${params}`)
+      source.addEventListener("notification", (e) => {
+        const event = e as MessageEvent
+        if (event.lastEventId) lastEventId = event.lastEventId
+        onNotification(JSON.parse(event.data))
+      })
+      if (onSlotsChanged) {
+        source.addEventListener("slots", (e) => onSlotsChanged(JSON.parse((e as MessageEvent).data).lecturer_id))
+      }
+      source.onerror = () => {
+        source?.close()
+        if (stopped) return
+        //tak jak "retry: 5000" z serwera
+        retryTimer = setTimeout(async () => {
+          if (accessTokenExpiresSoon(localStorage.getItem("authToken"))) {
+            try {
+              await refreshAccessToken()
+            } catch {
+              //refresh wygasl - kolejna proba po ponownym zalogowaniu
+            }
+          }
+          if (!stopped) connect()
+        }, 5000)
+      }
+    }
+
+    connect()
+    return {
+      close: () => {
+        stopped = true
+        clearTimeout(retryTimer)
+        source?.close()
+      },
+    }
+  },
+}
@@ -1,13 +1,41 @@
 import api from './axios'
-import type {Reservation} from "@/api/types.ts";
+import type {CursorPage, LecturerStats, Reservation} from "@/api/types.ts";
 
 export const reservationsAPI = {
-  reserveSlot: (slotId: number, topic?: string) =>
+  //klucz tworzy wywolujacy raz na probe rezerwacji i przekazuje ten sam przy ponowieniu
+  //po bledzie sieci -> backend zwroci pierwsza odpowiedz zamiast drugiej rezerwacji
+  reserveSlot: (slotId: number, idempotencyKey: string, topic?: string) =>
     api.post("/api/reservations/student/", {
       slot: slotId,
       // topic: topic ?? "",
+    }, {
+      headers: { "Idempotency-Key": idempotencyKey },
     }),
 
-     getMyReservations: () =>
-    api.get<Reservation[]>("/api/reservations/student/"),
+  //lista stronicowana kursorem (po terminie slotu); cursor z poprzedniej odpowiedzi
+  getMyReservations: (cursor?: string | null) =>
+    api.get<CursorPage<Reservation>>("/api/reservations/student/", {
+      params: cursor ? { cursor } : undefined,
+    }),
+
+  //trzymanie miejsca na czas wypelniania formularza (wygasa samo po kilku minutach)
+  holdSeat: (slotId: number) =>
+    api.post<{ slot_id: number; expires_at: string; ttl_seconds: number }>(
+      "/api/reservations/student/hold/",
+      { slot_id: slotId },
+    ),
+
+  releaseHold: (slotId: number) =>
+    api.delete("/api/reservations/student/hold/", { params: { slot_id: slotId } }),
+
+  //lista oczekujacych - jeden wpis zamiast ponawiania rezerwacji pelnego slotu
+  joinWaitlist: (slotId: number, topic?: string) =>
+    api.post<{ status: "reserved" | "waiting"; entry?: { id: number; position: number } }>(
+      "/api/reservations/waitlist/",
+      { slot_id: slotId, topic: topic ?? "" },
+    ),
+
+  //wykorzystanie miejsc, nieobecnosci i anulowania (tygodniowo / per przedmiot)
+  getLecturerStats: (groupBy: LecturerStats["group_by"] = "week", start?: string, end?: string) =>
+    api.get<LecturerStats>("/api/reservations/stats/", { params: { group_by: groupBy, start, end } }),
 }
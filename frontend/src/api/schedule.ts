@@ -1,5 +1,5 @@
 import api from "./axios"
-import { type TimeWindow, type BlockedTime, type Reservation } from "./types"
+import { type TimeWindow, type BlockedTime, type Reservation, type CursorPage, type ScheduleImportJob, type CalendarSummary } from "./types"
 const BASE_URL = "/api/schedules";
 const BACKEND_URL = "http://localhost:8000";
 
@@ -48,14 +48,44 @@ export const schedulesAPI = {
 
 
     //public
-    getPublicSlots: () =>
-        api.get("/api/schedules/public-available-slots/"),
+    getPublicSlots: (cursor?: string | null) =>
+        api.get<CursorPage<TimeWindow>>("/api/schedules/public-available-slots/", {
+            params: cursor ? { cursor } : undefined,
+        }),
 
     //import
   importSchedule: (data: FormData) =>
-    api.post(`${BASE_URL}/import/`, data, {
+    api.post<{ job_id: number; status: string; status_url: string; message: string }>(`${BASE_URL}/import/`, data, {
       headers: { 'Content-Type': 'multipart/form-data' }
     }),
+
+  getImportStatus: (jobId: number) =>
+    api.get<ScheduleImportJob>(`${BASE_URL}/import/${jobId}/`),
+
+    //podsumowanie dni (siatka miesiaca) - prowadzacy lub publicznie dla wybranego prowadzacego
+  getCalendarSummary: (start: string, end: string) =>
+    api.get<CalendarSummary>(`${BASE_URL}/calendar/summary/`, { params: { start, end } }),
+
+  getPublicCalendarSummary: (start: string, end: string, lecturerId?: number) =>
+    api.get<CalendarSummary>("/api/schedules/public-available-slots/summary/", {
+      params: lecturerId ? { start, end, lecturer_id: lecturerId } : { start, end },
+    }),
+
+    //najblizsze wolne terminy (bez kolizji z rezerwacjami studenta), godziny jako "HH:MM"
+  getRecommendedSlots: (filters: { lecturerId?: number; subject?: string; after?: string; before?: string; limit?: number } = {}) =>
+    api.get<TimeWindow[]>("/api/schedules/public-available-slots/recommended/", {
+      params: {
+        lecturer_id: filters.lecturerId,
+        subject: filters.subject,
+        after: filters.after,
+        before: filters.before,
+        limit: filters.limit,
+      },
+    }),
+
+    //subskrypcja kalendarza (.ics)
+  getCalendarFeed: () =>
+    api.get<{ token: string; url: string }>(`${BASE_URL}/calendar-feed/`),
 };
 //export
 export const exportScheduleCSV=async () =>{
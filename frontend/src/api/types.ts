@@ -36,6 +36,13 @@ export interface TimeWindow {
   subject?: string;
 }
 
+// odpowiedz stronicowana kursorem (public-available-slots, listy rezerwacji)
+export interface CursorPage<T> {
+  next: string | null
+  next_cursor: string | null
+  results: T[]
+}
+
 export interface BlockedTime {
   id: number
   start_time: string
@@ -59,4 +66,72 @@ export interface Consultaiton {
   time: string
   status: "confirmed" | "pending" | "cancelled"
   location: string
-}
\ No newline at end of file
+}
+
+//postep importu CSV przetwarzanego w tle
+export interface ScheduleImportJob {
+  id: number
+  status: "pending" | "running" | "completed" | "failed"
+  rows_processed: number
+  rows_imported: number
+  rows_rejected: number
+  errors: { row: number | null; error: string }[]
+  rows_per_second: number | null
+  created_at: string
+  started_at: string | null
+  finished_at: string | null
+}
+
+//dzienne podsumowanie kalendarza (widok miesiaca/tygodnia)
+export interface CalendarDaySummary {
+  date: string
+  slots: number
+  free_slots: number
+  booked_slots: number
+  free_seats: number
+  reservations: number
+  free_minutes: number
+  booked_minutes: number
+  blocked_minutes: number
+}
+
+export interface CalendarSummary {
+  start: string
+  end: string
+  days: CalendarDaySummary[]
+}
+
+//statystyki prowadzacego z tabeli zbiorczej (/api/reservations/stats/)
+export interface LecturerStatsRow {
+  week_start?: string
+  subject?: string
+  lecturer_id?: number
+  slots: number
+  seats: number
+  pending: number
+  confirmed: number
+  cancelled: number
+  completed: number
+  no_show_student: number
+  no_show_lecturer: number
+  reservations: number
+  utilization: number | null
+  no_show_rate: number | null
+  cancellation_rate: number | null
+}
+
+export interface LecturerStats {
+  group_by: "week" | "subject" | "lecturer" | "total"
+  results: LecturerStatsRow[]
+}
+
+export interface Notification {
+  id: number
+  recipient: number
+  message: string
+  notification_type: "RESERVATION_CONFIRMATION" | "RESERVATION_CANCELLATION" | "SLOT_UPDATE" | "NEW_RESERVATION" | "STATUS_CHANGE"
+  is_seen: boolean
+  reservation: number | null
+  created_at: string
+  created_at_formatted: string
+}
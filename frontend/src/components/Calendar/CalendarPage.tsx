@@ -213,8 +213,21 @@ const handleAddTimeWindow = async () => {
     formData.append('file', file);
 
     try {
-      await schedulesAPI.importSchedule(formData);
-      alert("Pomyślnie zaimportowano plan zajęć! Dane są aktualizowane.");
+      const { data } = await schedulesAPI.importSchedule(formData);
+      // import dziala w tle - odpytujemy status az do zakonczenia
+      let job = (await schedulesAPI.getImportStatus(data.job_id)).data;
+      while (job.status === "pending" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        job = (await schedulesAPI.getImportStatus(data.job_id)).data;
+      }
+      if (job.status === "failed") {
+        alert(`Import przerwany: ${job.errors.map((err) => err.error).join("\n")}`);
+      } else if (job.rows_rejected > 0) {
+        alert(`Zaimportowano ${job.rows_imported} pozycji, odrzucono ${job.rows_rejected}:\n` +
+          job.errors.slice(0, 10).map((err) => `wiersz ${err.row}: ${err.error}`).join("\n"));
+      } else {
+        alert(`Pomyślnie zaimportowano ${job.rows_imported} pozycji!`);
+      }
       loadData();
     } catch (error) {
       console.error("Błąd importu:", error);
@@ -225,6 +238,17 @@ const handleAddTimeWindow = async () => {
   }
 
 
+  const handleCopyCalendarFeed = async () => {
+    try {
+      const { data } = await schedulesAPI.getCalendarFeed();
+      await navigator.clipboard.writeText(data.url);
+      alert("Skopiowano adres subskrypcji kalendarza. Dodaj go w Google Calendar / Outlook jako kalendarz z adresu URL.");
+    } catch (error) {
+      console.error("Błąd pobierania adresu kalendarza:", error);
+      alert("Nie udało się pobrać adresu subskrypcji kalendarza.");
+    }
+  }
+
   const handleExportCSV = async () => { // Zmień na async
     try {
         const csvBlob = await exportScheduleCSV();
@@ -345,6 +369,10 @@ const handleAddTimeWindow = async () => {
             Importuj harmonogram (CSV)
           </Button>
           <input ref={fileInputRef} type="file" accept=".csv" onChange={handleImportCSV} className="hidden" />
+          <Button onClick={handleCopyCalendarFeed} variant="outline" className="border-green-600 text-green-600 hover:bg-green-50">
+            <Calendar className="h-4 w-4 mr-2" />
+            Subskrybuj w kalendarzu (ICS)
+          </Button>
         </div>
 
         {/* Tabs Layout)*/}
@@ -30,7 +30,7 @@ export function StudentDashboard() {
       setUserProfile(profile)
 
       const reservationsResponse = await reservationsAPI.getMyReservations()
-      setMyReservations(reservationsResponse.data)
+      setMyReservations(reservationsResponse.data.results)
     } catch (error) {
       console.error("Błąd podczas pobierania danych:", error)
     } finally {
@@ -37,6 +37,8 @@ export function LoginPage({ isRegisterPage }: LoginPageProps) {
       const data = await login(emailLogin,password);
       console.log("Login successful:", data);
       localStorage.setItem("authToken", data.access);
+      //kanal push odnawia nim wygasly token dostepu
+      if (data.refresh) localStorage.setItem("refreshToken", data.refresh);
 
       const userProfile= await fetchUserProfile();
       const role = userProfile.role as "student" | "lecturer";
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react"
+import { useState, useEffect, useRef } from "react"
 import { Link } from "react-router-dom"
 
 import { Button } from "../ui/Button"
@@ -15,9 +15,12 @@ import type { TimeWindow } from "../../api/types"
 
 export function ReservationsPage() {
   const [availableSlots, setAvailableSlots] = useState<TimeWindow[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
   const [selectedProfessor, setSelectedProfessor] = useState<string>("")
   const [selectedSubject, setSelectedSubject] = useState<string>("")
+  //klucz idempotencji na probe rezerwacji slotu - ponowienie po bledzie sieci wysyla ten sam
+  const bookingKeys = useRef(new Map<number, string>())
 
   // =========================
   // LOAD DATA
@@ -26,20 +29,21 @@ export function ReservationsPage() {
     loadSlots()
   }, [])
 
-  const loadSlots = async () => {
+  // cursor = null -> pierwsza strona, w przeciwnym razie dopinamy kolejna strone
+  const loadSlots = async (cursor: string | null = null) => {
     setLoading(true)
     try {
-      const response = await schedulesAPI.getPublicSlots()
+      const response = await schedulesAPI.getPublicSlots(cursor)
       console.log("Dostępne sloty:", response.data)
 
-      // Filtruj tylko aktywne sloty z wolnymi miejscami
-      const activeSlots = response.data.filter(slot => {
-        const hasSpace = (slot.reservations_count ?? 0) < slot.max_attendees
+      // Filtruj aktywne sloty w przyszlosci (pelne mozna dolaczyc do listy oczekujacych)
+      const activeSlots = response.data.results.filter(slot => {
         const isFuture = new Date(slot.start_time) > new Date()
-        return slot.is_active && hasSpace && isFuture
+        return slot.is_active && isFuture
       })
 
-      setAvailableSlots(activeSlots)
+      setAvailableSlots(prev => (cursor ? [...prev, ...activeSlots] : activeSlots))
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error("Błąd pobierania slotów:", error)
     } finally {
@@ -96,12 +100,34 @@ export function ReservationsPage() {
   // =========================
   // RESERVATION HANDLER
   // =========================
+  const handleJoinWaitlist = async (slotId: number) => {
+  try {
+    const { data } = await reservationsAPI.joinWaitlist(slotId)
+    if (data.status === "reserved") {
+      alert("Zwolniło się miejsce - rezerwacja potwierdzona ✅")
+    } else {
+      alert(`Zapisano na listę oczekujących (pozycja ${data.entry?.position}). Powiadomimy Cię, gdy zwolni się miejsce.`)
+    }
+    loadSlots()
+  } catch (e: any) {
+    alert(e?.response?.data?.detail ?? "Nie udało się zapisać na listę oczekujących")
+  }
+}
+
   const handleReservation = async (slotId: number) => {
+  let key = bookingKeys.current.get(slotId)
+  if (!key) {
+    key = crypto.randomUUID()
+    bookingKeys.current.set(slotId, key)
+  }
   try {
-    await reservationsAPI.reserveSlot(slotId)
+    await reservationsAPI.reserveSlot(slotId, key)
+    bookingKeys.current.delete(slotId)
     alert("Rezerwacja potwierdzona ✅")
     loadSlots()
   } catch (e: any) {
+    //serwer odpowiedzial - proba zakonczona; bez odpowiedzi (siec) klucz zostaje do ponowienia
+    if (e?.response) bookingKeys.current.delete(slotId)
     alert(
       e?.response?.data?.detail ??
         JSON.stringify(e?.response?.data) ??
@@ -356,15 +382,14 @@ export function ReservationsPage() {
                         </div>
 
                         <Button
-                          disabled={status === "full"}
-                          onClick={() => handleReservation(slot.id)}
+                          onClick={() => (status === "available" ? handleReservation(slot.id) : handleJoinWaitlist(slot.id))}
                           className={`w-full ${
                             status === "available"
                               ? "bg-green-600 hover:bg-green-700 text-white"
-                              : "bg-gray-300 text-gray-500 cursor-not-allowed"
+                              : "bg-amber-500 hover:bg-amber-600 text-white"
                           }`}
                         >
-                          {status === "available" ? "Zarezerwuj" : "Pełne"}
+                          {status === "available" ? "Zarezerwuj" : "Pełne - zapisz na listę oczekujących"}
                         </Button>
                       </div>
                     </div>
@@ -373,6 +398,16 @@ export function ReservationsPage() {
               )
             })
           )}
+
+          {nextCursor && (
+            <Button
+              disabled={loading}
+              onClick={() => loadSlots(nextCursor)}
+              className="w-full bg-white border border-gray-300 text-gray-700 hover:bg-gray-50"
+            >
+              Pokaż więcej terminów
+            </Button>
+          )}
         </div>
       </main>
 